@@ -14,12 +14,12 @@ for /d %%d in ("C:\Users\pc\Desktop\*") do (
     )
 )
 
-REM Copy Cursor database (local backup only - not pushed to Git)
+REM Snapshot Cursor database (local backup only - not pushed to Git)
 REM Database files contain secrets, so they're excluded from Git via .gitignore
+REM Uses the SQLite backup API: consistent and does not lock the running editor
 set CURSOR_DATA=%APPDATA%\Cursor\User\globalStorage
 if exist "%CURSOR_DATA%\state.vscdb" (
-    if not exist "databases" mkdir "databases"
-    copy /Y "%CURSOR_DATA%\state.vscdb" "databases\state.vscdb" >nul 2>&1
+    python cursor_db.py snapshot "%CURSOR_DATA%\state.vscdb" "databases\state.vscdb" >nul 2>&1
 )
 
 REM Copy workspace storage (local backup only - not pushed to Git)
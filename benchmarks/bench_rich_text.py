@@ -0,0 +1,108 @@
+"""
+Micro-benchmark: shared iterative rich_text.parse_rich_text vs the old recursive parser
+Run from the repository root: python benchmarks/bench_rich_text.py
+"""
+import json
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import rich_text
+
+def legacy_parse_rich_text(rich_text_str):
+    """The recursive parser previously copied into extract_full_conversations.py"""
+    try:
+        if not rich_text_str or rich_text_str == "":
+            return ""
+        
+        if isinstance(rich_text_str, dict):
+            rich_data = rich_text_str
+        else:
+            rich_data = json.loads(rich_text_str)
+        
+        def extract_text(node):
+            text = ""
+            if isinstance(node, dict):
+                if "text" in node:
+                    text += str(node["text"])
+                
+                if "children" in node:
+                    for child in node["children"]:
+                        text += extract_text(child)
+                
+                node_type = node.get("type", "")
+                if node_type == "paragraph":
+                    text += "\n"
+                elif node_type == "heading":
+                    text += "\n"
+                elif node_type == "code":
+                    text += "\n"
+                    
+            return text
+        
+        result = extract_text(rich_data.get("root", {}))
+        return result.strip()
+    except Exception as e:
+        return str(rich_text_str) if rich_text_str else ""
+
+def wide_document(paragraphs: int, words: int = 20) -> str:
+    """A flat document: many paragraphs of text nodes"""
+    children = [
+        {'type': 'paragraph', 'children': [
+            {'type': 'text', 'text': f'paragraph {i} ' + 'lorem ipsum ' * words}
+        ]}
+        for i in range(paragraphs)
+    ]
+    return json.dumps({'root': {'type': 'root', 'children': children}})
+
+def deep_document(depth: int) -> str:
+    """A pathologically nested document (e.g. deeply nested lists), built without recursion"""
+    opening = ''.join(f'{{"type": "listitem", "children": [{{"type": "text", "text": "{i} "}}, ' for i in range(depth))
+    closing = ']}' * depth
+    return '{"root": {"type": "root", "children": [' + opening + '{"type": "text", "text": "leaf"}' + closing + ']}}'
+
+def bench(label: str, func, doc: str, number: int):
+    seconds = min(timeit.repeat(lambda: func(doc), number=number, repeat=3)) / number
+    print(f"  {label:<28} {seconds * 1000:10.3f} ms/doc")
+    return seconds
+
+def main():
+    print("=" * 80)
+    print("RICH TEXT PARSER MICRO-BENCHMARK")
+    print("=" * 80)
+    
+    cases = [
+        ('small (10 paragraphs)', wide_document(10), 2000),
+        ('large (2,000 paragraphs)', wide_document(2000), 20),
+        ('huge (20,000 paragraphs)', wide_document(20000), 3),
+        ('nested (depth 500)', deep_document(500), 200),
+    ]
+    
+    for name, doc, number in cases:
+        print(f"\n{name}: {len(doc):,} bytes")
+        assert rich_text.parse_rich_text(doc, use_cache=False) == legacy_parse_rich_text(doc)
+        legacy = bench('legacy recursive', legacy_parse_rich_text, doc, number)
+        shared = bench('iterative (no cache)', lambda d: rich_text.parse_rich_text(d, use_cache=False), doc, number)
+        cached = bench('iterative (memoised)', rich_text.parse_rich_text, doc, number)
+        print(f"  speed-up: {legacy / shared:.1f}x uncached, {legacy / cached:.1f}x memoised")
+    
+    # Trees deeper than the recursion limit (already decoded, e.g. from raw_data)
+    depth = sys.getrecursionlimit() * 2
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(depth * 3)
+    tree = json.loads(deep_document(depth))
+    sys.setrecursionlimit(limit)
+    print(f"\nnested dict (depth {depth}):")
+    try:
+        legacy_result = 'parsed' if not legacy_parse_rich_text(tree).startswith('{') else 'returned raw input'
+    except RecursionError:
+        legacy_result = 'crashed (RecursionError)'
+    print(f"  legacy recursive: {legacy_result}")
+    print(f"  iterative:        {'parsed' if rich_text.parse_rich_text(tree).endswith('leaf') else 'failed'}")
+    
+    print(f"\nCache: {rich_text.cache_info()}")
+
+if __name__ == '__main__':
+    main()
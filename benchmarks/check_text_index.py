@@ -0,0 +1,92 @@
+"""
+Check text_index.py against text files written with LF and with CRLF line endings
+The LF file is indexed by the writer and by scan_text, which must agree; its CRLF copy
+(as left by a Windows checkout) must index the same messages and sections. A rewrite of
+the same size must not be served from the old sidecar
+Run from the repository root: python benchmarks/check_text_index.py
+"""
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from extract_full_conversations import format_conversation
+from extraction_manifest import write_output
+from text_index import TextIndex, TextIndexBuilder, scan_text, write_text_index
+
+def sample_conversation(messages: int = 25) -> dict:
+    return {
+        'composer_id': 'check-text-index',
+        'total_messages': messages,
+        'messages_with_content': messages - 1,
+        'extracted_at': '2024-01-01T00:00:00',
+        'messages': [
+            {'index': i + 1, 'type': 'user' if i % 2 == 0 else 'assistant',
+             'text': '' if i == 3 else f"message {i + 1}\nsecond line with ünïcode\n\nafter a blank line"}
+            for i in range(messages)
+        ],
+        'original_file_states': {'file:///c%3A/proj/a.py': {'isNewlyCreated': True, 'content': 'print(1)'}}
+    }
+
+def check_blocks(text_file: Path, conversation: dict, problems: list, label: str):
+    """Every message block read through TextIndex.open starts with its own '[N] TYPE' header"""
+    with TextIndex.open(text_file) as text_index:
+        if len(text_index) != len(conversation['messages']):
+            problems.append(f"{label}: {len(text_index)} message(s) indexed, expected {len(conversation['messages'])}")
+        if [title for title, _ in text_index.sections] != ['FULL CONVERSATION RECOVERY', 'CONVERSATION MESSAGES',
+                                                           'FILES CREATED/MODIFIED']:
+            problems.append(f"{label}: sections {text_index.sections}")
+        for msg in conversation['messages']:
+            block = text_index.message(msg['index']) or ''
+            header = f"[{msg['index']}] {msg['type'].upper()}"
+            if block.splitlines()[:1] != [header]:
+                problems.append(f"{label}: message [{msg['index']}] starts with {block[:30]!r}")
+            elif msg['text'] and msg['text'].splitlines()[-1] not in block:
+                problems.append(f"{label}: message [{msg['index']}] is cut short")
+
+def main() -> int:
+    conversation = sample_conversation()
+    problems = []
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        lf_file = Path(tmp) / 'FULL_lf.txt'
+        builder = TextIndexBuilder()
+        text = format_conversation(conversation, builder)
+        write_text_index(lf_file, builder, write_output(lf_file, text))
+        
+        scanned = scan_text(lf_file)
+        written = json.loads((Path(tmp) / 'FULL_lf.txt.idx').read_text(encoding='utf-8'))
+        for field in ('sections', 'messages'):
+            if scanned[field] != written[field]:
+                problems.append(f"LF: scan_text {field} differ from the writer's")
+        check_blocks(lf_file, conversation, problems, 'LF')
+        
+        crlf_file = Path(tmp) / 'FULL_crlf.txt'
+        crlf_file.write_bytes(text.replace('\n', '\r\n').encode('utf-8'))
+        check_blocks(crlf_file, conversation, problems, 'CRLF')
+        
+        # Same size, other content and mtime: the sidecar must not be trusted
+        stat = lf_file.stat()
+        lf_file.write_bytes(text.replace('message 1\n', 'message X\n', 1).encode('utf-8'))
+        os.utime(lf_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        with TextIndex.open(lf_file) as text_index:
+            if not text_index.scanned:
+                problems.append("same-size rewrite: stale sidecar accepted")
+        
+        # Touched but unchanged: the sidecar still holds
+        lf_file.write_bytes(text.encode('utf-8'))
+        os.utime(lf_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2_000_000_000))
+        with TextIndex.open(lf_file) as text_index:
+            if text_index.scanned:
+                problems.append("touched file: current sidecar rejected")
+    
+    for problem in problems:
+        print(f"❌ {problem}")
+    print(f"{'❌' if problems else '✅'} text index checks: {len(problems)} problem(s)")
+    return 1 if problems else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Check watch_backup.py against a state.vscdb that another thread writes to in bursts
+Composer 'a' is updated, composer 'c' appears and unrelated ItemTable keys change, all within
+the quiet period of each other. The watcher must call back exactly once, after the last burst,
+with ['a', 'c']; writes to unrelated keys afterwards must not call back again
+Run from the repository root: python benchmarks/check_watch_backup.py
+"""
+import json
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from watch_backup import DatabaseWatcher, Debouncer, watch
+
+INTERVAL = 0.05
+QUIET = 0.5
+BURSTS = 3
+WRITES_PER_BURST = 5
+
+def put_composer(conn: sqlite3.Connection, composer_id: str, last_updated_at: int):
+    value = json.dumps({'composerId': composer_id, 'lastUpdatedAt': last_updated_at,
+                        'fullConversationHeadersOnly': [{'bubbleId': 'b1', 'type': 1}]})
+    conn.execute("INSERT OR REPLACE INTO cursorDiskKV (key, value) VALUES (?, ?)",
+                 (f"composerData:{composer_id}", value))
+    conn.commit()
+
+def put_unrelated(conn: sqlite3.Connection, n: int):
+    conn.execute("INSERT OR REPLACE INTO ItemTable (key, value) VALUES (?, ?)",
+                 ('workbench.panel.state', json.dumps({'n': n})))
+    conn.commit()
+
+def create_database(db_path: Path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE cursorDiskKV (key TEXT UNIQUE ON CONFLICT REPLACE, value BLOB)")
+    conn.execute("CREATE TABLE ItemTable (key TEXT UNIQUE ON CONFLICT REPLACE, value BLOB)")
+    put_composer(conn, 'a', 1)
+    put_composer(conn, 'b', 1)
+    conn.close()
+
+class StoppingWatcher(DatabaseWatcher):
+    """Ends watch() (as Ctrl+C would) once ``stop_at`` has passed"""
+    
+    stop_at = None
+    
+    def poll(self) -> bool:
+        if self.stop_at is not None and time.monotonic() >= self.stop_at:
+            raise KeyboardInterrupt
+        return super().poll()
+
+def writer(db_path: Path, watcher: StoppingWatcher, timeline: dict):
+    """Bursts of writes spaced well within QUIET, then unrelated writes only"""
+    time.sleep(QUIET)
+    conn = sqlite3.connect(db_path)
+    n = 0
+    for burst in range(BURSTS):
+        for _ in range(WRITES_PER_BURST):
+            n += 1
+            put_composer(conn, 'a', 1 + n)
+            put_unrelated(conn, n)
+            if burst == BURSTS - 1:
+                put_composer(conn, 'c', n)
+            time.sleep(INTERVAL)
+        time.sleep(QUIET / 3)
+    timeline['last_write'] = time.monotonic()
+    
+    # After the callback: only keys the watcher does not care about
+    time.sleep(QUIET * 2)
+    for _ in range(WRITES_PER_BURST):
+        n += 1
+        put_unrelated(conn, n)
+        time.sleep(INTERVAL)
+    conn.close()
+    watcher.stop_at = time.monotonic() + QUIET * 3
+
+def main() -> int:
+    problems = []
+    calls = []
+    timeline = {}
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / 'state.vscdb'
+        create_database(db_path)
+        watcher = StoppingWatcher(db_path)
+        
+        def on_change(composer_ids):
+            calls.append((time.monotonic(), sorted(composer_ids)))
+        
+        thread = threading.Thread(target=writer, args=(db_path, watcher, timeline))
+        thread.start()
+        runs = watch(watcher, on_change, INTERVAL, Debouncer(QUIET, max_wait=60.0))
+        thread.join()
+    
+    if runs != 1 or len(calls) != 1:
+        problems.append(f"{len(calls)} callback(s), expected exactly one: {calls}")
+    if calls:
+        called_at, composer_ids = calls[0]
+        if composer_ids != ['a', 'c']:
+            problems.append(f"callback got {composer_ids}, expected ['a', 'c']")
+        if called_at < timeline.get('last_write', float('inf')):
+            problems.append("callback ran before the last burst of writes")
+    
+    for problem in problems:
+        print(f"❌ {problem}")
+    print(f"{'❌' if problems else '✅'} watcher checks: {len(problems)} problem(s)")
+    return 1 if problems else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""
+Benchmark the extraction pipeline on a synthetic database
+Each stage runs in a fresh process so its peak RSS is its own; results go to a JSON file
+Run from the repository root: python benchmarks/run_benchmarks.py --composers 20 --messages 500
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from synthetic_db import generate_database
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None if the platform cannot tell)"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and KiB elsewhere
+        return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / 1024 / 1024
+    except ImportError:
+        return None
+
+def stage_extract_conversations(workdir: Path, db_path: str) -> int:
+    from extract_conversations import extract_conversations
+    return extract_conversations(db_path=db_path, output_dir=workdir / 'conversations', full=True)
+
+def stage_extract_full_conversation(workdir: Path, db_path: str) -> int:
+    from conversation_store import list_conversation_files
+    from extract_full_conversations import extract_full_conversation, save_conversation
+    
+    output_dir = workdir / 'full_conversations'
+    output_dir.mkdir(exist_ok=True)
+    rows = 0
+    for conversation_file in list_conversation_files(workdir / 'conversations'):
+        conversation = extract_full_conversation(conversation_file['composer_id'], db_path, conversation_file['path'])
+        # Saved so the project recovery stage has input
+        save_conversation(conversation, output_dir, conversation_file['stem'])
+        rows += conversation['total_messages']
+    return rows
+
+def stage_recover_from_json_file(workdir: Path, db_path: str) -> int:
+    from bubble_sources import open_bubble_sources
+    from conversation_store import list_conversation_files
+    from recover_from_json import recover_from_json_file
+    
+    sources = open_bubble_sources(workdir, (db_path, True))
+    rows = 0
+    try:
+        for conversation_file in list_conversation_files(workdir / 'conversations'):
+            recovery, _ = recover_from_json_file(conversation_file['path'], sources=sources)
+            rows += recovery['total_messages']
+    finally:
+        if sources is not None:
+            sources.close()
+    return rows
+
+def stage_create_project_recovery_document(workdir: Path, db_path: str) -> int:
+    from extract_project_context import create_project_recovery_document
+    
+    output_dir = workdir / 'project_recovery_docs'
+    output_dir.mkdir(exist_ok=True)
+    rows = 0
+    for conv_file in sorted((workdir / 'full_conversations').glob('FULL_*.txt')):
+        create_project_recovery_document(conv_file, output_dir / f"PROJECT_RECOVERY_{conv_file.stem}.md")
+        with open(conv_file.with_suffix('.json'), 'r', encoding='utf-8') as f:
+            rows += json.load(f)['total_messages']
+    return rows
+
+STAGES = [
+    ('extract_conversations', stage_extract_conversations, 'composerData records'),
+    ('extract_full_conversation', stage_extract_full_conversation, 'messages'),
+    ('recover_from_json_file', stage_recover_from_json_file, 'messages'),
+    ('create_project_recovery_document', stage_create_project_recovery_document, 'messages'),
+]
+
+def _run_stage(stage_name: str, workdir: str, db_path: str, results):
+    """Child process body: run one stage quietly and report time, rows and peak RSS"""
+    stage = next(func for name, func, _ in STAGES if name == stage_name)
+    try:
+        with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            rows = stage(Path(workdir), db_path)
+            wall = time.perf_counter() - start
+        results.put({'wall_s': wall, 'rows': rows, 'peak_rss_mb': peak_rss_mb()})
+    except Exception as e:
+        results.put({'error': f"{type(e).__name__}: {e}"})
+
+def run_stage(stage_name: str, workdir: Path, db_path: str) -> dict:
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    process = ctx.Process(target=_run_stage, args=(stage_name, str(workdir), db_path, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--composers', type=int, default=10)
+    parser.add_argument('--messages', type=int, default=200, help='messages per composer')
+    parser.add_argument('--blob-size', type=int, default=400, help='approximate characters per message')
+    parser.add_argument('--db', help='benchmark this database instead of generating one')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/bench_<timestamp>.json)')
+    args = parser.parse_args()
+    
+    print("=" * 80)
+    print("EXTRACTION BENCHMARKS")
+    print("=" * 80)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        
+        if args.db:
+            db_path = str(Path(args.db).resolve())
+            dataset = {'db': db_path, 'db_bytes': os.path.getsize(db_path)}
+        else:
+            db_path = str(workdir / 'state.vscdb')
+            print(f"\nGenerating {args.composers} x {args.messages} messages ({args.blob_size} chars each)...")
+            dataset = generate_database(db_path, args.composers, args.messages, args.blob_size)
+            print(f"✅ {dataset['db_bytes'] / 1024 / 1024:.1f} MB, {dataset['bubble_rows']} bubble rows")
+        
+        print(f"\n{'stage':<34} {'wall s':>9} {'peak MB':>9} {'rows':>9} {'rows/s':>11}")
+        stages = []
+        for name, _, unit in STAGES:
+            result = run_stage(name, workdir, db_path)
+            if 'error' in result:
+                print(f"{name:<34} ❌ {result['error']}")
+                stages.append({'name': name, 'error': result['error']})
+                continue
+            
+            result['rows_per_s'] = result['rows'] / result['wall_s'] if result['wall_s'] else None
+            stages.append(dict(name=name, unit=unit, **result))
+            peak = f"{result['peak_rss_mb']:.1f}" if result['peak_rss_mb'] is not None else 'n/a'
+            print(f"{name:<34} {result['wall_s']:>9.3f} {peak:>9} {result['rows']:>9} {result['rows_per_s'] or 0:>11,.0f}")
+    
+    output = Path(args.output) if args.output else \
+        Path(__file__).parent / 'results' / f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'run_at': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'dataset': dataset,
+            'stages': stages,
+        }, f, indent=2)
+    
+    print(f"\n📊 Results saved: {output}")
+    return 0 if all('error' not in stage for stage in stages) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
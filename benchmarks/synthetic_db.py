@@ -0,0 +1,151 @@
+"""
+Generate a synthetic Cursor-shaped state.vscdb for benchmarks (the real one cannot be shared)
+Run from the repository root: python benchmarks/synthetic_db.py out.vscdb --composers 20 --messages 500
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import uuid
+from pathlib import Path
+
+WORDS = ('the', 'model', 'frappe', 'doctype', 'server', 'script', 'install', 'bench', 'python', 'error',
+         'migrate', 'field', 'report', 'query', 'api', 'hook', 'site', 'config', 'fix', 'test')
+
+def _text(rng: random.Random, size: int) -> str:
+    """Roughly size characters of word salad"""
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return ' '.join(words)
+
+def _rich_text(paragraphs) -> str:
+    """Lexical document with one paragraph (or code block) per entry"""
+    children = []
+    for kind, text in paragraphs:
+        children.append({'type': kind, 'children': [{'type': 'text', 'text': text, 'format': 0}]})
+    return json.dumps({'root': {'type': 'root', 'children': children}})
+
+def _bubble(rng: random.Random, composer_idx: int, msg_idx: int, bubble_id: str, msg_type: int, blob_size: int) -> dict:
+    path = f"C:\\Users\\dev\\project{composer_idx}\\app\\module_{msg_idx % 40}.py"
+    body = _text(rng, blob_size)
+    paragraphs = [('paragraph', f"{body} see {path}")]
+    if msg_type == 2 and msg_idx % 4 == 1:
+        paragraphs.append(('code', f"def handler_{msg_idx}():\n    return frappe.get_doc('Item', '{msg_idx}')"))
+    
+    return {
+        '_v': 2,
+        'type': msg_type,
+        'bubbleId': bubble_id,
+        # Like the real data, some bubbles only carry richText
+        'text': '' if msg_idx % 3 == 0 else body,
+        'richText': _rich_text(paragraphs),
+        'createdAt': 1700000000000 + composer_idx * 10_000_000 + msg_idx * 1000,
+    }
+
+def _composer_data(composer_idx: int, composer_id: str, headers: list, blob_size: int) -> dict:
+    project = f"C:\\Users\\dev\\project{composer_idx}"
+    code_block_data = {}
+    original_file_states = {}
+    for n in range(5):
+        fs_path = f"{project}\\app\\module_{n}.py"
+        uri = 'file:///' + fs_path.replace('\\', '/').replace(':', '%3A', 1)
+        code_block_data[uri] = {
+            f"block-{n}": {'uri': {'fsPath': fs_path}, 'languageId': 'python', 'status': 'accepted',
+                           'createdAt': 1700000000000 + n}
+        }
+        original_file_states[uri] = {'uri': {'fsPath': fs_path}, 'isNewlyCreated': n % 2 == 0,
+                                     'content': f"# module {n}\n" + 'x = 1\n' * (blob_size // 12)}
+    
+    return {
+        '_v': 3,
+        'composerId': composer_id,
+        'name': f"Synthetic conversation {composer_idx}",
+        'fullConversationHeadersOnly': headers,
+        'conversationMap': {},
+        'createdAt': 1700000000000 + composer_idx * 10_000_000,
+        'lastUpdatedAt': 1700000000000 + composer_idx * 10_000_000 + len(headers) * 1000,
+        'codeBlockData': code_block_data,
+        'originalFileStates': original_file_states,
+    }
+
+def generate_database(path, composers: int = 10, messages: int = 200, blob_size: int = 400,
+                      seed: int = 1, missing_every: int = 7, item_table_every: int = 11) -> dict:
+    """Write a synthetic state.vscdb and return a summary of what it contains
+    
+    Every ``missing_every``-th bubble has no row (content lost, as in real backups) and
+    every ``item_table_every``-th bubble lives in ItemTable instead of cursorDiskKV.
+    ``blob_size`` is the approximate number of characters of text per message.
+    """
+    path = Path(path)
+    if path.exists():
+        path.unlink()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE ItemTable (key TEXT UNIQUE ON CONFLICT REPLACE, value BLOB)")
+    conn.execute("CREATE TABLE cursorDiskKV (key TEXT UNIQUE ON CONFLICT REPLACE, value BLOB)")
+    
+    # Unrelated settings rows the extractors have to skip
+    conn.executemany("INSERT INTO ItemTable VALUES (?, ?)", [
+        ('composer.autoAccept.lastSeenHeadTimestamp', '1700000000000'),
+        ('workbench.panel.composerChatViewPane.hidden', 'false'),
+        ('cursorAuth/cachedEmail', 'nobody@example.com'),
+    ])
+    
+    summary = {'composers': composers, 'messages_per_composer': messages, 'blob_size': blob_size,
+               'bubble_rows': 0, 'missing_bubbles': 0}
+    
+    for composer_idx in range(composers):
+        composer_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        headers = []
+        rows = {'ItemTable': [], 'cursorDiskKV': []}
+        
+        for msg_idx in range(messages):
+            bubble_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+            msg_type = 1 if msg_idx % 2 == 0 else 2
+            headers.append({'bubbleId': bubble_id, 'type': msg_type})
+            
+            if msg_idx % missing_every == missing_every - 1:
+                summary['missing_bubbles'] += 1
+                continue
+            
+            table = 'ItemTable' if msg_idx % item_table_every == item_table_every - 1 else 'cursorDiskKV'
+            bubble = _bubble(rng, composer_idx, msg_idx, bubble_id, msg_type, blob_size)
+            rows[table].append((f"bubbleId:{composer_id}:{bubble_id}", json.dumps(bubble).encode('utf-8')))
+        
+        for table, table_rows in rows.items():
+            conn.executemany(f"INSERT INTO {table} VALUES (?, ?)", table_rows)
+            summary['bubble_rows'] += len(table_rows)
+        
+        composer_data = _composer_data(composer_idx, composer_id, headers, blob_size)
+        conn.execute("INSERT INTO cursorDiskKV VALUES (?, ?)", (f"composerData:{composer_id}", json.dumps(composer_data)))
+    
+    conn.commit()
+    conn.close()
+    
+    summary['db_bytes'] = os.path.getsize(path)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('output', help='database file to create (overwritten)')
+    parser.add_argument('--composers', type=int, default=10, help='number of conversations (default: 10)')
+    parser.add_argument('--messages', type=int, default=200, help='messages per conversation (default: 200)')
+    parser.add_argument('--blob-size', type=int, default=400, help='approximate characters per message (default: 400)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    
+    summary = generate_database(args.output, args.composers, args.messages, args.blob_size, args.seed)
+    print(f"✅ Wrote {args.output}: {summary['composers']} composers, {summary['bubble_rows']} bubble rows, "
+          f"{summary['db_bytes'] / 1024 / 1024:.1f} MB")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,347 @@
+"""
+Locate message bubbles across the global and workspace databases
+auto-backup.bat copies every workspace's state.vscdb into workspace-storage/. Which database
+file and table holds each bubbleId key is recorded once in bubble_locations.db (rescanned
+only when a database's size or mtime changes), so a bubble costs one indexed lookup plus
+a batched query against the table that actually holds it, and a missing bubble costs none
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Container, Dict, Iterable, List, Optional, Tuple
+
+from cursor_db import connect_readonly
+from extraction_core import find_global_database
+from extraction_manifest import file_signature
+from path_extraction import decode_file_uri
+
+WORKSPACE_BACKUP_DIR = 'workspace-storage'
+
+LOCATION_INDEX = 'bubble_locations.db'
+LOCATION_INDEX_VERSION = 1
+
+LOCATION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS databases (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    signature TEXT NOT NULL,
+    bubbles INTEGER NOT NULL,
+    indexed_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS locations (
+    composer_id TEXT NOT NULL,
+    bubble_id TEXT NOT NULL,
+    database_id INTEGER NOT NULL,
+    tbl TEXT NOT NULL,
+    PRIMARY KEY (composer_id, bubble_id, database_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS locations_database ON locations(database_id);
+"""
+
+# Tables that may hold bubbleId:<composer>:<bubble> rows, most common first
+BUBBLE_TABLES = ('cursorDiskKV', 'ItemTable')
+
+# Coverage counter for bubbles that were already in the global database
+GLOBAL_SOURCE = 'global'
+
+# Coverage label of bubbles embedded in composerData (see extraction_core.inline_bubbles)
+INLINE_SOURCE = 'inline'
+
+def live_workspace_dir() -> Path:
+    return Path(os.environ.get('APPDATA', '')) / 'Cursor' / 'User' / 'workspaceStorage'
+
+def workspace_label(workspace_dir: Path) -> str:
+    """Short name for a workspace: its folder (from workspace.json) or its storage hash"""
+    try:
+        with open(workspace_dir / 'workspace.json', 'r', encoding='utf-8') as f:
+            folder = json.load(f).get('folder') or ''
+        if folder:
+            return f"{workspace_dir.name[:8]} ({Path(decode_file_uri(folder)).name})"
+    except (OSError, ValueError, AttributeError):
+        pass
+    return workspace_dir.name[:8]
+
+def discover_workspace_databases(backup_dir: Path) -> List[Tuple[str, Path, bool]]:
+    """(label, path, immutable) of every workspace state.vscdb
+    
+    The live workspaceStorage wins over the backup copy of the same workspace, since it
+    may hold newer bubbles; backup copies are opened immutable (nobody writes them).
+    """
+    found = {}
+    for root, immutable in ((Path(backup_dir) / WORKSPACE_BACKUP_DIR, True), (live_workspace_dir(), False)):
+        if not root.is_dir():
+            continue
+        for db_path in sorted(root.glob('*/state.vscdb')):
+            found[db_path.parent.name] = (workspace_label(db_path.parent), db_path, immutable)
+    return [found[name] for name in sorted(found)]
+
+def database_signature(db_path: Path) -> str:
+    """Change marker of a database: size and mtime of the file and of its WAL, if any"""
+    signature = file_signature(db_path)
+    wal = Path(f"{db_path}-wal")
+    if wal.exists():
+        signature += file_signature(wal)
+    return json.dumps(signature)
+
+class BubbleLocationIndex:
+    """Persistent map of bubbleId keys to the database file and table holding them"""
+    
+    def __init__(self, index_path: Path):
+        self.index_path = Path(index_path)
+        self.conn = sqlite3.connect(self.index_path)
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, LOCATION_INDEX_VERSION):
+            # Written by an incompatible version: start over
+            self.conn.close()
+            self.index_path.unlink()
+            self.conn = sqlite3.connect(self.index_path)
+        self.conn.executescript(LOCATION_SCHEMA)
+        self.conn.execute(f"PRAGMA user_version = {LOCATION_INDEX_VERSION}")
+    
+    def refresh(self, databases: List[Tuple[str, Path, bool]]) -> Dict[str, int]:
+        """Rescan the databases whose signature changed; returns counters
+        
+        Entries of database files that no longer exist are dropped as well.
+        """
+        stats = {'indexed': 0, 'unchanged': 0, 'removed': 0}
+        known = {path: (db_id, signature) for db_id, path, signature
+                 in self.conn.execute("SELECT id, path, signature FROM databases")}
+        
+        for path, (db_id, _) in known.items():
+            if not os.path.exists(path):
+                with self.conn:
+                    self.conn.execute("DELETE FROM locations WHERE database_id = ?", (db_id,))
+                    self.conn.execute("DELETE FROM databases WHERE id = ?", (db_id,))
+                stats['removed'] += 1
+        
+        for label, db_path, immutable in databases:
+            path = str(Path(db_path).resolve())
+            signature = database_signature(path)
+            if path in known and known[path][1] == signature:
+                stats['unchanged'] += 1
+                continue
+            try:
+                self._index_database(path, signature, immutable)
+                stats['indexed'] += 1
+            except sqlite3.Error as e:
+                print(f"⚠️  Could not index {label}: {e}")
+        return stats
+    
+    def _index_database(self, path: str, signature: str, immutable: bool):
+        source = connect_readonly(path, immutable=immutable, tune=False)
+        try:
+            with self.conn:
+                self.conn.execute("INSERT OR IGNORE INTO databases (path, signature, bubbles, indexed_at) "
+                                  "VALUES (?, '', 0, '')", (path,))
+                db_id = self.conn.execute("SELECT id FROM databases WHERE path = ?", (path,)).fetchone()[0]
+                self.conn.execute("DELETE FROM locations WHERE database_id = ?", (db_id,))
+                
+                # Keys only, read from the key index; cursorDiskKV wins when both tables hold a key
+                for table in BUBBLE_TABLES:
+                    try:
+                        keys = source.execute(f"SELECT key FROM {table} WHERE key >= 'bubbleId:' AND key < 'bubbleId;'")
+                        self.conn.executemany(
+                            "INSERT OR IGNORE INTO locations VALUES (?, ?, ?, ?)",
+                            ((parts[1], parts[2], db_id, table) for parts in (key.split(':', 2) for (key,) in keys)
+                             if len(parts) == 3))
+                    except sqlite3.Error:
+                        pass  # Table missing in this database
+                
+                bubbles = self.conn.execute("SELECT COUNT(*) FROM locations WHERE database_id = ?", (db_id,)).fetchone()[0]
+                self.conn.execute("UPDATE databases SET signature = ?, bubbles = ?, indexed_at = ? WHERE id = ?",
+                                  (signature, bubbles, datetime.now().isoformat(), db_id))
+        finally:
+            source.close()
+    
+    def database_ids(self, paths: Iterable[Path]) -> List[Optional[int]]:
+        ids = dict(self.conn.execute("SELECT path, id FROM databases"))
+        return [ids.get(str(Path(path).resolve())) for path in paths]
+    
+    def close(self):
+        self.conn.close()
+
+class BubbleSources:
+    """Bubble lookups across a set of databases, backed by the persistent location index
+    
+    Databases are given in order of preference. The index and each database are opened
+    lazily per thread, so one instance can serve the pipeline's reader thread and can be
+    pickled into worker processes (without its connections).
+    """
+    
+    def __init__(self, databases: List[Tuple[str, Path, bool]], index_path: Path):
+        self.databases = databases
+        self.index_path = Path(index_path)
+        self.stats: Dict[str, int] = {}
+        self.has_global = any(label == GLOBAL_SOURCE for label, _, _ in databases)
+        self._local = threading.local()
+        
+        index = BubbleLocationIndex(self.index_path)
+        try:
+            self.refresh_stats = index.refresh(databases)
+            # Index database ID -> position in ``databases``
+            self.numbers = {db_id: number for number, db_id
+                            in enumerate(index.database_ids(db_path for _, db_path, _ in databases))
+                            if db_id is not None}
+        finally:
+            index.close()
+    
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['_local']
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+    
+    def _connections(self) -> Dict:
+        connections = getattr(self._local, 'connections', None)
+        if connections is None:
+            connections = self._local.connections = {}
+        return connections
+    
+    def _connection(self, number: int) -> sqlite3.Connection:
+        connections = self._connections()
+        if number not in connections:
+            _, db_path, immutable = self.databases[number]
+            connections[number] = connect_readonly(db_path, immutable=immutable, tune=False)
+        return connections[number]
+    
+    def _index(self) -> sqlite3.Connection:
+        connections = self._connections()
+        if 'index' not in connections:
+            connections['index'] = connect_readonly(self.index_path, tune=False)
+        return connections['index']
+    
+    def __len__(self) -> int:
+        if not self.numbers:
+            return 0
+        ids = list(self.numbers)
+        return self._index().execute(
+            f"SELECT COUNT(*) FROM locations WHERE database_id IN ({','.join('?' * len(ids))})", ids).fetchone()[0]
+    
+    def locate(self, composer_id: str) -> Dict[str, Tuple[int, str]]:
+        """bubble ID -> (database number, table) for one conversation, preferred database first"""
+        located = {}
+        for bubble_id, db_id, table in self._index().execute(
+                "SELECT bubble_id, database_id, tbl FROM locations WHERE composer_id = ?", (composer_id,)):
+            number = self.numbers.get(db_id)
+            if number is not None and (bubble_id not in located or number < located[bubble_id][0]):
+                located[bubble_id] = (number, table)
+        return located
+    
+    def resolve(self, composer_id: str, bubble_ids: Iterable[str], found: Container[str] = (),
+                inline: Container[str] = ()) -> Dict[str, List]:
+        """Raw values of the bubbles in ``bubble_ids`` that are in neither ``inline`` nor ``found``
+        
+        ``inline`` holds the bubble IDs embedded in composerData and ``found`` the ones
+        the caller already has from the global database. The rest are grouped by the
+        database and table that hold them and fetched with one query per group; bubbles
+        no database holds cost no query. Coverage counters are updated for every bubble
+        asked for.
+        """
+        bubble_ids = list(bubble_ids)
+        wanted = [b for b in bubble_ids if b not in inline and b not in found]
+        located = self.locate(composer_id) if wanted else {}
+        groups: Dict[Tuple[int, str], List[str]] = {}
+        missing = 0
+        
+        for bubble_id in bubble_ids:
+            self.stats['messages'] = self.stats.get('messages', 0) + 1
+            if bubble_id in inline:
+                self.stats[INLINE_SOURCE] = self.stats.get(INLINE_SOURCE, 0) + 1
+            elif bubble_id in found:
+                self.stats[GLOBAL_SOURCE] = self.stats.get(GLOBAL_SOURCE, 0) + 1
+            elif bubble_id in located:
+                groups.setdefault(located[bubble_id], []).append(bubble_id)
+            else:
+                missing += 1
+        
+        rows = {}
+        prefix = f"bubbleId:{composer_id}:"
+        for (number, table), ids in groups.items():
+            keys = [prefix + bubble_id for bubble_id in ids]
+            try:
+                for key, value in self._connection(number).execute(
+                    f"SELECT key, value FROM {table} WHERE key IN ({','.join('?' * len(keys))})", keys
+                ):
+                    rows.setdefault(key[len(prefix):], []).append(value)
+            except sqlite3.Error as e:
+                print(f"    Error reading bubbles from {self.databases[number][0]}: {e}")
+            label = self.databases[number][0]
+            self.stats[label] = self.stats.get(label, 0) + len(ids)
+        
+        self.stats['missing'] = self.stats.get('missing', 0) + missing
+        return rows
+    
+    def merge_stats(self, stats: Dict[str, int]):
+        """Add coverage counters collected by a worker process"""
+        for name, count in stats.items():
+            self.stats[name] = self.stats.get(name, 0) + count
+    
+    def coverage_report(self) -> List[str]:
+        """One line per source: bubbles resolved from it and its share of all messages"""
+        total = self.stats.get('messages', 0)
+        if not total:
+            return []
+        
+        lines = [f"📚 Bubble coverage ({total} messages):"]
+        fixed = (INLINE_SOURCE, GLOBAL_SOURCE, 'messages', 'missing')
+        names = [INLINE_SOURCE, GLOBAL_SOURCE] + sorted(name for name in self.stats if name not in fixed)
+        for name in names + ['missing']:
+            count = self.stats.get(name, 0)
+            lines.append(f"   {name:<40} {count:>8} ({count / total:.1%})")
+        return lines
+    
+    def close(self):
+        for conn in self._connections().values():
+            conn.close()
+        self._local.connections = {}
+
+def open_bubble_sources(backup_dir: Path, global_db: Optional[Tuple[Path, bool]] = None) -> Optional[BubbleSources]:
+    """Bubble lookups over the workspace databases next to a backup (None when there are none)
+    
+    ``global_db`` (path, immutable) puts the global database first, for scripts that
+    look up every bubble through the index. The index lives in <backup_dir>/bubble_locations.db.
+    """
+    databases = discover_workspace_databases(backup_dir)
+    if global_db is not None:
+        databases = [(GLOBAL_SOURCE, Path(global_db[0]), global_db[1])] + databases
+    if not databases:
+        return None
+    
+    sources = BubbleSources(databases, Path(backup_dir) / LOCATION_INDEX)
+    refreshed = sources.refresh_stats
+    print(f"🗂️  Bubble index: {len(sources)} key(s) in {len(databases)} database(s) "
+          f"({refreshed['indexed']} rescanned, {refreshed['unchanged']} unchanged)")
+    return sources
+
+def main():
+    """Command line: list the indexed databases and how many bubbles each holds"""
+    backup_dir = Path(__file__).parent
+    databases = discover_workspace_databases(backup_dir)
+    global_db = find_global_database(backup_dir)
+    if global_db is not None:
+        databases = [(GLOBAL_SOURCE, Path(global_db[0]), global_db[1])] + databases
+    if not databases:
+        print("No databases found")
+        return 1
+    
+    sources = BubbleSources(databases, backup_dir / LOCATION_INDEX)
+    index = BubbleLocationIndex(sources.index_path)
+    try:
+        counts = dict(index.conn.execute("SELECT path, bubbles FROM databases"))
+    finally:
+        index.close()
+    for label, db_path, _ in databases:
+        print(f"{label:<40} {counts.get(str(Path(db_path).resolve()), 0):>8} bubble(s)  {db_path}")
+    print(f"\n{len(sources)} bubble(s) indexed in {sources.index_path.name}")
+    sources.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,248 @@
+"""
+Indexed archive of extracted conversation records (all_conversations.cca)
+Every record is stored as its own, independently decodable (optionally compressed) JSON
+segment, and an offset table maps record keys and composer IDs to segments. Readers
+map the file with mmap and decode only the record they ask for, so fetching one
+composer does not parse the rest of the archive
+
+Layout: a fixed header (magic, version, offset and length of the table), the segments,
+then the table as JSON. zstd needs the optional 'zstandard' package
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ARCHIVE_SUFFIX = '.cca'
+ARCHIVE_MAGIC = b'CURSORCA'
+ARCHIVE_VERSION = 1
+
+# magic, version, reserved, table offset, table length
+HEADER = struct.Struct('<8sHHQQ')
+
+CODECS = ('none', 'zlib', 'zstd')
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 10
+
+def missing_dependency(codec: str) -> Optional[str]:
+    """Package needed for a codec that is not installed (None if usable)"""
+    if codec == 'zstd' and zstandard is None:
+        return 'zstandard'
+    return None
+
+def _compress(data: bytes, codec: str) -> bytes:
+    if codec == 'zlib':
+        return zlib.compress(data, ZLIB_LEVEL)
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return data
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == 'zlib':
+        return zlib.decompress(data)
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("Reading zstd archives needs the 'zstandard' package")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return data
+
+def write_archive(path: Path, records: Iterable[Tuple[str, Dict]], codec: str = 'zlib') -> Dict:
+    """Write (index key, record) pairs to an archive and return its manifest record
+    
+    Records are encoded and written one at a time, so the caller can stream them from
+    the conversation store. The file is replaced atomically. Like write_encoded(), the
+    record carries the format, raw size and encode time for the format report.
+    """
+    path = Path(path)
+    tmp_path = path.parent / (path.name + '.tmp')
+    entries = []
+    raw_size = 0
+    encode_s = 0.0
+    
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, 0, 0, 0))
+        offset = HEADER.size
+        for index_key, record in records:
+            start = time.perf_counter()
+            raw = json.dumps(record, ensure_ascii=False, default=str).encode('utf-8')
+            segment = _compress(raw, codec)
+            encode_s += time.perf_counter() - start
+            f.write(segment)
+            
+            key = record.get('key', index_key)
+            entries.append({
+                'index_key': index_key,
+                'key': key,
+                'composer_id': key[len('composerData:'):] if key.startswith('composerData:') else None,
+                'offset': offset,
+                'length': len(segment),
+                'raw_size': len(raw),
+                'sha256': hashlib.sha256(raw).hexdigest()
+            })
+            offset += len(segment)
+            raw_size += len(raw)
+        
+        table = json.dumps({'codec': codec, 'entries': entries}, ensure_ascii=False).encode('utf-8')
+        f.write(table)
+        f.seek(0)
+        f.write(HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, 0, offset, len(table)))
+    
+    os.replace(tmp_path, path)
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return {'path': path.name, 'size': offset + len(table), 'sha256': digest.hexdigest(),
+            'format': f"cca/{codec}", 'raw_size': raw_size, 'encode_s': round(encode_s, 6)}
+
+class ConversationArchive:
+    """Read-only view of an archive; records are decoded on demand from an mmap
+    
+    Records can be looked up by index key ('<table>/<key>'), by record key (the first
+    table wins when both hold it) or by composer ID. Use as a context manager, or
+    call close(), so the mapping is released (Windows keeps mapped files locked).
+    """
+    
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        try:
+            magic, version, _, table_offset, table_length = HEADER.unpack_from(self._map, 0)
+            if magic != ARCHIVE_MAGIC:
+                raise ValueError(f"{self.path.name} is not a conversation archive")
+            if version != ARCHIVE_VERSION:
+                raise ValueError(f"{self.path.name} has archive version {version}, expected {ARCHIVE_VERSION}")
+            table = json.loads(self._map[table_offset:table_offset + table_length].decode('utf-8'))
+        except Exception:
+            self.close()
+            raise
+        
+        self.codec = table['codec']
+        self.entries: List[Dict] = table['entries']
+        self._lookup: Dict[str, Dict] = {}
+        for entry in self.entries:
+            self._lookup[entry['index_key']] = entry
+            self._lookup.setdefault(entry['key'], entry)
+            if entry['composer_id']:
+                self._lookup.setdefault(entry['composer_id'], entry)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self._lookup
+    
+    def entry(self, key: str) -> Optional[Dict]:
+        """Table entry for an index key, record key or composer ID"""
+        return self._lookup.get(key)
+    
+    def read_raw(self, key: str) -> Optional[bytes]:
+        """Uncompressed JSON bytes of one record, None if the archive does not hold it"""
+        entry = self._lookup.get(key)
+        if entry is None:
+            return None
+        return _decompress(self._map[entry['offset']:entry['offset'] + entry['length']], self.codec)
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """Decode one record ({'key', 'data', 'extracted_at'}), None if the archive does not hold it"""
+        raw = self.read_raw(key)
+        return json.loads(raw.decode('utf-8')) if raw is not None else None
+    
+    def __iter__(self) -> Iterator[Dict]:
+        """Every record in archive order (the order of all_conversations.json)"""
+        for entry in self.entries:
+            yield self.get(entry['index_key'])
+    
+    def verify(self) -> List[str]:
+        """Index keys whose segment no longer matches its checksum"""
+        bad = []
+        for entry in self.entries:
+            try:
+                raw = self.read_raw(entry['index_key'])
+            except Exception:
+                raw = None
+            if raw is None or hashlib.sha256(raw).hexdigest() != entry['sha256']:
+                bad.append(entry['index_key'])
+        return bad
+    
+    def close(self):
+        if getattr(self, '_map', None) is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def main(argv=None):
+    """Command line: list, fetch or verify the records of an archive"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--archive', type=Path,
+                        default=Path(__file__).parent / 'conversations' / f"all_conversations{ARCHIVE_SUFFIX}",
+                        help='archive file (default: %(default)s)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='records with their size in the archive')
+    get_parser = commands.add_parser('get', help='print one record as JSON')
+    get_parser.add_argument('key', help="composer ID, record key or '<table>/<key>'")
+    get_parser.add_argument('--output', type=Path, help='output file (default: standard output)')
+    commands.add_parser('verify', help='check every record against its checksum')
+    args = parser.parse_args(argv)
+    
+    try:
+        archive = ConversationArchive(args.archive)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+    
+    with archive:
+        if args.command == 'list':
+            for entry in archive.entries:
+                print(f"{entry['index_key']:<70} {entry['length'] / 1024:>8.1f} KB "
+                      f"({entry['raw_size'] / 1024:.1f} KB raw)")
+            print(f"\n{len(archive)} record(s), codec {archive.codec}")
+            return 0
+        
+        if args.command == 'verify':
+            bad = archive.verify()
+            for index_key in bad:
+                print(f"❌ {index_key}: checksum mismatch")
+            print(f"{'❌' if bad else '✅'} {len(archive)} record(s) checked, {len(bad)} damaged")
+            return 1 if bad else 0
+        
+        record = archive.get(args.key)
+        if record is None:
+            print(f"❌ No record for {args.key}")
+            return 1
+        text = json.dumps(record, indent=2, ensure_ascii=False)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                f.write(text)
+            print(f"✅ {record['key']} written to {args.output}")
+        else:
+            print(text)
+        return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,368 @@
+"""
+Output formats for extracted conversations: plain JSON, gzip/zstd-compressed JSON Lines
+and MessagePack, with readers that pick the format from the file name
+zstd and MessagePack need the optional 'zstandard' and 'msgpack' packages. The readers
+also accept FULL_<stem>.delta directories written by delta_store.py
+"""
+import gzip
+import hashlib
+import io
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from delta_store import DELTA_SUFFIX, INDEX_NAME, iter_delta_records
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Format name -> suffix of list/conversation files (JSON Lines when compressed)
+FORMATS = {
+    'json': '.json',
+    'jsonl.gz': '.jsonl.gz',
+    'jsonl.zst': '.jsonl.zst',
+    'msgpack': '.msgpack',
+}
+
+# Suffix of single-document files (conversation store blobs) in each format
+DOCUMENT_SUFFIXES = {
+    'json': '.json',
+    'jsonl.gz': '.json.gz',
+    'jsonl.zst': '.json.zst',
+    'msgpack': '.msgpack',
+}
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 10
+
+# Every suffix a reader may meet, longest first so '.jsonl.gz' wins over '.gz'
+_READ_SUFFIXES = ('.jsonl.gz', '.jsonl.zst', '.json.gz', '.json.zst', '.msgpack', '.jsonl', '.json', DELTA_SUFFIX)
+
+def available_formats() -> List[str]:
+    """Formats whose optional dependency is installed"""
+    return [fmt for fmt in FORMATS if missing_dependency(fmt) is None]
+
+def missing_dependency(fmt: str) -> Optional[str]:
+    """Package needed for a format that is not installed (None if usable)"""
+    if fmt == 'jsonl.zst' and zstandard is None:
+        return 'zstandard'
+    if fmt == 'msgpack' and msgpack is None:
+        return 'msgpack'
+    return None
+
+def data_suffix(path) -> str:
+    """The format suffix of a file name ('.jsonl.gz', '.json', ...), '' if unknown"""
+    name = Path(path).name
+    for suffix in _READ_SUFFIXES:
+        if name.endswith(suffix):
+            return suffix
+    return ''
+
+def strip_data_suffix(path) -> str:
+    """File name without its format suffix"""
+    name = Path(path).name
+    suffix = data_suffix(name)
+    return name[:-len(suffix)] if suffix else Path(name).stem
+
+def signature_file(path) -> Path:
+    """The file whose size and mtime show a data file changed (index.json for a .delta directory)"""
+    path = Path(path)
+    return path / INDEX_NAME if data_suffix(path) == DELTA_SUFFIX else path
+
+def find_data_file(directory, stem: str) -> Optional[Path]:
+    """Newest data file named <stem><suffix> in directory, whatever its format"""
+    candidates = [Path(directory) / f"{stem}{suffix}" for suffix in _READ_SUFFIXES]
+    existing = [path for path in candidates if signature_file(path).exists()]
+    return max(existing, key=lambda path: signature_file(path).stat().st_mtime_ns) if existing else None
+
+def format_of(suffix: str) -> str:
+    """Format name for a file suffix ('.json.gz' -> 'jsonl.gz', '.jsonl' -> 'jsonl')"""
+    for fmt, fmt_suffix in FORMATS.items():
+        if suffix in (fmt_suffix, DOCUMENT_SUFFIXES[fmt]):
+            return fmt
+    return suffix.lstrip('.') or 'json'
+
+def _compress(data: bytes, suffix: str) -> bytes:
+    if suffix.endswith('.gz'):
+        # mtime=0 keeps the output (and its hash) identical for identical input
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    if suffix.endswith('.zst'):
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return data
+
+def _decompress(data: bytes, suffix: str) -> bytes:
+    if suffix.endswith('.gz'):
+        return gzip.decompress(data)
+    if suffix.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError("Reading .zst files needs the 'zstandard' package")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return data
+
+def _pack(obj) -> bytes:
+    return msgpack.packb(obj, use_bin_type=True, default=str)
+
+def _unpack(data: bytes):
+    if msgpack is None:
+        raise RuntimeError("Reading .msgpack files needs the 'msgpack' package")
+    return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+def _jsonl(records: Iterable) -> bytes:
+    return ''.join(json.dumps(record, ensure_ascii=False, default=str) + '\n' for record in records).encode('utf-8')
+
+def _read_jsonl(data: bytes) -> List:
+    return [json.loads(line) for line in data.decode('utf-8').splitlines() if line.strip()]
+
+def conversation_records(conversation: Dict) -> List[Dict]:
+    """JSON Lines layout of a conversation: header record, one line per message, summary record"""
+    header = {'record': 'conversation'}
+    summary = {'record': 'summary'}
+    for key, value in conversation.items():
+        if key in ('composer_id', 'total_messages', 'extracted_at'):
+            header[key] = value
+        elif key != 'messages':
+            summary[key] = value
+    return [header] + list(conversation.get('messages', [])) + [summary]
+
+def conversation_from_records(records: Iterable[Dict]) -> Dict:
+    """Inverse of conversation_records (also reads streamed FULL_*.jsonl files)"""
+    conversation = {'messages': []}
+    for record in records:
+        if 'record' in record:
+            record = dict(record)
+            record.pop('record')
+            conversation.update(record)
+        else:
+            conversation['messages'].append(record)
+    return conversation
+
+def encode_conversation(conversation: Dict, fmt: str) -> bytes:
+    """Serialise a FULL conversation (plain JSON is the historical indent=2 layout)"""
+    if fmt == 'json':
+        return json.dumps(conversation, indent=2, ensure_ascii=False, default=str).encode('utf-8')
+    if fmt == 'msgpack':
+        return _pack(conversation)
+    return _compress(_jsonl(conversation_records(conversation)), FORMATS[fmt])
+
+def encode_records(records: List, fmt: str) -> bytes:
+    """Serialise a list of records (all_conversations, all_recoveries), one line each"""
+    if fmt == 'json':
+        return json.dumps(records, indent=2, ensure_ascii=False, default=str).encode('utf-8')
+    if fmt == 'msgpack':
+        return _pack(records)
+    return _compress(_jsonl(records), FORMATS[fmt])
+
+def encode_document(document, fmt: str) -> bytes:
+    """Serialise one document; compressed formats compress the indent=2 JSON text"""
+    if fmt == 'msgpack':
+        return _pack(document)
+    return _compress(json.dumps(document, indent=2, ensure_ascii=False).encode('utf-8'), DOCUMENT_SUFFIXES[fmt])
+
+def decode(data: bytes, suffix: str):
+    """Decode file contents according to a suffix from data_suffix()"""
+    if suffix == '.msgpack':
+        return _unpack(data)
+    data = _decompress(data, suffix)
+    if suffix.startswith('.jsonl'):
+        return _read_jsonl(data)
+    return json.loads(data.decode('utf-8'))
+
+def read_data(path):
+    """Load any supported file: a document, or a list of records for JSON Lines"""
+    path = Path(path)
+    if data_suffix(path) == DELTA_SUFFIX:
+        return list(iter_delta_records(path))
+    with open(path, 'rb') as f:
+        data = f.read()
+    start = time.perf_counter()
+    value = decode(data, data_suffix(path))
+    _stats.add_decode(format_of(data_suffix(path)), len(data), time.perf_counter() - start)
+    return value
+
+def read_text(path) -> str:
+    """JSON text of a plain or compressed .json document (for selective parsers)"""
+    path = Path(path)
+    with open(path, 'rb') as f:
+        return _decompress(f.read(), data_suffix(path)).decode('utf-8')
+
+def iter_records(path) -> Iterator[Tuple[Dict, Optional[int], Optional[int]]]:
+    """Stream the records of a JSON Lines file (.jsonl, .jsonl.gz, .jsonl.zst) one at a time
+    
+    Yields (record, byte offset, byte length). Offsets are only given for plain .jsonl
+    files, where they can be used to seek straight back to a record. A .delta directory
+    yields the records of its latest snapshot.
+    """
+    path = Path(path)
+    suffix = data_suffix(path)
+    if suffix == DELTA_SUFFIX:
+        for record in iter_delta_records(path):
+            yield record, None, None
+        return
+    if suffix == '.jsonl':
+        with open(path, 'rb') as f:
+            offset = 0
+            for line in f:
+                if line.strip():
+                    yield json.loads(line), offset, len(line)
+                offset += len(line)
+        return
+    
+    if suffix == '.jsonl.gz':
+        f = gzip.open(path, 'rb')
+    elif suffix == '.jsonl.zst':
+        if zstandard is None:
+            raise RuntimeError("Reading .zst files needs the 'zstandard' package")
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+        f = io.TextIOWrapper(reader, encoding='utf-8')
+    else:
+        raise ValueError(f"Not a JSON Lines file: {path.name}")
+    with f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line), None, None
+
+def load_conversation(path) -> Dict:
+    """Load a FULL conversation in any format (.json, .jsonl, .jsonl.gz, .jsonl.zst, .msgpack, .delta)"""
+    value = read_data(path)
+    if isinstance(value, list):
+        return conversation_from_records(value)
+    return value
+
+def write_encoded(path: Path, obj, encoder, fmt: str) -> Dict:
+    """Write ``encoder(obj, fmt)`` to path and return the manifest record
+    
+    Compressed and binary records also carry the format, the size the data takes as
+    compact uncompressed JSON (raw_size) and the encode time, so ratios and throughput
+    can be reported even when the files were written by worker processes.
+    """
+    start = time.perf_counter()
+    data = encoder(obj, fmt)
+    encode_s = time.perf_counter() - start
+    with open(path, 'wb') as f:
+        f.write(data)
+    
+    output = {'path': Path(path).name, 'size': len(data), 'sha256': hashlib.sha256(data).hexdigest()}
+    if fmt != 'json':
+        if fmt == 'msgpack':
+            raw_size = len(json.dumps(obj, ensure_ascii=False, default=str).encode('utf-8'))
+        else:
+            raw_size = len(_decompress(data, FORMATS[fmt]))
+        output.update(format=fmt, raw_size=raw_size, encode_s=round(encode_s, 6))
+    return output
+
+class FormatStats:
+    """Bytes and time spent encoding/decoding per format, for end-of-run reports"""
+    
+    def __init__(self):
+        self.formats: Dict[str, Dict[str, float]] = {}
+    
+    def _entry(self, fmt: str) -> Dict[str, float]:
+        return self.formats.setdefault(fmt, {'files': 0, 'raw': 0, 'stored': 0, 'encode_s': 0.0,
+                                             'decoded': 0, 'decode_s': 0.0})
+    
+    def add_output(self, output: Dict):
+        """Count an output record returned by write_encoded (plain JSON ones are ignored)"""
+        if not output.get('format'):
+            return
+        entry = self._entry(output['format'])
+        entry['files'] += 1
+        entry['raw'] += output['raw_size']
+        entry['stored'] += output['size']
+        entry['encode_s'] += output['encode_s']
+    
+    def add_decode(self, fmt: str, size: int, seconds: float):
+        entry = self._entry(fmt)
+        entry['decoded'] += size
+        entry['decode_s'] += seconds
+    
+    def report(self) -> List[str]:
+        lines = []
+        for fmt, entry in sorted(self.formats.items()):
+            parts = []
+            if entry['files']:
+                ratio = entry['raw'] / entry['stored'] if entry['stored'] else 0
+                parts.append(f"{entry['files']} file(s), {_size(entry['raw'])} → {_size(entry['stored'])} ({ratio:.1f}x)")
+                if entry['encode_s']:
+                    parts.append(f"encode {entry['raw'] / entry['encode_s'] / 1e6:.1f} MB/s")
+            if entry['decode_s'] and fmt not in ('json', 'jsonl'):
+                parts.append(f"decode {entry['decoded'] / entry['decode_s'] / 1e6:.1f} MB/s (compressed)")
+            if parts:
+                lines.append(f"📦 {fmt}: " + ', '.join(parts))
+        return lines
+
+# Decode timings of this process (encodes are counted from the output records)
+_stats = FormatStats()
+
+def report(outputs: Iterable[Dict] = ()) -> List[str]:
+    """Report lines for ``outputs`` written by write_encoded plus this process's reads"""
+    combined = FormatStats()
+    combined.formats = {fmt: dict(entry) for fmt, entry in _stats.formats.items()}
+    for output in outputs:
+        combined.add_output(output)
+    return combined.report()
+
+def _size(size: float) -> str:
+    return f"{size / 1024 / 1024:.1f} MB" if size >= 1024 * 1024 else f"{size / 1024:.0f} KB"
+
+def compare_formats(paths: List[Path]) -> List[Dict]:
+    """Re-encode existing files in every available format and measure ratio and throughput"""
+    documents = [load_conversation(p) if Path(p).name.startswith('FULL_') else read_data(p) for p in paths]
+    raw = sum(len(_jsonl(d if isinstance(d, list) else [d])) for d in documents)
+    results = []
+    
+    for fmt in available_formats():
+        start = time.perf_counter()
+        encoded = [encode_records(d, fmt) if isinstance(d, list) else encode_conversation(d, fmt) for d in documents]
+        encode_s = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        for data in encoded:
+            decode(data, FORMATS[fmt])
+        decode_s = time.perf_counter() - start
+        
+        stored = sum(len(data) for data in encoded)
+        results.append({
+            'format': fmt,
+            'stored': stored,
+            'ratio': raw / stored if stored else 0,
+            'encode_mb_s': raw / encode_s / 1e6 if encode_s else 0,
+            'decode_mb_s': raw / decode_s / 1e6 if decode_s else 0,
+        })
+    return results
+
+def main():
+    """Command line: python conversation_io.py compare <files or directories>"""
+    if len(sys.argv) < 3 or sys.argv[1] != 'compare':
+        print("Usage: python conversation_io.py compare <files or directories>")
+        return 1
+    
+    paths = []
+    for arg in sys.argv[2:]:
+        arg = Path(arg)
+        paths.extend(sorted(p for p in arg.iterdir() if data_suffix(p)) if arg.is_dir() else [arg])
+    if not paths:
+        print("❌ No data files found")
+        return 1
+    
+    print(f"Comparing formats on {len(paths)} file(s) (ratio and MB/s against compact JSON)")
+    missing = [f"{fmt} (pip install {missing_dependency(fmt)})" for fmt in FORMATS if missing_dependency(fmt)]
+    if missing:
+        print(f"⚠️  Not available: {', '.join(missing)}")
+    
+    print(f"\n{'format':<10} {'size':>10} {'ratio':>7} {'encode MB/s':>12} {'decode MB/s':>12}")
+    for result in compare_formats(paths):
+        print(f"{result['format']:<10} {_size(result['stored']):>10} {result['ratio']:>6.1f}x "
+              f"{result['encode_mb_s']:>12.1f} {result['decode_mb_s']:>12.1f}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
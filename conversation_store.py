@@ -0,0 +1,248 @@
+"""
+Content-addressed store for extracted composerData records
+Each record is written once to objects/<composer id>/<content hash>.json (or a compressed
+or MessagePack blob, see conversation_io.py) and a small
+index.json maps record keys to blobs, so unchanged or duplicate conversations never
+cost another write (or another blob in git). Records that left the database keep their
+entry and blob; only blobs no entry points at any more (earlier versions of a record
+that changed) are pruned, and those live on in the backup repository's git history
+"""
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from conversation_io import DOCUMENT_SUFFIXES, encode_document, read_data
+
+STORE_DIR = 'store'
+# Index keys of records imported from legacy conversation_*.json files
+LEGACY_PREFIX = 'legacy/'
+INDEX_NAME = 'index.json'
+INDEX_VERSION = 1
+
+def record_slug(key: str) -> str:
+    """File-system friendly form of a record key (same as the old per-record file names)"""
+    return key.replace(':', '_')[:50]
+
+def composer_id_from_key(key: str) -> Optional[str]:
+    if key.startswith('composerData:'):
+        return key[len('composerData:'):]
+    return None
+
+class ConversationStore:
+    """Blob store plus index under <conversations_dir>/store"""
+    
+    def __init__(self, conversations_dir: Path):
+        self.root = Path(conversations_dir) / STORE_DIR
+        self.index_path = self.root / INDEX_NAME
+        self.entries: Dict[str, Dict] = {}
+        self.dirty = False
+        
+        if self.index_path.exists():
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == INDEX_VERSION:
+                self.entries = data.get('entries', {})
+    
+    def exists(self) -> bool:
+        return self.index_path.exists()
+    
+    def put(self, index_key: str, record: Dict, fmt: str = 'json') -> Dict:
+        """Store a {'key', 'data', ...} record under index_key
+        
+        The blob holds exactly the hashed content (key and data), so re-extracting an
+        unchanged conversation maps to the existing blob and nothing is written. The
+        first extraction time is kept in the index as 'stored_at'. Returns the index
+        entry, with 'written' telling whether a new blob was created.
+        
+        The hash is always taken over the indented JSON, so ``fmt`` only changes how the
+        blob is stored, not which records count as duplicates.
+        """
+        document = {'key': record['key'], 'data': record['data']}
+        data = json.dumps(document, indent=2, ensure_ascii=False).encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        
+        composer_id = composer_id_from_key(record['key'])
+        blob = f"objects/{composer_id or record_slug(record['key'])}/{digest[:32]}{DOCUMENT_SUFFIXES[fmt]}"
+        blob_path = self.root / blob
+        
+        written = False
+        if not blob_path.exists():
+            if fmt != 'json':
+                data = encode_document(document, fmt)
+            blob_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = blob_path.parent / (blob_path.name + '.tmp')
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, blob_path)
+            written = True
+        
+        previous = self.entries.get(index_key, {})
+        entry = {
+            'key': record['key'],
+            'composer_id': composer_id,
+            'blob': blob,
+            'sha256': digest,
+            'size': blob_path.stat().st_size,
+            'stored_at': previous['stored_at'] if previous.get('sha256') == digest
+                         else record.get('extracted_at', datetime.now().isoformat())
+        }
+        if previous != entry:
+            self.entries[index_key] = entry
+            self.dirty = True
+        return dict(entry, written=written)
+    
+    def blob_path(self, index_key: str) -> Optional[Path]:
+        entry = self.entries.get(index_key)
+        return self.root / entry['blob'] if entry else None
+    
+    def get(self, index_key: str) -> Optional[Dict]:
+        """Load the record stored under index_key"""
+        path = self.blob_path(index_key)
+        if path is None:
+            return None
+        return read_data(path)
+    
+    def mark_missing(self, index_keys):
+        """Flag entries whose keys are no longer in the database with 'missing_since'
+        
+        The entries and their blobs are kept: a conversation deleted in the editor is the
+        one the backup must not lose. Entries imported by import_legacy_files never come
+        from the database and are left alone.
+        """
+        present = set(index_keys)
+        now = datetime.now().isoformat()
+        for index_key, entry in self.entries.items():
+            if index_key.startswith(LEGACY_PREFIX):
+                continue
+            if index_key in present:
+                if entry.pop('missing_since', None) is not None:
+                    self.dirty = True
+            elif 'missing_since' not in entry:
+                entry['missing_since'] = now
+                self.dirty = True
+    
+    def save(self):
+        """Atomically write the index if it changed"""
+        if not self.dirty:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'entries': self.entries}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.index_path)
+        self.dirty = False
+    
+    def prune(self) -> Tuple[int, int]:
+        """Delete blobs that no index entry references; returns (blobs removed, bytes freed)
+        
+        Every entry, missing from the database or not, keeps its blob, so only the
+        earlier versions of records that changed go. Leftover .tmp files and emptied
+        composer directories go as well.
+        """
+        objects = self.root / 'objects'
+        # An empty (or unreadable) index references nothing; never read that as "delete all"
+        if not self.entries or not objects.is_dir():
+            return 0, 0
+        referenced = {entry['blob'] for entry in self.entries.values()}
+        removed = 0
+        freed = 0
+        for directory in objects.iterdir():
+            if not directory.is_dir():
+                continue
+            for path in directory.iterdir():
+                if f"objects/{directory.name}/{path.name}" in referenced:
+                    continue
+                try:
+                    size = path.stat().st_size
+                    path.unlink()
+                except OSError:
+                    continue
+                removed += 1
+                freed += size
+            try:
+                directory.rmdir()  # Only succeeds once it is empty
+            except OSError:
+                pass
+        return removed, freed
+
+def list_conversation_files(conversations_dir: Path) -> List[Dict]:
+    """List conversation records for the downstream scripts
+    
+    Returns dicts with 'stem' (name used for derived outputs), 'path' (JSON file with
+    the {'key', 'data'} record) and 'composer_id' (may be None). Records come from the
+    store when it exists, otherwise from legacy conversation_*.json files. Index keys
+    pointing at the same blob are listed once.
+    """
+    conversations_dir = Path(conversations_dir)
+    store = ConversationStore(conversations_dir)
+    
+    if not store.exists():
+        return [
+            {'stem': path.stem, 'path': path, 'composer_id': None}
+            for path in sorted(conversations_dir.glob('conversation_*.json'))
+        ]
+    
+    files = []
+    seen_blobs = set()
+    seen_stems = set()
+    for index_key, entry in sorted(store.entries.items()):
+        if entry['blob'] in seen_blobs:
+            continue
+        seen_blobs.add(entry['blob'])
+        
+        stem = f"conversation_{record_slug(entry['key'])}"
+        if stem in seen_stems:
+            # Same key with different content in another table
+            stem = f"{stem}_{index_key.split('/', 1)[0]}"
+        seen_stems.add(stem)
+        
+        files.append({'stem': stem, 'path': store.root / entry['blob'], 'composer_id': entry['composer_id']})
+    return files
+
+def import_legacy_files(conversations_dir: Path) -> int:
+    """Import legacy conversation_*.json files into the store (duplicates share one blob)"""
+    conversations_dir = Path(conversations_dir)
+    store = ConversationStore(conversations_dir)
+    written = 0
+    
+    for path in sorted(conversations_dir.glob('conversation_*.json')):
+        with open(path, 'r', encoding='utf-8') as f:
+            record = json.load(f)
+        if not isinstance(record, dict) or 'key' not in record:
+            continue
+        entry = store.put(f"{LEGACY_PREFIX}{record['key']}", record)
+        written += entry['written']
+        print(f"{'✅ Stored' if entry['written'] else '⏭️  Duplicate'}: {path.name}")
+    
+    store.save()
+    return written
+
+def main():
+    """Command line: python conversation_store.py [import-legacy|prune|stats]"""
+    conversations_dir = Path(__file__).parent / 'conversations'
+    command = sys.argv[1] if len(sys.argv) > 1 else 'stats'
+    
+    if command == 'import-legacy':
+        written = import_legacy_files(conversations_dir)
+        print(f"\n📦 {written} new blob(s) written")
+    elif command == 'prune':
+        removed, freed = ConversationStore(conversations_dir).prune()
+        print(f"🧹 {removed} unreferenced blob(s) removed ({freed / 1024 / 1024:.1f} MB)")
+    elif command == 'stats':
+        store = ConversationStore(conversations_dir)
+        blobs = [p for p in (store.root / 'objects').glob('*/*') if not p.name.endswith('.tmp')] if store.exists() else []
+        size = sum(p.stat().st_size for p in blobs)
+        missing = sum(1 for entry in store.entries.values() if 'missing_since' in entry)
+        print(f"Index entries: {len(store.entries)} ({missing} no longer in the database)")
+        print(f"Blobs: {len(blobs)} ({size / 1024 / 1024:.1f} MB)")
+    else:
+        print("Usage: python conversation_store.py [import-legacy|prune|stats]")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
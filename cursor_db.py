@@ -0,0 +1,99 @@
+"""
+Read-only access to Cursor's state.vscdb without copying the file or locking the editor
+Connections are opened through SQLite URIs (mode=ro, optionally immutable=1), tuned for
+large sequential scans, and consistent snapshots are taken with the online backup API
+"""
+import os
+import sqlite3
+import sys
+from pathlib import Path
+
+# Pragmas for a large read-only scan: map the file instead of copying pages through
+# read(), keep a bigger page cache, and never spill temporary b-trees to disk
+SCAN_PRAGMAS = [
+    ('query_only', 'ON'),
+    ('mmap_size', 256 * 1024 * 1024),
+    ('cache_size', -64 * 1024),  # negative = KiB, i.e. 64 MB
+    ('temp_store', 'MEMORY'),
+]
+
+def sqlite_uri(db_path, immutable: bool = False) -> str:
+    """Build a read-only SQLite URI for a database file
+    
+    ``immutable=1`` skips all locking and change detection, so only use it for files
+    nobody is writing to (backup copies, snapshots), never for the live editor database.
+    """
+    uri = Path(db_path).resolve().as_uri() + '?mode=ro'
+    if immutable:
+        uri += '&immutable=1'
+    return uri
+
+def tune_for_scan(conn: sqlite3.Connection):
+    """Apply the read-only scan pragmas to a connection"""
+    for name, value in SCAN_PRAGMAS:
+        try:
+            conn.execute(f"PRAGMA {name} = {value}")
+        except sqlite3.Error:
+            pass
+
+def connect_readonly(db_path, immutable: bool = False, tune: bool = True) -> sqlite3.Connection:
+    """Open a database read-only so the running editor is never blocked by our reads"""
+    conn = sqlite3.connect(sqlite_uri(db_path, immutable), uri=True)
+    if tune:
+        tune_for_scan(conn)
+    return conn
+
+def snapshot_database(db_path, target=None) -> sqlite3.Connection:
+    """Take a consistent snapshot of a live database through the online backup API
+    
+    The whole database is copied in a single backup step, i.e. within one read
+    transaction, so the result is consistent even while the editor keeps writing.
+    With no ``target`` the snapshot lives in memory; otherwise it is written to the
+    ``target`` file. Returns a connection to the snapshot.
+    """
+    source = connect_readonly(db_path, tune=False)
+    try:
+        if target is None:
+            snapshot = sqlite3.connect(':memory:')
+        else:
+            target = Path(target)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp_target = target.with_name(target.name + '.tmp')
+            if tmp_target.exists():
+                tmp_target.unlink()
+            snapshot = sqlite3.connect(tmp_target)
+        source.backup(snapshot, pages=-1)
+    finally:
+        source.close()
+    
+    if target is not None:
+        snapshot.close()
+        os.replace(tmp_target, target)
+        return connect_readonly(target, immutable=True)
+    
+    tune_for_scan(snapshot)
+    return snapshot
+
+def open_database(db_path, snapshot: bool = False, immutable: bool = False) -> sqlite3.Connection:
+    """Open a database for extraction: an in-memory snapshot or a direct read-only connection"""
+    if snapshot:
+        return snapshot_database(db_path)
+    return connect_readonly(db_path, immutable=immutable)
+
+def main():
+    """Command line: python cursor_db.py snapshot <source.vscdb> <target.vscdb>"""
+    if len(sys.argv) != 4 or sys.argv[1] != 'snapshot':
+        print("Usage: python cursor_db.py snapshot <source.vscdb> <target.vscdb>")
+        return 1
+    
+    source, target = sys.argv[2], sys.argv[3]
+    if not os.path.exists(source):
+        print(f"❌ Database not found: {source}")
+        return 1
+    
+    snapshot_database(source, target).close()
+    print(f"✅ Snapshot written: {target}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
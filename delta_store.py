@@ -0,0 +1,340 @@
+"""
+Append-only delta storage for FULL conversations
+Conversations grow by new bubbles at the end of fullConversationHeadersOnly, so instead
+of rewriting FULL_<stem>.json on every backup the messages live in a FULL_<stem>.delta/
+directory of immutable JSON Lines segments. A run appends one segment holding only the
+new messages; index.json lists the segments with cumulative hashes, so the conversation
+as it was after any earlier run can be rebuilt. A segment's messages start at its
+'first' position and replace whatever earlier segments hold from there on: a last message
+that was still streaming is superseded by the next segment, and when earlier messages
+changed the conversation starts a new generation (one segment with everything, first 0).
+Superseded generations stay until 'prune' removes them
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Name of the format in extract_full_conversations.py --format, and the directory suffix
+DELTA_FORMAT = 'delta'
+DELTA_SUFFIX = '.delta'
+INDEX_NAME = 'index.json'
+INDEX_VERSION = 1
+
+# Conversation fields kept per segment in the index rather than in a summary record
+HEADER_FIELDS = ('composer_id', 'total_messages', 'messages_with_content', 'extracted_at')
+
+def _line(record: Dict) -> bytes:
+    return (json.dumps(record, ensure_ascii=False, default=str) + '\n').encode('utf-8')
+
+def _digest(lines: List[bytes]) -> str:
+    digest = hashlib.sha256()
+    for line in lines:
+        digest.update(line)
+    return digest.hexdigest()
+
+def _digests(lines: List[bytes]) -> Tuple[str, str]:
+    """(hash of all lines, hash of all but the last) in one pass"""
+    digest = hashlib.sha256()
+    for line in lines[:-1]:
+        digest.update(line)
+    head = digest.hexdigest()
+    if lines:
+        digest.update(lines[-1])
+    return digest.hexdigest(), head
+
+def _cutoffs(segments: List[Dict]) -> List[int]:
+    """Per segment, the position from which later segments replace its messages"""
+    cutoffs = []
+    cutoff = None
+    for entry in reversed(segments):
+        cutoffs.append(cutoff)
+        cutoff = entry['first'] if cutoff is None else min(cutoff, entry['first'])
+    cutoffs.reverse()
+    return cutoffs
+
+def _summary(conversation: Dict) -> Dict:
+    """Fields outside the messages that are not tracked per segment (code blocks, file states)"""
+    return {key: value for key, value in conversation.items() if key not in HEADER_FIELDS and key != 'messages'}
+
+def read_index(directory: Path) -> Optional[Dict]:
+    """index.json of a delta directory, None if missing, unreadable or of another version"""
+    try:
+        with open(Path(directory) / INDEX_NAME, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return index if index.get('version') == INDEX_VERSION else None
+
+def _write_index(directory: Path, index: Dict) -> Dict:
+    """Replace index.json atomically and return its manifest record"""
+    data = json.dumps(index, indent=2, ensure_ascii=False).encode('utf-8')
+    index_file = directory / INDEX_NAME
+    temp_file = directory / f"{INDEX_NAME}.tmp"
+    with open(temp_file, 'wb') as f:
+        f.write(data)
+    os.replace(temp_file, index_file)
+    return {'path': f"{directory.name}/{INDEX_NAME}", 'size': len(data), 'sha256': hashlib.sha256(data).hexdigest()}
+
+def _index_record(directory: Path) -> Dict:
+    with open(directory / INDEX_NAME, 'rb') as f:
+        data = f.read()
+    return {'path': f"{directory.name}/{INDEX_NAME}", 'size': len(data), 'sha256': hashlib.sha256(data).hexdigest()}
+
+def put(directory: Path, conversation: Dict) -> Tuple[str, Dict, int]:
+    """Store a conversation snapshot, writing only what the previous one lacks
+    
+    Returns (action, manifest record of index.json, bytes written). The action is 'append'
+    when the stored messages are an unchanged prefix of the new ones (a segment with the
+    new messages, and the summary if it changed, is added), 'supersede' when only the
+    last stored message changed (the segment starts with its new version), 'unchanged'
+    when nothing was written, or 'rewrite' when an earlier message changed and a new
+    generation starts. Segments of earlier generations are kept (see prune()).
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    index = read_index(directory)
+    lines = [_line(msg) for msg in conversation.get('messages', [])]
+    messages_sha256, head_sha256 = _digests(lines)
+    summary = _summary(conversation)
+    summary_sha256 = hashlib.sha256(_line(summary)).hexdigest()
+    
+    action = 'rewrite'
+    first = 0
+    if index and index['segments'] and index.get('composer_id') == conversation.get('composer_id'):
+        last = index['segments'][-1]
+        stored = last['first'] + last['count']
+        if len(lines) >= stored and _digest(lines[:stored]) == last['messages_sha256']:
+            action = 'append'
+            first = stored
+        elif stored and len(lines) >= stored and _digest(lines[:stored - 1]) == last.get('head_sha256'):
+            # Typically the assistant reply that was still streaming during the previous run
+            action = 'supersede'
+            first = stored - 1
+    
+    if action == 'append' and first == len(lines) and summary_sha256 == index.get('summary_sha256'):
+        return 'unchanged', _index_record(directory), 0
+    
+    if action == 'rewrite':
+        index = index or {'version': INDEX_VERSION, 'generation': 0, 'next_segment': 1, 'segments': []}
+        index['composer_id'] = conversation.get('composer_id')
+        index['generation'] += 1
+        # The new generation must not depend on a summary written in an older one
+        index['summary_sha256'] = None
+    
+    # The segment: messages from ``first`` on, then the summary record only if it changed
+    segment_lines = lines[first:]
+    with_summary = summary_sha256 != index['summary_sha256']
+    if with_summary:
+        segment_lines.append(_line(dict({'record': 'summary'}, **summary)))
+    data = b''.join(segment_lines)
+    
+    number = index['next_segment']
+    segment_file = f"segment_{number:06d}.jsonl"
+    with open(directory / segment_file, 'wb') as f:
+        f.write(data)
+    
+    index['segments'].append({
+        'file': segment_file,
+        'generation': index['generation'],
+        'first': first,
+        'count': len(lines) - first,
+        'summary': with_summary,
+        'messages_sha256': messages_sha256,
+        'head_sha256': head_sha256,
+        'total_messages': conversation.get('total_messages', len(lines)),
+        'messages_with_content': conversation.get('messages_with_content'),
+        'extracted_at': conversation.get('extracted_at'),
+        'size': len(data),
+        'sha256': hashlib.sha256(data).hexdigest()
+    })
+    index['next_segment'] = number + 1
+    index['summary_sha256'] = summary_sha256
+    record = _write_index(directory, index)
+    return action, record, len(data) + record['size']
+
+def prune(directory: Path) -> Tuple[int, int]:
+    """Drop the segments of generations before the current one; returns (segments removed, bytes freed)
+    
+    Snapshots taken before the last rewrite can no longer be rebuilt afterwards.
+    """
+    directory = Path(directory)
+    index = read_index(directory)
+    if not index or not index['segments']:
+        return 0, 0
+    # Segments written before the generation field existed all belong to the current one
+    current = index['generation']
+    removed = [entry for entry in index['segments'] if entry.get('generation', current) != current]
+    if not removed:
+        return 0, 0
+    index['segments'] = [entry for entry in index['segments'] if entry.get('generation', current) == current]
+    _write_index(directory, index)
+    for entry in removed:
+        try:
+            (directory / entry['file']).unlink()
+        except OSError:
+            pass
+    return len(removed), sum(entry['size'] for entry in removed)
+
+def iter_delta_records(directory: Path, segment: Optional[int] = None) -> Iterator[Dict]:
+    """Records of a snapshot in JSON Lines order: header, messages, summary
+    
+    ``segment`` (1-based position in the index, negative counts from the end) picks
+    the snapshot; the latest one by default.
+    """
+    directory = Path(directory)
+    index = read_index(directory)
+    if not index or not index['segments']:
+        raise ValueError(f"No delta index in {directory}")
+    segments = index['segments']
+    if segment is not None:
+        if segment == 0 or abs(segment) > len(segments):
+            raise ValueError(f"{directory.name} has {len(segments)} segment(s), no segment {segment}")
+        segments = segments[:segment] if segment > 0 else segments[:len(segments) + segment + 1]
+    last = segments[-1]
+    cutoffs = _cutoffs(segments)
+    
+    yield {
+        'record': 'conversation',
+        'composer_id': index.get('composer_id'),
+        'total_messages': last['total_messages'],
+        'messages_with_content': last['messages_with_content'],
+        'extracted_at': last['extracted_at']
+    }
+    summary = None
+    for entry, cutoff in zip(segments, cutoffs):
+        if cutoff is not None and cutoff <= entry['first'] and not entry['summary']:
+            continue  # Every message replaced by a later segment
+        position = entry['first']
+        with open(directory / entry['file'], 'rb') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if 'record' in record:
+                    summary = record
+                    continue
+                if cutoff is None or position < cutoff:
+                    yield record
+                position += 1
+    if summary is not None:
+        yield summary
+
+def rebuild(directory: Path, segment: Optional[int] = None) -> Dict:
+    """The conversation dict (FULL_<stem>.json layout) as of a segment, the latest by default"""
+    conversation = {}
+    messages = []
+    summary = {}
+    for record in iter_delta_records(directory, segment):
+        kind = record.get('record')
+        if kind == 'conversation':
+            conversation.update((key, value) for key, value in record.items() if key != 'record')
+        elif kind == 'summary':
+            summary = {key: value for key, value in record.items() if key != 'record'}
+        else:
+            messages.append(record)
+    # Same key order as a FULL_<stem>.json written directly
+    extracted_at = conversation.pop('extracted_at', None)
+    conversation['messages'] = messages
+    conversation.update(summary)
+    conversation['extracted_at'] = extracted_at
+    return conversation
+
+def verify(directory: Path) -> List[str]:
+    """Problems found in a delta directory (missing or altered segments), empty if sound"""
+    directory = Path(directory)
+    index = read_index(directory)
+    if not index:
+        return [f"{directory.name}: no readable {INDEX_NAME}"]
+    problems = []
+    lines = []
+    for entry in index['segments']:
+        try:
+            with open(directory / entry['file'], 'rb') as f:
+                data = f.read()
+        except OSError:
+            problems.append(f"{directory.name}/{entry['file']}: missing")
+            continue
+        if hashlib.sha256(data).hexdigest() != entry['sha256']:
+            problems.append(f"{directory.name}/{entry['file']}: content changed")
+            continue
+        lines[entry['first']:] = [line + b'\n' for line in data.splitlines()
+                                  if line.strip() and 'record' not in json.loads(line)]
+        if _digest(lines) != entry['messages_sha256']:
+            problems.append(f"{directory.name}/{entry['file']}: messages do not match the index")
+    return problems
+
+def main(argv=None):
+    """Command line: list delta conversations, rebuild a snapshot, verify or prune the segments"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dir', type=Path, default=Path(__file__).parent / 'full_conversations',
+                        help='directory holding the FULL_<stem>.delta directories (default: %(default)s)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='segments, messages and size of every delta conversation')
+    rebuild_parser = commands.add_parser('rebuild', help='write a snapshot as FULL_<stem>.json layout')
+    rebuild_parser.add_argument('stem', help='conversation stem (FULL_<stem>.delta) or path of the directory')
+    rebuild_parser.add_argument('--segment', type=int,
+                                help='snapshot after this segment (1 = first run, -2 = the run before the last)')
+    rebuild_parser.add_argument('--output', type=Path, help='output file (default: standard output)')
+    commands.add_parser('verify', help='check every segment against the index hashes')
+    commands.add_parser('prune', help='remove the segments of superseded generations')
+    args = parser.parse_args(argv)
+    
+    directories = sorted(args.dir.glob(f"FULL_*{DELTA_SUFFIX}"))
+    
+    if args.command == 'list':
+        if not directories:
+            print(f"No {DELTA_SUFFIX} conversations in {args.dir}")
+            return 1
+        for directory in directories:
+            index = read_index(directory)
+            if not index or not index['segments']:
+                print(f"⚠️  {directory.name}: no readable {INDEX_NAME}")
+                continue
+            size = sum(segment['size'] for segment in index['segments'])
+            last = index['segments'][-1]
+            print(f"{directory.name:<40} gen {index['generation']:>3} {len(index['segments']):>5} segment(s) "
+                  f"{last['first'] + last['count']:>6} message(s) {size / 1024:>9.0f} KB  {last['extracted_at']}")
+        return 0
+    
+    if args.command == 'verify':
+        problems = [problem for directory in directories for problem in verify(directory)]
+        for problem in problems:
+            print(f"❌ {problem}")
+        print(f"{'❌' if problems else '✅'} {len(directories)} delta conversation(s) checked, {len(problems)} problem(s)")
+        return 1 if problems else 0
+    
+    if args.command == 'prune':
+        removed = freed = 0
+        for directory in directories:
+            segments, size = prune(directory)
+            if segments:
+                print(f"🧹 {directory.name}: {segments} segment(s), {size / 1024:.0f} KB")
+            removed += segments
+            freed += size
+        print(f"🧹 {removed} superseded segment(s) removed ({freed / 1024 / 1024:.1f} MB)")
+        return 0
+    
+    directory = Path(args.stem)
+    if not directory.is_dir():
+        stem = args.stem[len('FULL_'):] if args.stem.startswith('FULL_') else args.stem
+        directory = args.dir / f"FULL_{stem}{DELTA_SUFFIX}"
+    try:
+        conversation = rebuild(directory, args.segment)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+    text = json.dumps(conversation, indent=2, ensure_ascii=False, default=str)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"✅ {len(conversation['messages'])} message(s) written to {args.output}")
+    else:
+        print(text)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,19 +1,51 @@
 """
 Extract Cursor conversations from database and save as JSON files
 This extracts only conversation content, not secrets/API keys
+Only conversations that changed since the last run are re-extracted (see extraction_manifest.py)
+and each distinct record is stored once in a content-addressed store (see conversation_store.py).
+--archive writes the combined records as an indexed archive (see conversation_archive.py)
 """
-import sqlite3
-import json
 import os
+import argparse
 from datetime import datetime
 from pathlib import Path
 
-def extract_conversations():
-    """Extract conversations from Cursor's state.vscdb database"""
+from conversation_archive import ARCHIVE_SUFFIX, CODECS, missing_dependency as archive_dependency, write_archive
+from conversation_io import (DOCUMENT_SUFFIXES, FORMATS, encode_records, missing_dependency,
+                             report as format_report, write_encoded)
+from conversation_store import ConversationStore
+from cursor_db import open_database
+from extraction_core import database_candidates, decode_value, remember_document
+from extraction_manifest import ExtractionManifest, MANIFEST_NAME, read_watermarks
+from instrumentation import add_profile_argument, count, instrumented_run, stage
+
+MANIFEST_SECTION = 'conversations'
+
+# (table, filter) pairs in the order records are listed in all_conversations.json
+SOURCES = [
+    ('ItemTable', "key LIKE 'composerData:%'"),
+    ('cursorDiskKV', "key LIKE '%composer%' OR key LIKE '%conversation%'"),
+]
+
+def extract_conversations(db_path=None, output_dir=None, full=False, snapshot=False, output_format='json',
+                          archive_codec=None, composers=None):
+    """Extract conversations from Cursor's state.vscdb database
     
-    # Paths
-    db_path = os.path.join(os.environ['APPDATA'], 'Cursor', 'User', 'globalStorage', 'state.vscdb')
-    output_dir = Path(__file__).parent / 'conversations'
+    Unless ``full`` is set, records whose watermark (lastUpdatedAt, header count,
+    size) matches the manifest and whose output file is intact are not rewritten.
+    The database is opened read-only; ``snapshot`` reads from an in-memory copy
+    taken with the SQLite backup API instead. ``output_format`` selects how store
+    blobs and the combined all_conversations file are written (see conversation_io.py).
+    With ``archive_codec`` the combined file is all_conversations.cca instead, an indexed
+    archive whose records can be read one at a time (see conversation_archive.py).
+    ``composers`` limits re-extraction to those composer IDs; every other record is
+    listed from the store as it was (see watch_backup.py).
+    """
+    
+    # Paths (the live database; auto-backup.bat snapshots it only after this runs)
+    if db_path is None:
+        db_path, _ = database_candidates(Path(__file__).parent)[0]
+    output_dir = Path(output_dir) if output_dir else Path(__file__).parent / 'conversations'
     output_dir.mkdir(exist_ok=True)
     
     if not os.path.exists(db_path):
@@ -21,65 +53,155 @@ def extract_conversations():
         return
     
     print(f"Reading database: {db_path}")
-    conn = sqlite3.connect(db_path)
+    conn = open_database(db_path, snapshot=snapshot)
     cursor = conn.cursor()
     
-    conversations = []
+    manifest = ExtractionManifest(output_dir.parent / MANIFEST_NAME)
+    store = ConversationStore(output_dir)
     
-    # Try to get conversations from ItemTable
-    try:
-        cursor.execute("SELECT key, value FROM ItemTable WHERE key LIKE 'composerData:%'")
-        rows = cursor.fetchall()
-        for key, value in rows:
+    # List candidate records with their watermarks (no values decoded yet)
+    candidates = []
+    with stage('watermarks'):
+        for table, where in SOURCES:
             try:
-                data = json.loads(value) if isinstance(value, str) else value
-                conversations.append({
-                    'key': key,
-                    'data': data,
-                    'extracted_at': datetime.now().isoformat()
-                })
-            except:
-                pass
-    except Exception as e:
-        print(f"Error reading ItemTable: {e}")
+                for key, watermark in read_watermarks(conn, table, where):
+                    candidates.append((table, key, watermark))
+            except Exception as e:
+                print(f"Error reading {table}: {e}")
     
-    # Try cursorDiskKV table
-    try:
-        cursor.execute("SELECT key, value FROM cursorDiskKV WHERE key LIKE '%composer%' OR key LIKE '%conversation%'")
-        rows = cursor.fetchall()
-        for key, value in rows:
-            try:
-                if isinstance(value, bytes):
-                    value = value.decode('utf-8', errors='ignore')
-                data = json.loads(value) if isinstance(value, str) else value
-                conversations.append({
-                    'key': key,
-                    'data': data,
-                    'extracted_at': datetime.now().isoformat()
-                })
-            except:
-                pass
-    except Exception as e:
-        print(f"Error reading cursorDiskKV: {e}")
+    records = {}
+    changed = 0
+    written = 0
+    for idx, (table, key, watermark) in enumerate(candidates):
+        manifest_key = f"{table}/{key}"
+        
+        if composers is not None and key.startswith('composerData:') \
+                and key[len('composerData:'):] not in composers:
+            continue
+        
+        if not full and manifest.is_current(MANIFEST_SECTION, manifest_key, watermark, output_dir) \
+                and manifest_key in store.entries \
+                and store.entries[manifest_key]['blob'].endswith(DOCUMENT_SUFFIXES[output_format]):
+            continue
+        
+        try:
+            with stage('read'):
+                cursor.execute(f"SELECT value FROM {table} WHERE key = ?", (key,))
+                value = cursor.fetchone()[0]
+            count('rows_read')
+            data = decode_value(value, key) if isinstance(value, (str, bytes)) else value
+            if data is None:
+                raise ValueError("value is not valid JSON")
+        except Exception as e:
+            print(f"Error reading {key} from {table}: {e}")
+            continue
+        
+        conv = {
+            'key': key,
+            'data': data,
+            'extracted_at': datetime.now().isoformat()
+        }
+        records[idx] = conv
+        
+        # Unchanged content maps to the blob already on disk and is not rewritten
+        with stage('store'):
+            entry = store.put(manifest_key, conv, output_format)
+        # The later steps of run_backup.py load the structure of this blob from the cache
+        if key.startswith('composerData:'):
+            remember_document(store.blob_path(manifest_key), data)
+        if entry['written']:
+            count('bytes_written', entry['size'])
+        output = {'path': f"{store.root.name}/{entry['blob']}", 'size': entry['size'], 'sha256': entry['sha256']}
+        manifest.record(MANIFEST_SECTION, manifest_key, watermark, [output])
+        changed += 1
+        written += entry['written']
+        count('conversations')
     
     conn.close()
     
-    # Save all conversations to a single JSON file
-    if conversations:
-        output_file = output_dir / 'all_conversations.json'
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(conversations, f, indent=2, ensure_ascii=False)
-        print(f"Extracted {len(conversations)} conversations to {output_file}")
+    manifest_keys = [f"{table}/{key}" for table, key, _ in candidates]
+    manifest.forget_missing(MANIFEST_SECTION, manifest_keys + ['all_conversations'])
+    store.mark_missing(manifest_keys)
+    store.save()
+    with stage('prune'):
+        pruned, freed = store.prune()
+    if pruned:
+        print(f"🧹 {pruned} superseded blob(s) removed from the store ({freed / 1024 / 1024:.1f} MB)")
+    
+    # Save all conversations to a single file, only when its contents would change
+    if candidates:
+        combined_suffix = ARCHIVE_SUFFIX if archive_codec else FORMATS[output_format]
+        output_file = output_dir / f"all_conversations{combined_suffix}"
+        combined_watermark = {
+            'format': f"cca/{archive_codec}" if archive_codec else output_format,
+            'records': [manifest.entry(MANIFEST_SECTION, k)['outputs'][0]['sha256']
+                        for k in manifest_keys if manifest.entry(MANIFEST_SECTION, k)]
+        }
         
-        # Also save individual conversation files
-        for idx, conv in enumerate(conversations):
-            conv_file = output_dir / f"conversation_{idx+1}_{conv['key'].replace(':', '_')[:50]}.json"
-            with open(conv_file, 'w', encoding='utf-8') as f:
-                json.dump(conv, f, indent=2, ensure_ascii=False)
+        if full or not manifest.is_current(MANIFEST_SECTION, 'all_conversations', combined_watermark, output_dir,
+                                           [output_file.name]):
+            listed = 0
+            
+            def combined_records():
+                """(index key, record) in database order; records not re-extracted come from the store"""
+                nonlocal listed
+                for idx, (table, key, _) in enumerate(candidates):
+                    record = records.pop(idx, None)
+                    if record is None:
+                        record = store.get(f"{table}/{key}")
+                        if record is None:
+                            continue
+                        record['extracted_at'] = store.entries[f"{table}/{key}"]['stored_at']
+                    listed += 1
+                    yield f"{table}/{key}", record
+            
+            with stage('write'):
+                if archive_codec:
+                    # Streamed: one record is held in memory at a time
+                    output = write_archive(output_file, combined_records(), archive_codec)
+                else:
+                    conversations = [record for _, record in combined_records()]
+                    output = write_encoded(output_file, conversations, encode_records, output_format)
+            count('bytes_written', output['size'])
+            manifest.record(MANIFEST_SECTION, 'all_conversations', combined_watermark, [output])
+            print(f"Extracted {listed} conversations to {output_file}")
+            for line in format_report([output]):
+                print(line)
+        
+        print(f"{changed} of {len(candidates)} conversation(s) changed since last run, {written} new blob(s) stored")
     else:
         print("No conversations found in database")
     
-    return len(conversations)
+    manifest.save()
+    
+    return len(candidates)
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--full', action='store_true',
+                        help='re-extract every conversation, ignoring the manifest')
+    parser.add_argument('--snapshot', action='store_true',
+                        help='read from a consistent in-memory snapshot of the database')
+    parser.add_argument('--format', choices=list(FORMATS), default='json', dest='output_format',
+                        help='store blob and all_conversations format: JSON (default), compressed JSON Lines or MessagePack')
+    parser.add_argument('--archive', nargs='?', const='zlib', choices=CODECS, metavar='CODEC',
+                        help=f'write all_conversations{ARCHIVE_SUFFIX}, an indexed archive readable one record at a time, '
+                             'instead of the combined list (segment codec: zlib by default, none or zstd)')
+    parser.add_argument('--composer', action='append', dest='composers', metavar='ID',
+                        help='only re-extract this composer (repeatable; default: every changed one)')
+    add_profile_argument(parser)
+    args = parser.parse_args(argv)
+    if missing_dependency(args.output_format):
+        parser.error(f"--format {args.output_format} needs: pip install {missing_dependency(args.output_format)}")
+    if args.archive and archive_dependency(args.archive):
+        parser.error(f"--archive {args.archive} needs: pip install {archive_dependency(args.archive)}")
+    # Stage timings and counters go to conversations/run_report.json
+    output_dir = Path(__file__).parent / 'conversations'
+    with instrumented_run('extract_conversations', output_dir, args.profile):
+        extract_conversations(output_dir=output_dir, full=args.full, snapshot=args.snapshot,
+                              output_format=args.output_format, archive_codec=args.archive,
+                              composers=set(args.composers) if args.composers else None)
 
 if __name__ == '__main__':
-    extract_conversations()
+    main()
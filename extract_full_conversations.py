@@ -5,100 +5,208 @@ This combines structure from JSON files with message content from database
 import sqlite3
 import json
 import os
+import shutil
+import tempfile
+import argparse
+import contextlib
+import io
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 
-def parse_rich_text(rich_text_str):
-    """Parse Lexical editor format to plain text"""
+from bubble_sources import BubbleSources, open_bubble_sources
+from conversation_store import list_conversation_files
+from conversation_io import (FORMATS, encode_conversation, load_conversation, missing_dependency,
+                             report as format_report, write_encoded)
+from cursor_db import connect_readonly, open_database, snapshot_database
+from text_index import TextIndexBuilder, index_path, write_text_index
+from delta_store import DELTA_FORMAT, DELTA_SUFFIX, INDEX_NAME as DELTA_INDEX_NAME, put as put_delta
+from path_extraction import file_path_of
+from rich_text import parse_rich_text
+from instrumentation import add_profile_argument, count, instrumentation, instrumented_run, stage, timed
+from extraction_core import (BUBBLE_TEXT_FIELDS, bubble_key, database_candidates, decode_value,
+                             find_global_database, inline_bubbles, load_composer_structure,
+                             load_inline_bubbles)
+from extraction_manifest import (ExtractionManifest, HashingWriter, MANIFEST_NAME, count_bubble_rows,
+                                 file_signature, read_watermarks, write_output)
+
+MANIFEST_SECTION = 'full_conversations'
+
+# Bubbles fetched per query in streaming mode (well below SQLite's bound-parameter limit)
+STREAM_CHUNK_SIZE = 200
+
+# Output lines of a pool worker that are passed on to the parent
+WARNING_MARKERS = ('⚠️', '❌', 'Error')
+
+def load_conversation_bubbles(conn: sqlite3.Connection, composer_id: str) -> Dict[str, Dict]:
+    """Load every bubble of a conversation with one range scan per table
+    
+    Returns a dict mapping bubble ID to decoded bubble data. Rows are read with a
+    key range (``bubbleId:{composer_id}:`` up to the next prefix) so SQLite can use
+    the key index instead of one point lookup per message.
+    """
+    prefix = f"bubbleId:{composer_id}:"
+    upper_bound = prefix[:-1] + chr(ord(':') + 1)
+    bubbles = {}
+    
+    # cursorDiskKV first (most common), ItemTable only fills bubbles still missing
+    for table in ('cursorDiskKV', 'ItemTable'):
+        try:
+            rows = conn.execute(
+                f"SELECT key, value FROM {table} WHERE key >= ? AND key < ?",
+                (prefix, upper_bound)
+            )
+            for key, value in rows:
+                count('rows_read')
+                bubble_id = key[len(prefix):]
+                if bubble_id in bubbles:
+                    continue
+                bubble_data = decode_value(value, key)
+                if bubble_data is not None:
+                    bubbles[bubble_id] = bubble_data
+        except sqlite3.Error as e:
+            print(f"    Error reading bubbles from {table}: {e}")
+    
+    return bubbles
+
+class _Peekable:
+    """Iterator wrapper that allows looking at the next item without consuming it"""
+    
+    _END = object()
+    
+    def __init__(self, iterable):
+        self._iter = iter(iterable)
+        self._next = next(self._iter, self._END)
+    
+    def peek(self):
+        return None if self._next is self._END else self._next
+    
+    def pop(self):
+        item = self._next
+        self._next = next(self._iter, self._END)
+        return item
+
+def _scan_key_range(conn: sqlite3.Connection, table: str, prefix: str) -> Iterator[Tuple[str, object]]:
+    """Stream (key, value) rows whose key starts with prefix, in key order, using the key index"""
+    upper_bound = prefix[:-1] + chr(ord(prefix[-1]) + 1)
     try:
-        if not rich_text_str or rich_text_str == "":
-            return ""
-        
-        if isinstance(rich_text_str, dict):
-            rich_data = rich_text_str
-        else:
-            rich_data = json.loads(rich_text_str)
-        
-        def extract_text(node):
-            text = ""
-            if isinstance(node, dict):
-                # Extract text from text nodes
-                if "text" in node:
-                    text += str(node["text"])
-                
-                # Recursively process children
-                if "children" in node:
-                    for child in node["children"]:
-                        text += extract_text(child)
-                
-                # Add line breaks for paragraphs
-                node_type = node.get("type", "")
-                if node_type == "paragraph":
-                    text += "\n"
-                elif node_type == "heading":
-                    text += "\n"
-                elif node_type == "code":
-                    text += "\n"
-                    
-            return text
-        
-        result = extract_text(rich_data.get("root", {}))
-        return result.strip()
-    except Exception as e:
-        # If parsing fails, return as string
-        return str(rich_text_str) if rich_text_str else ""
+        yield from conn.execute(
+            f"SELECT key, value FROM {table} WHERE key >= ? AND key < ? ORDER BY key",
+            (prefix, upper_bound)
+        )
+    except sqlite3.Error as e:
+        print(f"    Error scanning {table}: {e}")
 
-def extract_bubble_content(db_path: str, composer_id: str, bubble_id: str) -> Optional[Dict]:
-    """Extract content for a specific bubble from database"""
+def _join_key(composer_id: str) -> str:
+    """Position of a composer in the bubbleId range, where its ID is followed by ':'"""
+    return composer_id + ':'
+
+def _composer_rows(conn: sqlite3.Connection) -> Iterator[Tuple[str, object]]:
+    """composerData rows in the order their bubbles appear in the bubbleId range
+    
+    For IDs of one length (UUIDs) that is plain key order and the range is streamed.
+    Otherwise an ID that is a prefix of another ('ab' and 'ab-1') sorts before it
+    as a composerData key but after it as a bubbleId key, so the keys are sorted
+    by their bubble position and each value is read with its own lookup.
+    """
+    prefix = 'composerData:'
+    upper_bound = prefix[:-1] + chr(ord(prefix[-1]) + 1)
     try:
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        keys = [key for key, in conn.execute(
+            "SELECT key FROM cursorDiskKV WHERE key >= ? AND key < ? ORDER BY key", (prefix, upper_bound)
+        )]
+    except sqlite3.Error as e:
+        print(f"    Error scanning cursorDiskKV: {e}")
+        return
+    ordered = sorted(keys, key=lambda key: _join_key(key[len(prefix):]))
+    if ordered == keys:
+        yield from _scan_key_range(conn, 'cursorDiskKV', prefix)
+        return
+    for key in ordered:
+        row = conn.execute("SELECT value FROM cursorDiskKV WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            yield key, row[0]
+
+def _group_bubble_rows(rows: Iterator[Tuple[str, object]]) -> Iterator[Tuple[str, Dict[str, object]]]:
+    """Group key-ordered bubbleId rows into (composer_id, {bubble_id: raw value})"""
+    current_id = None
+    group = {}
+    for key, value in rows:
+        composer_id, _, bubble_id = key[len('bubbleId:'):].partition(':')
+        if composer_id != current_id:
+            if current_id is not None:
+                yield current_id, group
+            current_id, group = composer_id, {}
+        group[bubble_id] = value
+    if current_id is not None:
+        yield current_id, group
+
+def iter_database_conversations(conn: sqlite3.Connection, wanted: Optional[Set[str]] = None) -> Iterator[Tuple[str, Dict, Dict[str, Dict]]]:
+    """Walk cursorDiskKV once in key order, yielding (composer_id, composer_data, bubbles)
+    
+    composerData rows and bubbleId rows are read by parallel cursors over their key
+    ranges and merge-joined on composer ID, so each conversation is emitted as soon
+    as its bubbles have streamed past and only one conversation is held in memory.
+    The join compares parsed composer IDs in bubbleId key order (see _composer_rows),
+    so IDs of any length keep their bubbles. Rows of composers not in ``wanted`` (when given) are skipped without decoding.
+    """
+    # ItemTable bubbles are merged first so cursorDiskKV rows take precedence
+    bubble_sources = [
+        _Peekable(_group_bubble_rows(_scan_key_range(conn, 'ItemTable', 'bubbleId:'))),
+        _Peekable(_group_bubble_rows(_scan_key_range(conn, 'cursorDiskKV', 'bubbleId:'))),
+    ]
+    
+    for key, value in _composer_rows(conn):
+        composer_id = key[len('composerData:'):]
         
-        # Try cursorDiskKV table first (most common)
-        bubble_key = f"bubbleId:{composer_id}:{bubble_id}"
-        cursor.execute("SELECT value FROM cursorDiskKV WHERE key = ?", (bubble_key,))
-        row = cursor.fetchone()
+        raw_bubbles = {}
+        for source in bubble_sources:
+            # Skip bubbles of composers that have no composerData row
+            while source.peek() is not None and _join_key(source.peek()[0]) < _join_key(composer_id):
+                source.pop()
+            if source.peek() is not None and source.peek()[0] == composer_id:
+                raw_bubbles.update(source.pop()[1])
         
-        if row:
-            value = row['value']
-            if isinstance(value, bytes):
-                value_str = value.decode('utf-8', errors='ignore')
-            else:
-                value_str = str(value)
-            
-            try:
-                bubble_data = json.loads(value_str)
-                conn.close()
-                return bubble_data
-            except:
-                conn.close()
-                return None
+        if wanted is not None and composer_id not in wanted:
+            continue
         
-        # Try ItemTable as fallback
-        cursor.execute("SELECT value FROM ItemTable WHERE key = ?", (bubble_key,))
-        row = cursor.fetchone()
+        composer_data = decode_value(value, key)
+        if not isinstance(composer_data, dict):
+            print(f"  ⚠️  Skipping undecodable composerData for {composer_id[:20]}")
+            continue
         
-        if row:
-            value = row['value']
-            if isinstance(value, bytes):
-                value_str = value.decode('utf-8', errors='ignore')
-            else:
-                value_str = str(value)
-            
-            try:
-                bubble_data = json.loads(value_str)
-                conn.close()
-                return bubble_data
-            except:
-                pass
+        bubbles = {}
+        for bubble_id, raw in raw_bubbles.items():
+            bubble_data = decode_value(raw, bubble_key(composer_id, bubble_id))
+            if bubble_data is not None:
+                bubbles[bubble_id] = bubble_data
         
-        conn.close()
-        return None
-    except Exception as e:
-        print(f"    Error extracting bubble {bubble_id}: {e}")
-        return None
+        yield composer_id, composer_data, bubbles
+
+def use_inline_bubbles(headers: List[Dict], bubbles: Dict[str, Dict], inline: Dict[str, Dict]):
+    """Put the conversation's inline bubbles into ``bubbles``; they take precedence over database rows"""
+    used = 0
+    for header in headers:
+        bubble_id = header.get('bubbleId')
+        if bubble_id in inline:
+            bubbles[bubble_id] = inline[bubble_id]
+            used += 1
+    count('bubbles_inline', used)
+
+def fill_missing_bubbles(sources: Optional[BubbleSources], composer_id: str, headers: List[Dict],
+                         bubbles: Dict[str, Dict], inline: Dict[str, Dict] = None):
+    """Add bubbles the global database lacks from the workspace databases (see bubble_sources.py)"""
+    if sources is None:
+        return
+    bubble_ids = [header.get('bubbleId') for header in headers]
+    for bubble_id, values in sources.resolve(composer_id, bubble_ids, bubbles, inline or ()).items():
+        count('rows_read', len(values))
+        for value in values:
+            bubble_data = decode_value(value, bubble_key(composer_id, bubble_id))
+            if bubble_data is not None:
+                bubbles[bubble_id] = bubble_data
+                break
 
 def extract_text_from_bubble(bubble_data: Dict) -> str:
     """Extract readable text from bubble data"""
@@ -106,10 +214,7 @@ def extract_text_from_bubble(bubble_data: Dict) -> str:
         return ""
     
     # Try different text fields
-    text_fields = ['text', 'message', 'content', 'userMessage', 'assistantMessage', 
-                   'prompt', 'response', 'body']
-    
-    for field in text_fields:
+    for field in BUBBLE_TEXT_FIELDS:
         if field in bubble_data and bubble_data[field]:
             text = str(bubble_data[field])
             if text.strip():
@@ -117,110 +222,242 @@ def extract_text_from_bubble(bubble_data: Dict) -> str:
     
     # Try richText
     if 'richText' in bubble_data and bubble_data['richText']:
-        parsed = parse_rich_text(bubble_data['richText'])
+        with stage('rich_text'):
+            parsed = parse_rich_text(bubble_data['richText'])
         if parsed:
             return parsed
     
     # If no text found, return empty
     return ""
 
-def extract_full_conversation(composer_id: str, db_path: str, json_file_path: Optional[Path] = None) -> Dict:
-    """Extract full conversation with message text"""
+def extract_full_conversation(composer_id: str, db_path: str, json_file_path: Optional[Path] = None,
+                              conn: Optional[sqlite3.Connection] = None,
+                              sources: Optional[BubbleSources] = None) -> Dict:
+    """Extract full conversation with message text
     
-    print(f"\n{'='*80}")
-    print(f"Extracting FULL conversation: {composer_id[:20]}...")
-    print(f"{'='*80}")
+    Pass an open ``conn`` to reuse one database connection across conversations;
+    otherwise a connection is opened for this call only. Bubbles missing from the
+    database are looked up in ``sources`` (workspace databases) when given.
+    """
+    owns_conn = conn is None
+    if owns_conn:
+        conn = connect_readonly(db_path)
+    try:
+        return _extract_full_conversation(composer_id, conn, json_file_path, sources)
+    finally:
+        if owns_conn:
+            conn.close()
+
+@timed('load_structure')
+def load_conversation_structure(composer_id: str, conn: sqlite3.Connection,
+                                json_file_path: Optional[Path]) -> Tuple[List[Dict], Dict, Dict, Dict[str, Dict]]:
+    """Load (headers, code_block_data, original_file_states, inline bubbles) from the JSON file or the database
     
+    Inline bubbles are the ones embedded in composerData itself (see extraction_core.inline_bubbles).
+    """
     # Load structure from JSON if available
-    composer_data = {}
     headers = []
     code_block_data = {}
     original_file_states = {}
+    inline = {}
     
     if json_file_path and json_file_path.exists():
         print(f"Loading structure from JSON: {json_file_path.name}")
-        with open(json_file_path, 'r', encoding='utf-8') as f:
-            json_data = json.load(f)
-            composer_data = json_data.get('data', {})
-            headers = composer_data.get('fullConversationHeadersOnly', [])
-            code_block_data = composer_data.get('codeBlockData', {})
-            original_file_states = composer_data.get('originalFileStates', {})
+        # Only the keys used below are decoded (and the file is read once per run)
+        composer_data = load_composer_structure(json_file_path)
+        headers = composer_data.get('fullConversationHeadersOnly', [])
+        code_block_data = composer_data.get('codeBlockData', {})
+        original_file_states = composer_data.get('originalFileStates', {})
+        inline = load_inline_bubbles(json_file_path)
     else:
         # Try to get from database
         print("Loading structure from database...")
         try:
-            conn = sqlite3.connect(db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT value FROM cursorDiskKV WHERE key = ?", (f"composerData:{composer_id}",))
-            row = cursor.fetchone()
+            row = conn.execute("SELECT value FROM cursorDiskKV WHERE key = ?", (f"composerData:{composer_id}",)).fetchone()
             
             if row:
-                value = row['value']
-                if isinstance(value, bytes):
-                    value_str = value.decode('utf-8', errors='ignore')
-                else:
-                    value_str = str(value)
-                
-                composer_data = json.loads(value_str)
+                composer_data = decode_value(row[0], f"composerData:{composer_id}")
+                if composer_data is None:
+                    raise ValueError("composerData is not valid JSON")
                 headers = composer_data.get('fullConversationHeadersOnly', [])
                 code_block_data = composer_data.get('codeBlockData', {})
                 original_file_states = composer_data.get('originalFileStates', {})
-            
-            conn.close()
+                inline = inline_bubbles(composer_data)
         except Exception as e:
             print(f"  Error loading from database: {e}")
     
-    print(f"Found {len(headers)} message headers")
+    print(f"Found {len(headers)} message headers" + (f", {len(inline)} inline bubble(s)" if inline else ""))
+    return headers, code_block_data, original_file_states, inline
+
+def _extract_full_conversation(composer_id: str, conn: sqlite3.Connection, json_file_path: Optional[Path],
+                               sources: Optional[BubbleSources] = None) -> Dict:
+    print(f"\n{'='*80}")
+    print(f"Extracting FULL conversation: {composer_id[:20]}...")
+    print(f"{'='*80}")
+    
+    headers, code_block_data, original_file_states, inline = load_conversation_structure(composer_id, conn,
+                                                                                         json_file_path)
+    
+    # Extract message content from database, unless composerData embeds every bubble
+    bubbles = {}
+    if any(header.get('bubbleId') not in inline for header in headers):
+        print(f"Extracting message content from database...")
+        with stage('read_bubbles'):
+            bubbles = load_conversation_bubbles(conn, composer_id)
+        print(f"Loaded {len(bubbles)} bubble rows")
+    use_inline_bubbles(headers, bubbles, inline)
+    with stage('workspace_bubbles'):
+        fill_missing_bubbles(sources, composer_id, headers, bubbles, inline)
+    
+    return build_conversation(composer_id, headers, bubbles, code_block_data, original_file_states)
+
+def make_message(idx: int, header: Dict, bubble_data: Optional[Dict]) -> Dict:
+    """Build the message record for the header at position idx (0-based)"""
+    bubble_id = header.get('bubbleId')
+    msg_type = header.get('type', 0)  # 1 = user, 2 = assistant
+    
+    if bubble_data:
+        text = extract_text_from_bubble(bubble_data)
+        
+        return {
+            'index': idx + 1,
+            'bubble_id': bubble_id,
+            'type': 'user' if msg_type == 1 else 'assistant',
+            'text': text,
+            'raw_data': bubble_data  # Keep raw data for reference
+        }
     
-    # Extract message content from database
-    print(f"Extracting message content from database...")
+    # No content found, but keep structure
+    count('bubbles_missing')
+    return {
+        'index': idx + 1,
+        'bubble_id': bubble_id,
+        'type': 'user' if msg_type == 1 else 'assistant',
+        'text': '[Content not found in database]',
+        'raw_data': None
+    }
+
+def has_content(message: Dict) -> bool:
+    return bool(message['text']) and '[Content not found' not in message['text']
+
+def build_conversation(composer_id: str, headers: List[Dict], bubbles: Dict[str, Dict],
+                       code_block_data: Dict, original_file_states: Dict) -> Dict:
+    """Join message headers to their loaded bubbles and build the conversation record"""
     messages = []
     
     for idx, header in enumerate(headers):
-        bubble_id = header.get('bubbleId')
-        msg_type = header.get('type', 0)  # 1 = user, 2 = assistant
-        
         if idx % 50 == 0:
             print(f"  Processing message {idx+1}/{len(headers)}...")
         
-        bubble_data = extract_bubble_content(db_path, composer_id, bubble_id)
-        
-        if bubble_data:
-            text = extract_text_from_bubble(bubble_data)
-            
-            messages.append({
-                'index': idx + 1,
-                'bubble_id': bubble_id,
-                'type': 'user' if msg_type == 1 else 'assistant',
-                'text': text,
-                'raw_data': bubble_data  # Keep raw data for reference
-            })
-        else:
-            # No content found, but keep structure
-            messages.append({
-                'index': idx + 1,
-                'bubble_id': bubble_id,
-                'type': 'user' if msg_type == 1 else 'assistant',
-                'text': '[Content not found in database]',
-                'raw_data': None
-            })
-    
-    print(f"Extracted {len([m for m in messages if m['text'] and '[Content not found' not in m['text']])} messages with content")
+        messages.append(make_message(idx, header, bubbles.get(header.get('bubbleId'))))
     
+    conversation = conversation_record(composer_id, messages, code_block_data, original_file_states)
+    print(f"Extracted {conversation['messages_with_content']} messages with content")
+    return conversation
+
+def conversation_record(composer_id: str, messages: List[Dict], code_block_data: Dict,
+                        original_file_states: Dict) -> Dict:
+    """The conversation dict saved as FULL_<stem>.json"""
+    count('conversations')
+    count('messages', len(messages))
     return {
         'composer_id': composer_id,
-        'total_messages': len(headers),
-        'messages_with_content': len([m for m in messages if m['text'] and '[Content not found' not in m['text']]),
+        'total_messages': len(messages),
+        'messages_with_content': sum(1 for m in messages if has_content(m)),
         'messages': messages,
         'code_block_data': code_block_data,
         'original_file_states': original_file_states,
         'extracted_at': datetime.now().isoformat()
     }
 
-def format_conversation(conversation: Dict) -> str:
-    """Format conversation as readable text"""
+@timed('read_bubbles')
+def fetch_bubble_rows(conn: sqlite3.Connection, composer_id: str, headers: List[Dict],
+                      sources: Optional[BubbleSources] = None, inline: Dict[str, Dict] = None) -> Dict[str, List]:
+    """Read the raw (undecoded) bubble rows for a chunk of headers
+    
+    Returns a dict mapping each found key to its candidate values, cursorDiskKV first
+    (most common); ItemTable is only queried for keys cursorDiskKV does not have, and
+    ``sources`` (workspace databases) only for keys neither table has. When ``sources``
+    covers the global database too, its location index decides which table to read.
+    Bubbles in ``inline`` (embedded in composerData) are not read at all.
+    """
+    prefix = f"bubbleId:{composer_id}:"
+    inline = inline or {}
+    if sources is not None and sources.has_global:
+        bubble_ids = [str(h.get('bubbleId')) for h in headers]
+        rows = {prefix + bubble_id: values for bubble_id, values
+                in sources.resolve(composer_id, bubble_ids, (), inline).items()}
+        count('rows_read', sum(len(values) for values in rows.values()))
+        return rows
+    
+    wanted = {prefix + str(h.get('bubbleId')) for h in headers if str(h.get('bubbleId')) not in inline}
+    rows = {}
+    
+    for table in ('cursorDiskKV', 'ItemTable'):
+        keys = sorted(wanted - rows.keys())
+        if not keys:
+            break
+        try:
+            for key, value in conn.execute(
+                f"SELECT key, value FROM {table} WHERE key IN ({','.join('?' * len(keys))})", keys
+            ):
+                count('rows_read')
+                rows.setdefault(key, []).append(value)
+        except sqlite3.Error as e:
+            print(f"    Error reading bubbles from {table}: {e}")
+    
+    if sources is not None:
+        found = {key[len(prefix):] for key in rows}
+        bubble_ids = [str(h.get('bubbleId')) for h in headers]
+        for bubble_id, values in sources.resolve(composer_id, bubble_ids, found, inline).items():
+            count('rows_read', len(values))
+            rows[prefix + bubble_id] = values
+    
+    return rows
+
+def parse_bubble_rows(composer_id: str, start: int, headers: List[Dict], rows: Dict[str, List],
+                      inline: Dict[str, Dict] = None) -> List[Dict]:
+    """Decode a chunk of raw bubble rows into messages; ``start`` is the chunk's first index
+    
+    Bubbles in ``inline`` (embedded in composerData) are used as they are.
+    """
+    prefix = f"bubbleId:{composer_id}:"
+    inline = inline or {}
+    messages = []
+    
+    for offset, header in enumerate(headers):
+        bubble_data = inline.get(str(header.get('bubbleId')))
+        if bubble_data is not None:
+            count('bubbles_inline')
+            messages.append(make_message(start + offset, header, bubble_data))
+            continue
+        key = prefix + str(header.get('bubbleId'))
+        for value in rows.get(key, ()):
+            bubble_data = decode_value(value, key)
+            if bubble_data is not None:
+                break
+        messages.append(make_message(start + offset, header, bubble_data))
+    
+    return messages
+
+def iter_conversation_messages(conn: sqlite3.Connection, composer_id: str, headers: List[Dict],
+                               chunk_size: int = STREAM_CHUNK_SIZE,
+                               sources: Optional[BubbleSources] = None,
+                               inline: Dict[str, Dict] = None) -> Iterator[Dict]:
+    """Yield messages in header order, fetching bubbles in chunks of ``chunk_size``
+    
+    Only one chunk of decoded bubbles is alive at a time, so memory does not grow
+    with the length of the conversation.
+    """
+    for start in range(0, len(headers), chunk_size):
+        chunk = headers[start:start + chunk_size]
+        print(f"  Processing messages {start+1}-{start+len(chunk)}/{len(headers)}...")
+        
+        rows = fetch_bubble_rows(conn, composer_id, chunk, sources, inline)
+        yield from parse_bubble_rows(composer_id, start, chunk, rows, inline)
+
+def format_conversation_header(conversation: Dict) -> List[str]:
+    """Header lines of the readable text, up to the start of the messages"""
     output = []
     
     output.append("=" * 80)
@@ -237,154 +474,572 @@ def format_conversation(conversation: Dict) -> str:
     output.append("CONVERSATION MESSAGES")
     output.append("=" * 80)
     output.append("")
+    return output
+
+def format_message(msg: Dict) -> List[str]:
+    """Lines of one message block in the readable text"""
+    output = []
+    msg_type_label = msg['type'].upper()
+    output.append(f"[{msg['index']}] {msg_type_label}")
+    output.append("-" * 80)
     
-    for msg in conversation['messages']:
-        msg_type_label = msg['type'].upper()
-        output.append(f"[{msg['index']}] {msg_type_label}")
-        output.append("-" * 80)
-        
-        if msg['text']:
-            output.append(msg['text'])
-        else:
-            output.append("[No content available]")
-        
-        output.append("")
+    if msg['text']:
+        output.append(msg['text'])
+    else:
+        output.append("[No content available]")
+    
+    output.append("")
+    return output
+
+def format_file_states(original_file_states: Dict) -> List[str]:
+    """Lines of the FILES CREATED/MODIFIED section (empty if there are none)"""
+    output = []
     
     # Add file information
-    if conversation.get('original_file_states'):
+    if original_file_states:
         output.append("")
         output.append("=" * 80)
         output.append("FILES CREATED/MODIFIED")
         output.append("=" * 80)
         output.append("")
         
-        for file_uri, file_info in conversation['original_file_states'].items():
-            file_path = file_info.get('uri', {}).get('fsPath', file_uri) if isinstance(file_info.get('uri'), dict) else file_uri
+        for file_uri, file_info in original_file_states.items():
+            file_path = file_path_of(file_uri, file_info)
             output.append(f"📄 {file_path}")
             output.append(f"   New File: {file_info.get('isNewlyCreated', False)}")
             if file_info.get('content'):
                 preview = file_info['content'][:200] if len(file_info['content']) > 200 else file_info['content']
                 output.append(f"   Preview: {preview}...")
             output.append("")
-    
-    return "\n".join(output)
+    return output
 
-def main():
-    """Main extraction function"""
-    print("=" * 80)
-    print("ENHANCED FULL CONVERSATION EXTRACTION")
-    print("=" * 80)
+@timed('format')
+def format_conversation(conversation: Dict, index: Optional[TextIndexBuilder] = None) -> str:
+    """Format conversation as readable text
     
-    # Paths
-    backup_dir = Path(__file__).parent
-    conversations_dir = backup_dir / 'conversations'
-    output_dir = backup_dir / 'full_conversations'
-    output_dir.mkdir(exist_ok=True)
+    ``index`` (a TextIndexBuilder) is given the offset of every message block and
+    section for the FULL_<stem>.txt.idx sidecar.
+    """
+    output = format_conversation_header(conversation)
+    if index is not None:
+        index.add_lines(output)
     
-    # Find database
-    db_paths = [
-        os.path.join(os.environ.get('APPDATA', ''), 'Cursor', 'User', 'globalStorage', 'state.vscdb'),
-        str(backup_dir / 'databases' / 'state.vscdb')
-    ]
+    for msg in conversation['messages']:
+        lines = format_message(msg)
+        if index is not None:
+            index.add_message(msg, lines)
+        output.extend(lines)
     
-    db_path = None
-    for path in db_paths:
-        if os.path.exists(path):
-            db_path = path
-            break
+    file_states = format_file_states(conversation.get('original_file_states'))
+    if index is not None:
+        index.add_lines(file_states)
+    output.extend(file_states)
     
-    if not db_path:
-        print("\n❌ Database not found!")
-        print("Tried:")
-        for path in db_paths:
-            print(f"  - {path}")
-        return
+    return "\n".join(output)
+
+def save_conversation(conversation: Dict, output_dir: Path, stem: str, output_format: str = 'json') -> List[Dict]:
+    """Write a conversation as FULL_<stem>.txt plus its data file, returning manifest records
     
-    print(f"\n✅ Using database: {db_path}")
+    The text file's offset index goes to FULL_<stem>.txt.idx (see text_index.py). The
+    data file is FULL_<stem>.json, or compressed JSON Lines / MessagePack for the other
+    ``output_format``s (see conversation_io.py). The 'delta' format appends the new
+    messages to FULL_<stem>.delta/ instead (see delta_store.py).
+    """
+    text_index = TextIndexBuilder()
+    text_output = format_conversation(conversation, text_index)
     
-    # Find conversation JSON files
-    json_files = list(conversations_dir.glob('conversation_*.json'))
+    output_file = output_dir / f"FULL_{stem}.txt"
+    with stage('write'):
+        outputs = [write_output(output_file, text_output)]
+        print(f"✅ Saved: {output_file.name}")
+        index_output = write_text_index(output_file, text_index, outputs[0])
+        
+        # Also save the data file
+        data_file = output_dir / output_names(stem, output_format=output_format)[1]
+        if output_format == DELTA_FORMAT:
+            action, record, written = put_delta(data_file.parent, conversation)
+            count(f'delta_{action}')
+            count('bytes_written', outputs[0]['size'] + index_output['size'] + written)
+            outputs.append(record)
+        else:
+            outputs.append(write_encoded(data_file, conversation, encode_conversation, output_format))
+            count('bytes_written', sum(output['size'] for output in outputs) + index_output['size'])
+        outputs.append(index_output)
+    return outputs
+
+def _json_value(value, indent: str) -> str:
+    """Serialise a value like json.dump(indent=2) would when nested at ``indent``"""
+    return json.dumps(value, indent=2, ensure_ascii=False, default=str).replace('\n', '\n' + indent)
+
+def stream_conversation(conn: sqlite3.Connection, composer_id: str, json_file_path: Optional[Path],
+                        output_dir: Path, stem: str, stream_format: str = 'json',
+                        sources: Optional[BubbleSources] = None) -> Tuple[List[Dict], int, int]:
+    """Extract a conversation straight to disk, one message at a time
     
-    if not json_files:
-        print(f"\n❌ No conversation JSON files found in: {conversations_dir}")
-        print("Extracting all conversations from database...")
+    Writes FULL_<stem>.txt (and its .idx offset index) plus FULL_<stem>.json (same
+    fields as the in-memory writer, with ``messages_with_content`` after the messages)
+    or FULL_<stem>.jsonl (a header line, one line per message and a summary line). Each
+    message is dropped once it is written; text message blocks are buffered in a
+    temporary file because the header needs the final content count. Returns
+    (manifest records, total, with content).
+    """
+    print(f"\n{'='*80}")
+    print(f"Streaming FULL conversation: {composer_id[:20]}...")
+    print(f"{'='*80}")
+    
+    headers, code_block_data, original_file_states, inline = load_conversation_structure(composer_id, conn,
+                                                                                         json_file_path)
+    extracted_at = datetime.now().isoformat()
+    messages_with_content = 0
+    
+    data_file = output_dir / output_names(stem, stream_format)[1]
+    # Message blocks are indexed as they go to the buffer, and placed after the header later
+    body_index = TextIndexBuilder(continued=True)
+    with open(data_file, 'wb') as raw, tempfile.TemporaryFile() as body:
+        data = HashingWriter(raw, data_file)
+        if stream_format == 'jsonl':
+            data.write(json.dumps({
+                'record': 'conversation',
+                'composer_id': composer_id,
+                'total_messages': len(headers),
+                'extracted_at': extracted_at
+            }, ensure_ascii=False) + '\n')
+        else:
+            data.write('{\n')
+            data.write(f'  "composer_id": {json.dumps(composer_id)},\n')
+            data.write(f'  "total_messages": {len(headers)},\n')
+            data.write('  "messages": [')
         
-        # Extract all composer IDs from database
-        try:
-            conn = sqlite3.connect(db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT key FROM cursorDiskKV WHERE key LIKE 'composerData:%'")
-            rows = cursor.fetchall()
+        for msg in iter_conversation_messages(conn, composer_id, headers, sources=sources, inline=inline):
+            if has_content(msg):
+                messages_with_content += 1
             
-            composer_ids = []
-            for row in rows:
-                key = row['key']
-                composer_id = key.replace('composerData:', '')
-                composer_ids.append(composer_id)
+            if stream_format == 'jsonl':
+                data.write(json.dumps(msg, ensure_ascii=False, default=str) + '\n')
+            else:
+                separator = '\n    ' if msg['index'] == 1 else ',\n    '
+                data.write(separator + _json_value(msg, '    '))
             
-            conn.close()
+            lines = format_message(msg)
+            body_index.add_message(msg, lines)
+            body.write(''.join('\n' + line for line in lines).encode('utf-8'))
+        
+        if stream_format == 'jsonl':
+            data.write(json.dumps({
+                'record': 'summary',
+                'messages_with_content': messages_with_content,
+                'code_block_data': code_block_data,
+                'original_file_states': original_file_states
+            }, ensure_ascii=False, default=str) + '\n')
+        else:
+            data.write('\n  ],\n' if headers else '],\n')
+            data.write(f'  "messages_with_content": {messages_with_content},\n')
+            data.write(f'  "code_block_data": {_json_value(code_block_data, "  ")},\n')
+            data.write(f'  "original_file_states": {_json_value(original_file_states, "  ")},\n')
+            data.write(f'  "extracted_at": {json.dumps(extracted_at)}\n')
+            data.write('}')
+        outputs = [None, data.record()]
+        
+        # Text: header (needs the final count), buffered message blocks, file states
+        text_file = output_dir / f"FULL_{stem}.txt"
+        with open(text_file, 'wb') as raw_text:
+            text = HashingWriter(raw_text, text_file)
+            header = format_conversation_header({
+                'composer_id': composer_id,
+                'total_messages': len(headers),
+                'messages_with_content': messages_with_content,
+                'extracted_at': extracted_at
+            })
+            text.write('\n'.join(header))
+            body.seek(0)
+            while True:
+                block = body.read(1024 * 1024)
+                if not block:
+                    break
+                text.write_bytes(block)
+            file_states = format_file_states(original_file_states)
+            text.write(''.join('\n' + line for line in file_states))
+            outputs[0] = text.record()
+        
+        text_index = TextIndexBuilder()
+        text_index.add_lines(header)
+        text_index.extend(body_index)
+        file_states_index = TextIndexBuilder(continued=True)
+        file_states_index.add_lines(file_states)
+        text_index.extend(file_states_index)
+        outputs.append(write_text_index(text_file, text_index, outputs[0]))
+    
+    count('conversations')
+    count('messages', len(headers))
+    count('bytes_written', sum(output['size'] for output in outputs))
+    print(f"Extracted {messages_with_content} messages with content")
+    print(f"✅ Saved: {text_file.name}")
+    return outputs, len(headers), messages_with_content
+
+def load_full_conversation(path: Path) -> Dict:
+    """Load a FULL_* data file (.json, streamed .jsonl, .jsonl.gz, .jsonl.zst, .msgpack, .delta)"""
+    return load_conversation(path)
+
+def output_names(stem: str, stream_format: Optional[str] = None, output_format: str = 'json') -> List[str]:
+    """Names of the files written for a conversation: the text file, the data file and the text index"""
+    if stream_format:
+        data_suffix = '.jsonl' if stream_format == 'jsonl' else '.json'
+    elif output_format == DELTA_FORMAT:
+        data_suffix = f"{DELTA_SUFFIX}/{DELTA_INDEX_NAME}"
+    else:
+        data_suffix = FORMATS[output_format]
+    return [f"FULL_{stem}.txt", f"FULL_{stem}{data_suffix}", index_path(Path(f"FULL_{stem}.txt")).name]
+
+def composer_id_from_filename(json_file: Path) -> Optional[str]:
+    """Find the composer UUID embedded in a conversation file name"""
+    for part in json_file.stem.split('_'):
+        if len(part) == 36 and part.count('-') == 4:  # UUID format
+            return part
+    return None
+
+def stale_database_composers(conn: sqlite3.Connection, output_dir: Path, manifest: ExtractionManifest,
+                             full: bool = False, stream_format: Optional[str] = None,
+                             output_format: str = 'json',
+                             selected: Optional[Set[str]] = None) -> Tuple[Dict[str, Dict], Set[str]]:
+    """Return watermarks of every composer in the database (or in ``selected``) and the IDs that need extracting"""
+    # Watermarks come from SQLite and the key index, no blobs are decoded here
+    composers = {}
+    for key, watermark in read_watermarks(conn, 'cursorDiskKV', "key LIKE 'composerData:%'"):
+        composer_id = key.replace('composerData:', '')
+        if selected is not None and composer_id not in selected:
+            continue
+        watermark['bubble_rows'] = count_bubble_rows(conn, composer_id)
+        composers[composer_id] = watermark
+    
+    print(f"Found {len(composers)} conversation(s) in database")
+    
+    stale = {
+        composer_id for composer_id, watermark in composers.items()
+        if full or not manifest.is_current(MANIFEST_SECTION, composer_id, watermark, output_dir,
+                                           output_names(composer_id[:20], stream_format, output_format))
+    }
+    return composers, stale
+
+def extract_database_scan(conn: sqlite3.Connection, output_dir: Path, manifest: ExtractionManifest,
+                          full: bool = False, output_format: str = 'json',
+                          sources: Optional[BubbleSources] = None,
+                          selected: Optional[Set[str]] = None) -> Tuple[int, List[Dict]]:
+    """Extract every conversation in the database with one sequential pass over cursorDiskKV
+    
+    Returns the number of conversations skipped as unchanged and the files written.
+    ``selected`` limits the pass to those composer IDs.
+    """
+    composers, stale = stale_database_composers(conn, output_dir, manifest, full, output_format=output_format,
+                                                selected=selected)
+    written = []
+    
+    try:
+        for composer_id, composer_data, bubbles in iter_database_conversations(conn, stale):
+            print(f"\n{'='*80}")
+            print(f"Extracting FULL conversation: {composer_id[:20]}...")
+            print(f"{'='*80}")
             
-            print(f"Found {len(composer_ids)} conversation(s) in database")
+            headers = composer_data.get('fullConversationHeadersOnly', [])
+            print(f"Found {len(headers)} message headers, {len(bubbles)} bubble rows")
+            count('rows_read', len(bubbles))
+            inline = inline_bubbles(composer_data)
+            use_inline_bubbles(headers, bubbles, inline)
+            with stage('workspace_bubbles'):
+                fill_missing_bubbles(sources, composer_id, headers, bubbles, inline)
             
-            for composer_id in composer_ids:
-                conversation = extract_full_conversation(composer_id, db_path)
-                text_output = format_conversation(conversation)
-                
-                output_file = output_dir / f"FULL_{composer_id[:20]}.txt"
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    f.write(text_output)
-                print(f"✅ Saved: {output_file.name}")
-                
-                # Also save JSON
-                json_output_file = output_dir / f"FULL_{composer_id[:20]}.json"
-                with open(json_output_file, 'w', encoding='utf-8') as f:
-                    json.dump(conversation, f, indent=2, ensure_ascii=False, default=str)
+            conversation = build_conversation(
+                composer_id, headers, bubbles,
+                composer_data.get('codeBlockData', {}),
+                composer_data.get('originalFileStates', {})
+            )
+            outputs = save_conversation(conversation, output_dir, composer_id[:20], output_format)
+            manifest.record(MANIFEST_SECTION, composer_id, composers[composer_id], outputs)
+            written.extend(outputs)
+    finally:
+        manifest.save()
+    
+    return len(composers) - len(stale), written
+
+# Per-process state of pool workers (see run_extraction_jobs)
+_worker_conn = None
+_worker_db_path = None
+_worker_sources = None
+
+def _init_worker(db_path: str, immutable: bool, sources: Optional[BubbleSources] = None):
+    """Pool initializer: each worker holds its own read-only connection"""
+    global _worker_conn, _worker_db_path, _worker_sources
+    _worker_conn = connect_readonly(db_path, immutable=immutable)
+    _worker_db_path = db_path
+    _worker_sources = sources
+
+def _run_extraction_job(conn: sqlite3.Connection, db_path: str, job: Tuple,
+                        sources: Optional[BubbleSources] = None) -> Optional[Tuple[str, List[Dict], int, int]]:
+    """Extract and save one conversation; returns (composer_id, outputs, total, with content)"""
+    composer_id, json_file, stem, output_dir, stream_format, output_format = job
+    
+    if json_file is not None:
+        # Extract composer ID from JSON, falling back to the one found in the filename
+        composer_id = load_composer_structure(json_file).get('composerId') or composer_id
+    
+    if not composer_id:
+        return None
+    
+    if stream_format:
+        outputs, total, with_content = stream_conversation(conn, composer_id, json_file, output_dir, stem,
+                                                           stream_format, sources)
+        return composer_id, outputs, total, with_content
+    
+    conversation = extract_full_conversation(composer_id, db_path, json_file, conn=conn, sources=sources)
+    outputs = save_conversation(conversation, output_dir, stem, output_format)
+    return composer_id, outputs, conversation['total_messages'], conversation['messages_with_content']
+
+def _pool_extraction_job(job: Tuple):
+    """Run a job in a worker; returns the result, the job's coverage counters and timings and its warnings
+    
+    Progress output is captured so workers do not interleave it; warning and error
+    lines are handed back for the parent to print, and stderr is left alone.
+    """
+    if _worker_sources is not None:
+        _worker_sources.stats = {}
+    instrumentation.reset()
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        result = _run_extraction_job(_worker_conn, _worker_db_path, job, _worker_sources)
+    warnings = [line for line in output.getvalue().splitlines()
+                if any(marker in line for marker in WARNING_MARKERS)]
+    return result, _worker_sources.stats if _worker_sources is not None else {}, instrumentation.snapshot(), warnings
+
+def run_extraction_jobs(conn: sqlite3.Connection, db_path: str, jobs: List[Tuple], workers: int = 1,
+                        immutable: bool = False, sources: Optional[BubbleSources] = None) -> Iterator[Tuple[Tuple, object]]:
+    """Run extraction jobs serially or on a process pool, yielding (job, result) in job order
+    
+    A job is (composer_id, json_file, stem, output_dir, stream_format, output_format). With
+    ``workers`` > 1 every worker process opens its own read-only connection to ``db_path``
+    and gets a copy of the ``sources`` index; coverage counters and stage timings
+    (instrumentation.py) are merged back.
+    A failed job yields its exception as the result so the caller can report it and carry on.
+    """
+    if workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            try:
+                yield job, _run_extraction_job(conn, db_path, job, sources)
+            except Exception as e:
+                yield job, e
+        return
+    
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(db_path, immutable, sources)) as pool:
+        futures = [pool.submit(_pool_extraction_job, job) for job in jobs]
+        for job, future in zip(jobs, futures):
+            try:
+                result, stats, timings, warnings = future.result()
+                for line in warnings:
+                    print(line)
+                if sources is not None:
+                    sources.merge_stats(stats)
+                instrumentation.merge(timings)
+                yield job, result
+            except Exception as e:
+                yield job, e
+
+def extract_all(conn: sqlite3.Connection, db_path: str, conversations_dir: Path, output_dir: Path,
+                manifest: Optional[ExtractionManifest] = None, full: bool = False, scan: bool = False,
+                workers: int = 1, immutable: bool = False, stream_format: Optional[str] = None,
+                pipeline: bool = False, output_format: str = 'json', sources: Optional[BubbleSources] = None,
+                composers: Optional[Set[str]] = None):
+    """Extract every conversation, from JSON structure files if present, else from the database
+    
+    Conversations whose watermark matches ``manifest`` are skipped unless ``full`` is set.
+    ``scan`` reads the whole database in one pass even when JSON files exist.
+    ``workers`` > 1 spreads conversations over a process pool, ``stream_format``
+    ('json' or 'jsonl') writes each conversation message by message and ``pipeline``
+    overlaps reads, parsing and writes (see extraction_pipeline.py); all of them
+    replace the single-pass scan with per-conversation reads. ``output_format`` selects
+    the FULL_* data file format (see conversation_io.py). Bubbles the database lacks are
+    resolved from ``sources`` (workspace databases, see bubble_sources.py) when given.
+    ``composers`` limits the run to those composer IDs (see watch_backup.py).
+    """
+    if manifest is None:
+        manifest = ExtractionManifest(output_dir.parent / MANIFEST_NAME)
+    skipped = 0
+    jobs = []
+    watermarks = {}
+    written = []
+    
+    # Find conversation JSON files (content-addressed store or legacy conversation_*.json)
+    json_files = [] if scan else list_conversation_files(conversations_dir)
+    
+    if not json_files:
+        if not scan:
+            print(f"\n❌ No conversation JSON files found in: {conversations_dir}")
         
+        try:
+            if workers <= 1 and not stream_format and not pipeline:
+                print("Extracting all conversations from database in one pass...")
+                scan_skipped, written = extract_database_scan(conn, output_dir, manifest, full, output_format, sources,
+                                                              composers)
+                skipped += scan_skipped
+            else:
+                print(f"Extracting all conversations from database{' through the pipeline' if pipeline else f' with {workers} worker(s)'}...")
+                found, stale = stale_database_composers(conn, output_dir, manifest, full, stream_format,
+                                                        output_format, composers)
+                skipped += len(found) - len(stale)
+                for composer_id in sorted(stale):
+                    jobs.append((composer_id, None, composer_id[:20], output_dir, stream_format, output_format))
+                    watermarks[composer_id[:20]] = found[composer_id]
         except Exception as e:
             print(f"❌ Error: {e}")
             return
     else:
         print(f"\nFound {len(json_files)} conversation JSON file(s)")
         
-        # Extract each conversation
-        for json_file in json_files:
+        for conversation_file in json_files:
+            json_file = conversation_file['path']
             try:
-                # Extract composer ID from JSON
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    json_data = json.load(f)
-                    composer_id = json_data.get('data', {}).get('composerId')
+                stem = conversation_file['stem']
+                filename_id = conversation_file['composer_id'] or composer_id_from_filename(json_file)
+                if composers is not None and filename_id not in composers:
+                    continue
                 
-                if not composer_id:
-                    # Try to extract from filename
-                    parts = json_file.stem.split('_')
-                    for part in parts:
-                        if len(part) == 36 and part.count('-') == 4:  # UUID format
-                            composer_id = part
-                            break
+                # Cheap watermark: source file signature plus stored bubble count
+                watermark = {'source': file_signature(json_file)}
+                if filename_id:
+                    watermark['bubble_rows'] = count_bubble_rows(conn, filename_id)
                 
-                if composer_id:
-                    conversation = extract_full_conversation(composer_id, db_path, json_file)
-                    text_output = format_conversation(conversation)
-                    
-                    output_file = output_dir / f"FULL_{Path(json_file).stem}.txt"
-                    with open(output_file, 'w', encoding='utf-8') as f:
-                        f.write(text_output)
-                    print(f"✅ Saved: {output_file.name}")
-                    
-                    # Also save JSON
-                    json_output_file = output_dir / f"FULL_{Path(json_file).stem}.json"
-                    with open(json_output_file, 'w', encoding='utf-8') as f:
-                        json.dump(conversation, f, indent=2, ensure_ascii=False, default=str)
-                else:
-                    print(f"⚠️  Could not extract composer ID from {json_file.name}")
-            
+                if not full and manifest.is_current(MANIFEST_SECTION, stem, watermark, output_dir,
+                                                    output_names(stem, stream_format, output_format)):
+                    skipped += 1
+                    continue
+                
+                jobs.append((filename_id, json_file, stem, output_dir, stream_format, output_format))
+                watermarks[stem] = watermark
             except Exception as e:
-                print(f"❌ Error processing {json_file.name}: {e}")
+                print(f"❌ Error processing {stem}: {e}")
+    
+    # Extract each conversation; results arrive in job order whatever the worker count
+    if pipeline and jobs:
+        from extraction_pipeline import run_pipeline
+        results = run_pipeline(db_path, jobs, immutable, sources=sources)
+    else:
+        results = run_extraction_jobs(conn, db_path, jobs, workers, immutable, sources)
+    
+    try:
+        for done, (job, result) in enumerate(results, 1):
+            composer_id, json_file, stem = job[:3]
+            name = stem if json_file is not None else composer_id[:20]
+            
+            if isinstance(result, Exception):
+                print(f"❌ Error processing {name}: {result}")
+            elif result is None:
+                print(f"⚠️  Could not extract composer ID from {name}")
+            else:
+                composer_id, outputs, total, with_content = result
+                if workers > 1 or pipeline:
+                    print(f"[{done}/{len(jobs)}] ✅ {name}: {with_content}/{total} messages with content")
+                extra = {'composer_id': composer_id} if json_file is not None else {}
+                key = stem if json_file is not None else composer_id
+                manifest.record(MANIFEST_SECTION, key, watermarks[stem], outputs, **extra)
+                written.extend(outputs)
+    finally:
+        manifest.save()
+    
+    if skipped:
+        print(f"\n⏭️  Skipped {skipped} unchanged conversation(s)")
+    for line in format_report(written):
+        print(line)
+    if sources is not None:
+        for line in sources.coverage_report():
+            print(line)
+
+def main(argv: Optional[List[str]] = None):
+    """Main extraction function"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--full', action='store_true',
+                        help='re-extract every conversation, ignoring the manifest')
+    parser.add_argument('--scan', action='store_true',
+                        help='read every conversation from the database in one pass, ignoring conversation_*.json')
+    parser.add_argument('--snapshot', action='store_true',
+                        help='read from a consistent snapshot of the database')
+    parser.add_argument('--jobs', type=int, default=1, metavar='N',
+                        help='extract conversations on N worker processes (default: 1)')
+    parser.add_argument('--stream', choices=['json', 'jsonl'],
+                        help='write each message as it is extracted (JSON array or JSON Lines) to keep memory flat')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='overlap database reads, parsing and file writes (asyncio pipeline with bounded queues)')
+    parser.add_argument('--format', choices=list(FORMATS) + [DELTA_FORMAT], default='json', dest='output_format',
+                        help='data file format: indented JSON (default), compressed JSON Lines, MessagePack, '
+                             'or delta (append only the new messages to FULL_<stem>.delta/)')
+    parser.add_argument('--no-workspaces', action='store_true',
+                        help='do not look up missing bubbles in workspace-storage/ databases')
+    parser.add_argument('--composer', action='append', dest='composers', metavar='ID',
+                        help='only extract this composer (repeatable; default: every one)')
+    add_profile_argument(parser)
+    args = parser.parse_args(argv)
+    if args.pipeline and (args.jobs > 1 or args.stream):
+        parser.error('--pipeline cannot be combined with --jobs or --stream')
+    if args.stream and args.output_format != 'json':
+        parser.error('--stream writes plain JSON or JSON Lines; use --format without --stream')
+    if missing_dependency(args.output_format):
+        parser.error(f"--format {args.output_format} needs: pip install {missing_dependency(args.output_format)}")
+    
+    print("=" * 80)
+    print("ENHANCED FULL CONVERSATION EXTRACTION")
+    print("=" * 80)
+    
+    # Paths
+    backup_dir = Path(__file__).parent
+    conversations_dir = backup_dir / 'conversations'
+    output_dir = backup_dir / 'full_conversations'
+    output_dir.mkdir(exist_ok=True)
+    
+    # Find database (the live one first, then the backup copy in databases/)
+    found = find_global_database(backup_dir)
+    if found is None:
+        print("\n❌ Database not found!")
+        print("Tried:")
+        for path, _ in database_candidates(backup_dir):
+            print(f"  - {path}")
+        return
+    
+    db_path, immutable = found
+    print(f"\n✅ Using database: {db_path}")
+    snapshot_file = None
+    if args.snapshot and (args.jobs > 1 or args.pipeline):
+        # Workers and the pipeline reader cannot share an in-memory snapshot, so put it in a file
+        snapshot_file = Path(tempfile.mkdtemp()) / 'state.vscdb'
+        snapshot_database(db_path, snapshot_file).close()
+        db_path, immutable = str(snapshot_file), True
+    
+    # Stage timings and counters go to full_conversations/run_report.json
+    with instrumented_run('extract_full_conversations', output_dir, args.profile):
+        # Workspace databases fill in bubbles the global database lacks; the location index also
+        # covers the global database unless reads go to a snapshot of it
+        global_db = None if args.snapshot else (db_path, immutable)
+        sources = None if args.no_workspaces else open_bubble_sources(backup_dir, global_db)
+        
+        # One read-only connection for the whole run (plus one per worker with --jobs)
+        conn = open_database(db_path, snapshot=args.snapshot and snapshot_file is None, immutable=immutable)
+        try:
+            extract_all(conn, db_path, conversations_dir, output_dir, full=args.full, scan=args.scan,
+                        workers=args.jobs, immutable=immutable, stream_format=args.stream, pipeline=args.pipeline,
+                        output_format=args.output_format, sources=sources,
+                        composers=set(args.composers) if args.composers else None)
+        finally:
+            conn.close()
+            if sources is not None:
+                sources.close()
+            if snapshot_file is not None:
+                shutil.rmtree(snapshot_file.parent, ignore_errors=True)
     
     print(f"\n✅ Extraction complete!")
     print(f"📁 Output directory: {output_dir}")
+    
+    # Keep the full-text search index in step with the new outputs
+    try:
+        from search_index import INDEX_NAME, update_index
+        stats = update_index(output_dir, backup_dir / INDEX_NAME)
+        print(f"🔎 Search index: {stats['indexed']} conversation(s) re-indexed, {stats['unchanged']} unchanged")
+    except Exception as e:
+        print(f"⚠️  Search index not updated: {e}")
 
 if __name__ == '__main__':
     main()
@@ -1,27 +1,146 @@
 """
 Extract complete project context from conversation files
 This creates a comprehensive document that helps Cursor AI understand the project building process
+Every FULL_* conversation gets its own recovery document (built in parallel with --jobs) and
+PROJECT_INDEX.md / project_index.json merge their file paths and code blocks across projects
 """
+import argparse
 import json
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Set
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from conversation_io import data_suffix, find_data_file, iter_records, load_conversation
+from delta_store import DELTA_SUFFIX
+from extract_full_conversations import has_content
+from instrumentation import add_profile_argument, count, instrumentation, instrumented_run, stage, timed
+from json_select import iter_array_items, iter_object_items
+from path_extraction import extract_paths, file_path_of
+
+# Messages quoted in the KEY CONVERSATION POINTS section, and characters kept of each
+KEY_POINTS = 50
+KEY_POINT_CHARS = 500
+
+# Top-level fields of a FULL conversation other than its messages
+CONVERSATION_FIELDS = {'composer_id', 'total_messages', 'messages_with_content', 'code_block_data',
+                       'original_file_states', 'extracted_at'}
+
+def iter_conversation(data_file: Path) -> Iterator[Tuple[Optional[str], object, Optional[int], Optional[int]]]:
+    """Walk a FULL data file once, one message at a time
+    
+    Yields (None, message, byte offset, byte length) for every message and
+    (field, value, None, None) for the other top-level fields. Offsets are given for
+    plain .json and .jsonl files, so read_messages() can seek straight to a message.
+    """
+    data_file = Path(data_file)
+    suffix = data_suffix(data_file)
+    
+    if suffix == '.json':
+        with open(data_file, 'r', encoding='utf-8', newline='') as f:
+            text = f.read()
+        # Character offsets equal byte offsets for ASCII; otherwise count bytes as we go
+        ascii_only = text.isascii()
+        char_pos = byte_pos = 0
+        for key, value, start in iter_object_items(text, 0, CONVERSATION_FIELDS):
+            if key != 'messages':
+                yield key, value, None, None
+                continue
+            for message, msg_start, msg_end in iter_array_items(text, start):
+                if ascii_only:
+                    offset, length = msg_start, msg_end - msg_start
+                else:
+                    byte_pos += len(text[char_pos:msg_start].encode('utf-8'))
+                    char_pos = msg_start
+                    offset, length = byte_pos, len(text[msg_start:msg_end].encode('utf-8'))
+                yield None, message, offset, length
+        return
+    
+    if suffix.startswith('.jsonl') or suffix == DELTA_SUFFIX:
+        # Streamed or compressed JSON Lines, or delta segments: header record, messages, summary record
+        for record, offset, length in iter_records(data_file):
+            if 'record' in record:
+                for key, value in record.items():
+                    if key != 'record':
+                        yield key, value, None, None
+            else:
+                yield None, record, offset, length
+        return
+    
+    # Formats without a record structure are decoded whole
+    conversation = load_conversation(data_file)
+    for key, value in conversation.items():
+        if key == 'messages':
+            for message in value:
+                yield None, message, None, None
+        else:
+            yield key, value, None, None
+
+def read_messages(data_file: Path, entries: List[Dict]) -> Iterator[Dict]:
+    """The messages behind message index entries, in index order
+    
+    Entries with byte offsets are read with a seek each; otherwise the file is walked
+    again, stopping after the last wanted message.
+    """
+    if not entries:
+        return
+    if all(entry['offset'] is not None for entry in entries):
+        with open(data_file, 'rb') as f:
+            for entry in entries:
+                f.seek(entry['offset'])
+                yield json.loads(f.read(entry['size']))
+        return
+    
+    wanted = {entry['ordinal'] for entry in entries}
+    last = max(wanted)
+    ordinal = -1
+    for key, message, _, _ in iter_conversation(data_file):
+        if key is not None:
+            continue
+        ordinal += 1
+        if ordinal in wanted:
+            yield message
+        if ordinal == last:
+            return
 
 def extract_file_creation_info(json_file_path: Path) -> Dict:
-    """Extract all file creation/modification information from conversation JSON"""
+    """Extract all file creation/modification information from a FULL conversation data file
+    
+    The file is read in one pass that also builds 'message_index': for every message
+    its position, byte offset and size (plain JSON files), role, text length and
+    whether it has content, so messages can be fetched later without a full reload.
+    """
+    
+    data = {}
+    message_index = []
+    project_paths = set()
     
-    with open(json_file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    for key, value, offset, size in iter_conversation(json_file_path):
+        if key is not None:
+            data[key] = value
+            continue
+        
+        # Extract project paths mentioned in messages (see path_extraction.py)
+        text = value.get('text') or ''
+        project_paths |= extract_paths(text)
+        message_index.append({
+            'ordinal': len(message_index),
+            'index': value.get('index'),
+            'role': value.get('type', 'unknown'),
+            'length': len(text),
+            'has_content': has_content(value) if 'text' in value else False,
+            'offset': offset,
+            'size': size
+        })
     
     composer_id = data.get('composer_id', 'unknown')
     
     # Extract file information
-    original_file_states = data.get('original_file_states', {})
-    code_block_data = data.get('code_block_data', {})
-    
-    # Extract messages with file references
-    messages = data.get('messages', [])
+    original_file_states = data.get('original_file_states') or {}
+    code_block_data = data.get('code_block_data') or {}
     
     files_created = []
     files_modified = []
@@ -30,10 +149,7 @@ def extract_file_creation_info(json_file_path: Path) -> Dict:
     # Process original_file_states
     for file_uri, file_info in original_file_states.items():
         # Extract file path
-        if isinstance(file_info.get('uri'), dict):
-            file_path = file_info.get('uri', {}).get('fsPath', file_uri)
-        else:
-            file_path = file_uri.replace('file:///', '').replace('%3A', ':').replace('%2F', '/').replace('%5C', '\\')
+        file_path = file_path_of(file_uri, file_info)
         
         file_paths.add(file_path)
         
@@ -57,10 +173,7 @@ def extract_file_creation_info(json_file_path: Path) -> Dict:
     code_blocks = []
     for file_uri, blocks in code_block_data.items():
         for block_id, block_info in blocks.items():
-            if isinstance(block_info.get('uri'), dict):
-                file_path = block_info.get('uri', {}).get('fsPath', file_uri)
-            else:
-                file_path = file_uri.replace('file:///', '').replace('%3A', ':').replace('%2F', '/').replace('%5C', '\\')
+            file_path = file_path_of(file_uri, block_info)
             
             file_paths.add(file_path)
             
@@ -72,23 +185,6 @@ def extract_file_creation_info(json_file_path: Path) -> Dict:
                 'bubble_id': block_info.get('bubbleId', '')
             })
     
-    # Extract project paths mentioned in messages
-    project_paths = set()
-    for msg in messages:
-        text = msg.get('text', '')
-        if text:
-            # Look for file paths in messages
-            import re
-            # Windows paths
-            paths = re.findall(r'[A-Z]:\\[^\s]+|/[A-Z]:/[^\s]+', text)
-            for path in paths:
-                project_paths.add(path)
-            # Unix paths
-            paths = re.findall(r'/[^\s]+', text)
-            for path in paths:
-                if len(path) > 3:  # Filter out short paths
-                    project_paths.add(path)
-    
     return {
         'composer_id': composer_id,
         'files_created': files_created,
@@ -97,22 +193,38 @@ def extract_file_creation_info(json_file_path: Path) -> Dict:
         'all_file_paths': sorted(list(file_paths)),
         'project_paths_mentioned': sorted(list(project_paths)),
         'total_messages': data.get('total_messages', 0),
-        'messages_with_content': data.get('messages_with_content', 0)
+        'messages_with_content': data.get('messages_with_content', 0),
+        'data_file': str(json_file_path),
+        'message_index': message_index
     }
 
-def create_project_recovery_document(conversation_file: Path, output_file: Path):
-    """Create comprehensive project recovery document"""
-    
-    print(f"Processing: {conversation_file.name}")
-    
-    # Read conversation text
-    with open(conversation_file, 'r', encoding='utf-8') as f:
-        conversation_text = f.read()
-    
-    # Read JSON for structured data
-    json_file = conversation_file.parent / conversation_file.name.replace('.txt', '.json')
-    if json_file.exists():
-        file_info = extract_file_creation_info(json_file)
+# Lines at the top of a FULL_*.txt file searched for the project name and location
+HEADER_LINES = 100
+
+INDEX_JSON = 'project_index.json'
+INDEX_MARKDOWN = 'PROJECT_INDEX.md'
+
+def read_header_lines(text_file: Path, limit: int = HEADER_LINES) -> List[str]:
+    """First ``limit`` lines of a text file, read lazily (the rest is never loaded)"""
+    with open(text_file, 'r', encoding='utf-8') as f:
+        return [line.rstrip('\n') for line in islice(f, limit)]
+
+def detect_project(lines: List[str]):
+    """(project name, location line) guessed from the top of a conversation"""
+    for line in lines:
+        if 'frappe' in line.lower() or 'erpnext' in line.lower():
+            if 'G:' in line or 'g:' in line:
+                return "ERPNext/Frappe Docker Project", line
+    return "Unknown Project", ""
+
+def project_recovery_info(conversation_file: Path) -> Dict:
+    """Structured data for a FULL_*.txt file's recovery document"""
+    # Read the data file (any output format) for structured data
+    json_file = find_data_file(conversation_file.parent, conversation_file.stem)
+    if json_file is not None:
+        with stage('scan'):
+            file_info = extract_file_creation_info(json_file)
+        count('bytes_decoded', json_file.stat().st_size)
     else:
         file_info = {
             'composer_id': 'unknown',
@@ -122,22 +234,28 @@ def create_project_recovery_document(conversation_file: Path, output_file: Path)
             'all_file_paths': [],
             'project_paths_mentioned': [],
             'total_messages': 0,
-            'messages_with_content': 0
+            'messages_with_content': 0,
+            'data_file': None,
+            'message_index': []
         }
     
-    # Extract key information from conversation
-    lines = conversation_text.split('\n')
+    # Find project name/description in the header region only
+    with stage('detect_project'):
+        file_info['project_name'], file_info['project_location'] = detect_project(read_header_lines(conversation_file))
+    count('conversations')
+    count('messages', file_info['total_messages'])
+    return file_info
+
+@timed('document')
+def create_project_recovery_document(conversation_file: Path, output_file: Path, file_info: Optional[Dict] = None):
+    """Create comprehensive project recovery document"""
     
-    # Find project name/description
-    project_name = "Unknown Project"
-    project_location = ""
+    print(f"Processing: {conversation_file.name}")
     
-    for line in lines[:100]:
-        if 'frappe' in line.lower() or 'erpnext' in line.lower():
-            if 'G:' in line or 'g:' in line:
-                project_location = line
-                project_name = "ERPNext/Frappe Docker Project"
-                break
+    if file_info is None:
+        file_info = project_recovery_info(conversation_file)
+    project_name = file_info['project_name']
+    project_location = file_info['project_location']
     
     # Create recovery document
     doc = []
@@ -254,28 +372,182 @@ def create_project_recovery_document(conversation_file: Path, output_file: Path)
     doc.append("(Extracted from conversation messages)")
     doc.append("")
     
-    # Extract first 50 messages with content
-    messages_with_content = []
-    for msg in file_info.get('messages', []):
-        if msg.get('text') and '[Content not found' not in msg.get('text', ''):
-            messages_with_content.append(msg)
+    # First KEY_POINTS messages with content, picked from the index and read one by one
+    key_points = [entry for entry in file_info['message_index'] if entry['has_content']][:KEY_POINTS]
     
-    for msg in messages_with_content[:50]:
+    with stage('key_points'):
+        key_point_messages = list(read_messages(file_info['data_file'], key_points))
+    count('rows_read', len(key_point_messages))
+    for msg in key_point_messages:
         msg_type = msg.get('type', 'unknown').upper()
-        text = msg.get('text', '')[:500]  # Limit length
+        text = msg.get('text', '')[:KEY_POINT_CHARS]  # Limit length
         doc.append(f"[{msg.get('index', '?')}] {msg_type}:")
         doc.append(f"{text}")
         doc.append("")
     
     # Save document
-    with open(output_file, 'w', encoding='utf-8') as f:
+    with stage('write'), open(output_file, 'w', encoding='utf-8') as f:
         f.write('\n'.join(doc))
+    count('bytes_written', output_file.stat().st_size)
     
     print(f"✅ Created: {output_file.name}")
     return output_file
 
-def main():
+def _init_worker():
+    """Pool initializer: workers stay quiet, the parent reports progress"""
+    sys.stdout = open(os.devnull, 'w', encoding='utf-8')
+
+def _recover_conversation(conversation_file: Path, output_file: Path) -> Dict:
+    """Write one recovery document and return the summary merged into the project index"""
+    file_info = project_recovery_info(conversation_file)
+    create_project_recovery_document(conversation_file, output_file, file_info)
+    return {
+        'conversation': conversation_file.stem,
+        'document': output_file.name,
+        'composer_id': file_info['composer_id'],
+        'project_name': file_info['project_name'],
+        'project_location': file_info['project_location'],
+        'total_messages': file_info['total_messages'],
+        'files_created': [entry['path'] for entry in file_info['files_created']],
+        'files_modified': [entry['path'] for entry in file_info['files_modified']],
+        'all_file_paths': file_info['all_file_paths'],
+        'code_blocks': [{'file': block['file'], 'language': block['language'], 'status': block['status']}
+                        for block in file_info['code_blocks']]
+    }
+
+def _pool_recover_conversation(conversation_file: Path, output_file: Path) -> Tuple[Dict, Dict]:
+    """_recover_conversation() in a worker, returning its stage timings as well"""
+    instrumentation.reset()
+    summary = _recover_conversation(conversation_file, output_file)
+    return summary, instrumentation.snapshot()
+
+def build_project_index(summaries: List[Dict]) -> Dict:
+    """Merge per-conversation summaries into one index keyed by project and by file path"""
+    projects = {}
+    files = {}
+    
+    for summary in summaries:
+        project = projects.setdefault(summary['project_name'], {'locations': [], 'conversations': []})
+        project['conversations'].append(summary['conversation'])
+        if summary['project_location'] and summary['project_location'] not in project['locations']:
+            project['locations'].append(summary['project_location'])
+        
+        for path in summary['all_file_paths']:
+            entry = files.setdefault(path, {'conversations': [], 'created_in': [], 'modified_in': [],
+                                            'code_blocks': 0, 'languages': []})
+            entry['conversations'].append(summary['conversation'])
+        for key, paths in (('created_in', summary['files_created']), ('modified_in', summary['files_modified'])):
+            for path in paths:
+                files[path][key].append(summary['conversation'])
+        for block in summary['code_blocks']:
+            entry = files[block['file']]
+            entry['code_blocks'] += 1
+            if block['language'] not in entry['languages']:
+                entry['languages'].append(block['language'])
+    
+    return {
+        'generated_at': datetime.now().isoformat(),
+        'conversations': summaries,
+        'projects': projects,
+        'files': dict(sorted(files.items()))
+    }
+
+def format_project_index(index: Dict) -> str:
+    """Markdown view of the cross-project index"""
+    doc = []
+    doc.append("=" * 80)
+    doc.append("CROSS-PROJECT INDEX")
+    doc.append("=" * 80)
+    doc.append("")
+    doc.append(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    doc.append(f"Conversations: {len(index['conversations'])}")
+    doc.append(f"Files referenced: {len(index['files'])}")
+    doc.append("")
+    
+    doc.append("=" * 80)
+    doc.append("PROJECTS")
+    doc.append("=" * 80)
+    doc.append("")
+    for name, project in sorted(index['projects'].items()):
+        doc.append(f"{name} ({len(project['conversations'])} conversation(s))")
+        for location in project['locations']:
+            doc.append(f"  Location: {location}")
+        for conversation in project['conversations']:
+            doc.append(f"  - PROJECT_RECOVERY_{conversation}.md")
+        doc.append("")
+    
+    doc.append("=" * 80)
+    doc.append("FILES ACROSS CONVERSATIONS")
+    doc.append("=" * 80)
+    doc.append("")
+    for path, entry in index['files'].items():
+        doc.append(f"- {path}")
+        details = [f"{len(entry['conversations'])} conversation(s)"]
+        if entry['created_in']:
+            details.append(f"created in {len(entry['created_in'])}")
+        if entry['modified_in']:
+            details.append(f"modified in {len(entry['modified_in'])}")
+        if entry['code_blocks']:
+            details.append(f"{entry['code_blocks']} code block(s) ({', '.join(entry['languages'])})")
+        doc.append(f"  {', '.join(details)}")
+    doc.append("")
+    return '\n'.join(doc)
+
+def find_full_conversations(full_dir: Path) -> List[Path]:
+    """Every FULL_*.txt conversation (its data file is found next to it in any format)"""
+    return sorted(Path(full_dir).glob('FULL_*.txt'))
+
+def recover_all(conversation_files: List[Path], output_dir: Path, workers: int = 1) -> Dict:
+    """Build recovery documents for all conversations plus the cross-project index
+    
+    With ``workers`` > 1 the documents are built on a process pool, whose stage timings
+    are merged back (see instrumentation.py). Returns the index.
+    """
+    tasks = [(conv_file, output_dir / f"PROJECT_RECOVERY_{conv_file.stem}.md") for conv_file in conversation_files]
+    summaries = []
+    
+    def collect(conv_file, result):
+        if isinstance(result, Exception):
+            print(f"❌ Error processing {conv_file.name}: {result}")
+        else:
+            summaries.append(result)
+    
+    if workers <= 1 or len(tasks) <= 1:
+        for conv_file, output_file in tasks:
+            try:
+                result = _recover_conversation(conv_file, output_file)
+            except Exception as e:
+                result = e
+            collect(conv_file, result)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = [pool.submit(_pool_recover_conversation, *task) for task in tasks]
+            for (conv_file, _), future in zip(tasks, futures):
+                try:
+                    result, timings = future.result()
+                    instrumentation.merge(timings)
+                    print(f"✅ Created: {result['document']}")
+                except Exception as e:
+                    result = e
+                collect(conv_file, result)
+    
+    index = build_project_index(summaries)
+    with open(output_dir / INDEX_JSON, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2, ensure_ascii=False)
+    with open(output_dir / INDEX_MARKDOWN, 'w', encoding='utf-8') as f:
+        f.write(format_project_index(index))
+    return index
+
+def main(argv: Optional[List[str]] = None):
     """Process all conversation files"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('conversations', nargs='*', type=Path,
+                        help='FULL_*.txt files to process (default: every file in full_conversations/)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, metavar='N',
+                        help='build documents on N worker processes (default: CPU count)')
+    add_profile_argument(parser)
+    args = parser.parse_args(argv)
+    
     print("=" * 80)
     print("PROJECT CONTEXT EXTRACTION")
     print("=" * 80)
@@ -285,17 +557,23 @@ def main():
     output_dir = backup_dir / 'project_recovery_docs'
     output_dir.mkdir(exist_ok=True)
     
-    # Process conversation 1 (ERPNext/Frappe project)
-    conv_file = conversations_dir / 'FULL_conversation_1_composerData_20e7a53f-33e9-40e9-9237-a8f5ded267e0.txt'
-    
-    if conv_file.exists():
-        output_file = output_dir / 'PROJECT_RECOVERY_ERPNext_Frappe.md'
-        create_project_recovery_document(conv_file, output_file)
-    else:
+    conversation_files = args.conversations or find_full_conversations(conversations_dir)
+    missing = [conv_file for conv_file in conversation_files if not conv_file.exists()]
+    for conv_file in missing:
         print(f"❌ Conversation file not found: {conv_file}")
+    conversation_files = [conv_file for conv_file in conversation_files if conv_file.exists()]
+    if not conversation_files:
+        print(f"❌ No FULL_*.txt conversations found in: {conversations_dir}")
+        return
+    
+    print(f"\nFound {len(conversation_files)} conversation(s), using {min(args.jobs, len(conversation_files))} worker(s)")
+    # Stage timings and counters go to project_recovery_docs/run_report.json
+    with instrumented_run('extract_project_context', output_dir, args.profile):
+        index = recover_all(conversation_files, output_dir, workers=args.jobs)
     
     print(f"\n✅ Extraction complete!")
     print(f"📁 Output directory: {output_dir}")
+    print(f"🗂️  Index: {INDEX_MARKDOWN} ({len(index['projects'])} project(s), {len(index['files'])} file(s))")
 
 if __name__ == '__main__':
     main()
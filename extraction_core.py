@@ -0,0 +1,206 @@
+"""
+Data access shared by the extraction scripts
+Finding the global database, decoding stored JSON values and loading the composerData
+structure of a conversation file go through here, so every script behaves the same. When
+the scripts run in one process (see run_backup.py) an in-process cache keeps decoded
+values by database key, and the composerData that extract_conversations writes to the
+store by blob path, so a blob read again by a later step is decoded only once while it
+stays cached
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import json_select
+from instrumentation import count, stage
+
+# Default budget of the decode cache (estimated memory of the cached entries)
+DEFAULT_CACHE_BYTES = 128 * 1024 * 1024
+
+# Memory of an entry per raw byte: the raw string itself plus the decoded dicts, lists
+# and strings, which take several times its size (about 3x for text-heavy bubbles, 6x
+# for composerData made of many small objects)
+ENTRY_SIZE_FACTOR = 6
+
+# Structure selections kept by json_select while the cache is on (it keeps 32 otherwise)
+STRUCTURE_CACHE_SIZE = 4096
+
+# Bubble fields that carry message text, in the order they are tried
+BUBBLE_TEXT_FIELDS = ('text', 'message', 'content', 'userMessage', 'assistantMessage',
+                      'prompt', 'response', 'body')
+
+class DecodeCache:
+    """Decoded JSON values by database key, least recently used evicted first
+    
+    An entry only counts as a hit when the raw value is unchanged, so a blob updated
+    between two steps is decoded again. ``max_bytes`` bounds the estimated memory of
+    the entries (ENTRY_SIZE_FACTOR times the raw size). Cached values are shared
+    between callers and must not be modified.
+    """
+    
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str, raw):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != raw:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def put(self, key: str, raw, value, raw_size: Optional[int] = None):
+        size = (len(raw) if raw_size is None else raw_size) * ENTRY_SIZE_FACTOR
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[2]
+            if size > self.max_bytes:
+                return  # Would evict everything else and then itself
+            self._entries[key] = (raw, value, size)
+            self.size += size
+            while self.size > self.max_bytes and self._entries:
+                self.size -= self._entries.popitem(last=False)[1][2]
+    
+    def report(self) -> List[str]:
+        total = self.hits + self.misses
+        if not total:
+            return []
+        return [f"🧠 Decode cache: {self.hits}/{total} hit(s) ({self.hits / total:.1%}), "
+                f"{len(self._entries)} value(s), ~{self.size / (1024 * 1024):.1f} MB"]
+
+# Off unless enable_cache() is called: a single script decodes every blob once anyway
+_cache: Optional[DecodeCache] = None
+
+def enable_cache(max_bytes: int = DEFAULT_CACHE_BYTES) -> DecodeCache:
+    """Share decoded values between the steps run in this process"""
+    global _cache
+    _cache = DecodeCache(max_bytes)
+    json_select.CACHE_SIZE = max(json_select.CACHE_SIZE, STRUCTURE_CACHE_SIZE)
+    return _cache
+
+def decode_value(value, key: Optional[str] = None):
+    """Decode a stored JSON value, returning None if it is not valid JSON
+    
+    ``key`` (the database key of the value) lets the decode cache answer when it is on.
+    """
+    if _cache is not None and key is not None:
+        cached = _cache.get(key, value)
+        if cached is not None:
+            count('decode_cache_hits')
+            return cached
+    
+    with stage('decode'):
+        raw = value
+        if isinstance(value, bytes):
+            value = value.decode('utf-8', errors='ignore')
+        count('bytes_decoded', len(value) if isinstance(value, str) else 0)
+        try:
+            decoded = json.loads(value)
+        except:
+            return None
+    
+    if _cache is not None and key is not None and decoded is not None:
+        _cache.put(key, raw, decoded)
+    return decoded
+
+def _file_stamp(path: Path) -> Tuple[str, str, int]:
+    """(cache key, identity, size) of a conversation file; a rewritten file changes its identity"""
+    stat = os.stat(path)
+    return f"file:{Path(path).resolve()}", f"{stat.st_size}:{stat.st_mtime_ns}", stat.st_size
+
+def remember_document(path: Path, composer_data) -> None:
+    """Keep the composerData just written to ``path`` for load_conversation_parts (cache on only)"""
+    if _cache is None or not isinstance(composer_data, dict):
+        return
+    key, identity, size = _file_stamp(path)
+    _cache.put(key, identity, composer_data, size)
+
+def _conversation_parts(composer_data: Dict) -> Tuple[Dict, Dict[str, Dict]]:
+    structure = {name: composer_data[name] for name in json_select.STRUCTURE_KEYS if name in composer_data}
+    return structure, inline_bubbles(composer_data)
+
+def load_conversation_parts(json_file_path) -> Tuple[Dict, Dict[str, Dict]]:
+    """(structure, inline bubbles) of a {'key', 'data': composerData} conversation file
+    
+    The structure holds json_select.STRUCTURE_KEYS; the inline bubbles are the ones
+    with text embedded in json_select.INLINE_KEYS (see inline_bubbles). Both come from
+    one selective pass over the file, cached per run with the embedded bubbles already
+    reduced. A file whose composerData was decoded earlier in the run (see
+    remember_document) is answered from the decode cache instead.
+    """
+    if _cache is not None:
+        key, identity, _ = _file_stamp(json_file_path)
+        composer_data = _cache.get(key, identity)
+        if composer_data is not None:
+            count('decode_cache_hits')
+            return _conversation_parts(composer_data)
+    return json_select.select_keys(json_file_path, json_select.STRUCTURE_KEYS + json_select.INLINE_KEYS,
+                                   parent='data', reduce=_conversation_parts)
+
+def load_composer_structure(json_file_path) -> Dict:
+    """The json_select.STRUCTURE_KEYS of a conversation file (see load_conversation_parts)"""
+    return load_conversation_parts(json_file_path)[0]
+
+def load_inline_bubbles(json_file_path) -> Dict[str, Dict]:
+    """The bubbles with text embedded in a conversation file (see load_conversation_parts)"""
+    return load_conversation_parts(json_file_path)[1]
+
+def bubble_key(composer_id: str, bubble_id: str) -> str:
+    return f"bubbleId:{composer_id}:{bubble_id}"
+
+def has_bubble_text(bubble) -> bool:
+    """Whether a bubble carries any message text (plain or rich)"""
+    return isinstance(bubble, dict) and any(bubble.get(field) for field in BUBBLE_TEXT_FIELDS + ('richText',))
+
+def inline_bubbles(composer_data: Dict) -> Dict[str, Dict]:
+    """Bubbles embedded in a composerData blob, by bubble ID
+    
+    Older composers keep full bubbles in ``conversation`` (a list) and/or
+    ``conversationMap`` (bubble ID -> bubble). Only bubbles with text are returned, so
+    empty placeholders still fall through to the database.
+    """
+    bubbles = {}
+    if not isinstance(composer_data, dict):
+        return bubbles
+    
+    conversation = composer_data.get('conversation')
+    if isinstance(conversation, list):
+        for bubble in conversation:
+            if has_bubble_text(bubble) and bubble.get('bubbleId'):
+                bubbles[str(bubble['bubbleId'])] = bubble
+    
+    conversation_map = composer_data.get('conversationMap')
+    if isinstance(conversation_map, dict):
+        for bubble_id, bubble in conversation_map.items():
+            if has_bubble_text(bubble):
+                bubbles.setdefault(str(bubble.get('bubbleId') or bubble_id), bubble)
+    return bubbles
+
+def database_candidates(backup_dir: Path) -> List[Tuple[str, bool]]:
+    """Global state.vscdb locations in order of preference, as (path, immutable)
+    
+    The live database comes first; the backup copy in databases/ is never written by
+    the editor, so it can be opened immutable (without locking).
+    """
+    return [
+        (os.path.join(os.environ.get('APPDATA', ''), 'Cursor', 'User', 'globalStorage', 'state.vscdb'), False),
+        (str(Path(backup_dir) / 'databases' / 'state.vscdb'), True)
+    ]
+
+def find_global_database(backup_dir: Path) -> Optional[Tuple[str, bool]]:
+    """(path, immutable) of the first global database that exists, None without one"""
+    for db_path, immutable in database_candidates(backup_dir):
+        if os.path.exists(db_path):
+            return db_path, immutable
+    return None
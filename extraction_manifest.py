@@ -0,0 +1,187 @@
+"""
+Manifest of what was last extracted, so scheduled backups only redo changed conversations
+Each entry records the composer watermark (lastUpdatedAt, header count, ...) and the
+hashes of the files written for it
+"""
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+MANIFEST_NAME = 'extraction_manifest.json'
+MANIFEST_VERSION = 1
+
+# Watermark columns computed inside SQLite so unchanged blobs are never decoded in Python
+# Rows that are not valid JSON are skipped, matching the extractors which drop them
+WATERMARK_SQL = """
+    SELECT key,
+           json_extract(CAST(value AS TEXT), '$.lastUpdatedAt'),
+           json_array_length(CAST(value AS TEXT), '$.fullConversationHeadersOnly'),
+           length(value)
+    FROM {table} WHERE ({where}) AND json_valid(CAST(value AS TEXT))
+"""
+
+def write_output(path: Path, content: str) -> Dict:
+    """Write text to a file and return its manifest record (name, size, sha256)"""
+    data = content.encode('utf-8')
+    with open(path, 'wb') as f:
+        f.write(data)
+    return {
+        'path': path.name,
+        'size': len(data),
+        'sha256': hashlib.sha256(data).hexdigest()
+    }
+
+class HashingWriter:
+    """Wrapper around a binary file that hashes and counts everything written through it"""
+    
+    def __init__(self, f, path: Path):
+        self.f = f
+        self.path = Path(path)
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+    
+    def write(self, text: str):
+        self.write_bytes(text.encode('utf-8'))
+    
+    def write_bytes(self, data: bytes):
+        self.f.write(data)
+        self.size += len(data)
+        self.sha256.update(data)
+    
+    def record(self) -> Dict:
+        """Manifest record of what has been written so far"""
+        return {
+            'path': self.path.name,
+            'size': self.size,
+            'sha256': self.sha256.hexdigest()
+        }
+
+def file_signature(path: Path) -> List[int]:
+    """Cheap change marker for an input file: [size, mtime_ns]"""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+def read_watermarks(conn: sqlite3.Connection, table: str, where: str) -> Iterator[Tuple[str, Dict]]:
+    """Yield (key, watermark) for JSON rows of a table without decoding values in Python
+    
+    Falls back to decoding each value when the SQLite build has no JSON functions.
+    """
+    try:
+        rows = conn.execute(WATERMARK_SQL.format(table=table, where=where)).fetchall()
+        for key, last_updated_at, header_count, size in rows:
+            yield key, {
+                'last_updated_at': last_updated_at,
+                'header_count': header_count,
+                'size': size
+            }
+        return
+    except sqlite3.OperationalError:
+        pass
+    
+    for key, value in conn.execute(f"SELECT key, value FROM {table} WHERE {where}"):
+        size = len(value) if value is not None else None
+        last_updated_at = header_count = None
+        try:
+            if isinstance(value, bytes):
+                value = value.decode('utf-8', errors='ignore')
+            data = json.loads(value)
+        except:
+            continue
+        if isinstance(data, dict):
+            last_updated_at = data.get('lastUpdatedAt')
+            headers = data.get('fullConversationHeadersOnly')
+            header_count = len(headers) if isinstance(headers, list) else None
+        yield key, {
+            'last_updated_at': last_updated_at,
+            'header_count': header_count,
+            'size': size
+        }
+
+def count_bubble_rows(conn: sqlite3.Connection, composer_id: str) -> int:
+    """Count stored bubbles of a composer using only the key index"""
+    prefix = f"bubbleId:{composer_id}:"
+    upper_bound = prefix[:-1] + chr(ord(':') + 1)
+    total = 0
+    for table in ('cursorDiskKV', 'ItemTable'):
+        try:
+            total += conn.execute(
+                f"SELECT count(*) FROM {table} WHERE key >= ? AND key < ?",
+                (prefix, upper_bound)
+            ).fetchone()[0]
+        except sqlite3.Error:
+            pass
+    return total
+
+class ExtractionManifest:
+    """Persistent record of extracted conversations, grouped by section (one per script)"""
+    
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.sections: Dict[str, Dict[str, Dict]] = {}
+        self.dirty = False
+        
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == MANIFEST_VERSION:
+                    self.sections = data.get('sections', {})
+            except Exception as e:
+                print(f"⚠️  Ignoring unreadable manifest {self.path.name}: {e}")
+    
+    def entry(self, section: str, key: str) -> Optional[Dict]:
+        return self.sections.get(section, {}).get(key)
+    
+    def is_current(self, section: str, key: str, watermark: Dict, output_dir: Path,
+                   output_names: Optional[List[str]] = None) -> bool:
+        """True if the key was extracted at this watermark and its outputs are still on disk
+        
+        ``output_names`` optionally pins the expected output file names, so a record
+        that would now be written under a different name is treated as stale.
+        """
+        entry = self.entry(section, key)
+        if not entry or entry.get('watermark') != watermark:
+            return False
+        if output_names is not None and [o['path'] for o in entry.get('outputs', [])] != output_names:
+            return False
+        
+        for output in entry.get('outputs', []):
+            output_path = output_dir / output['path']
+            try:
+                if output_path.stat().st_size != output['size']:
+                    return False
+            except OSError:
+                return False
+        return True
+    
+    def record(self, section: str, key: str, watermark: Dict, outputs: List[Dict], **extra):
+        """Store the watermark and written outputs for a key"""
+        entry = {
+            'watermark': watermark,
+            'outputs': outputs,
+            'extracted_at': datetime.now().isoformat()
+        }
+        entry.update(extra)
+        self.sections.setdefault(section, {})[key] = entry
+        self.dirty = True
+    
+    def forget_missing(self, section: str, keys):
+        """Drop entries whose keys are no longer present in the source"""
+        entries = self.sections.get(section, {})
+        for key in set(entries) - set(keys):
+            del entries[key]
+            self.dirty = True
+    
+    def save(self):
+        """Atomically write the manifest if anything changed"""
+        if not self.dirty:
+            return
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'sections': self.sections}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
@@ -0,0 +1,198 @@
+"""
+Asyncio extraction pipeline that overlaps SQLite reads, bubble parsing and file writes
+A reader fetches raw bubble rows chunk by chunk, parser workers decode them into messages
+and a writer saves finished conversations; bounded queues between the stages keep only a
+few chunks in flight, so the reader waits when parsing or writing falls behind
+"""
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from cursor_db import connect_readonly
+from extract_full_conversations import (STREAM_CHUNK_SIZE, conversation_record, fetch_bubble_rows,
+                                        load_conversation_structure, parse_bubble_rows, save_conversation)
+from extraction_core import load_composer_structure
+from instrumentation import instrumentation
+
+# Chunks allowed to wait between two stages
+QUEUE_SIZE = 8
+
+# Parser workers (threads); JSON decoding holds the GIL, so more rarely helps
+PARSER_WORKERS = 2
+
+# Writer processes: formatting and indented JSON encoding are pure Python, so writes
+# run in their own processes to overlap with reading and parsing for real
+WRITER_PROCESSES = 2
+
+# The reader's connections live on the single database thread
+_reader_conn = None
+_reader_sources = None
+
+def _init_reader(db_path: str, immutable: bool, sources=None):
+    global _reader_conn, _reader_sources
+    _reader_conn = connect_readonly(db_path, immutable=immutable)
+    _reader_sources = sources
+
+def _close_reader():
+    global _reader_conn, _reader_sources
+    if _reader_conn is not None:
+        _reader_conn.close()
+        _reader_conn = None
+    if _reader_sources is not None:
+        _reader_sources.close()
+        _reader_sources = None
+
+def _read_structure(job: Tuple) -> Optional[Tuple[str, List[Dict], Dict, Dict, Dict]]:
+    """(composer_id, headers, code_block_data, original_file_states, inline bubbles) for a job, None without an ID"""
+    composer_id, json_file = job[:2]
+    if json_file is not None:
+        composer_id = load_composer_structure(json_file).get('composerId') or composer_id
+    if not composer_id:
+        return None
+    headers, code_block_data, original_file_states, inline = load_conversation_structure(composer_id, _reader_conn,
+                                                                                         json_file)
+    return composer_id, headers, code_block_data, original_file_states, inline
+
+def _read_chunk(composer_id: str, headers: List[Dict], inline: Dict[str, Dict]) -> Dict[str, List]:
+    return fetch_bubble_rows(_reader_conn, composer_id, headers, _reader_sources, inline)
+
+async def _reader(jobs: List[Tuple], db_executor, parse_queue: asyncio.Queue, write_queue: asyncio.Queue,
+                  conversations: Dict[int, Dict], chunk_size: int):
+    loop = asyncio.get_running_loop()
+    
+    for job_index, job in enumerate(jobs):
+        try:
+            structure = await loop.run_in_executor(db_executor, _read_structure, job)
+        except Exception as e:
+            await write_queue.put((job_index, None, e))
+            continue
+        if structure is None:
+            await write_queue.put((job_index, None, None))
+            continue
+        
+        composer_id, headers, code_block_data, original_file_states, inline = structure
+        chunks = [headers[start:start + chunk_size] for start in range(0, len(headers), chunk_size)] or [[]]
+        conversations[job_index] = {
+            'job': job,
+            'composer_id': composer_id,
+            'code_block_data': code_block_data,
+            'original_file_states': original_file_states,
+            'chunks': len(chunks),
+            'parts': {}
+        }
+        
+        for seq, chunk in enumerate(chunks):
+            try:
+                rows = await loop.run_in_executor(db_executor, _read_chunk, composer_id, chunk, inline)
+            except Exception as e:
+                await write_queue.put((job_index, None, e))
+                break
+            # Blocks while the parsers are QUEUE_SIZE chunks behind
+            await parse_queue.put((job_index, seq, composer_id, seq * chunk_size, chunk, rows, inline))
+
+async def _parser(parse_executor, parse_queue: asyncio.Queue, write_queue: asyncio.Queue):
+    loop = asyncio.get_running_loop()
+    
+    while True:
+        item = await parse_queue.get()
+        if item is None:
+            return
+        job_index, seq, composer_id, start, chunk, rows, inline = item
+        try:
+            messages = await loop.run_in_executor(parse_executor, parse_bubble_rows, composer_id, start, chunk, rows,
+                                                  inline)
+        except Exception as e:
+            messages = e
+        await write_queue.put((job_index, seq, messages))
+
+def _save_measured(record: Dict, output_dir, stem: str, output_format: str) -> Tuple[List[Dict], Dict]:
+    """save_conversation() in a writer process, returning its stage timings as well"""
+    instrumentation.reset()
+    outputs = save_conversation(record, output_dir, stem, output_format)
+    return outputs, instrumentation.snapshot()
+
+async def _save(io_executor, job_index: int, record: Dict, job: Tuple, results: Dict[int, object]):
+    loop = asyncio.get_running_loop()
+    _, _, stem, output_dir, _, output_format = job
+    try:
+        outputs, timings = await loop.run_in_executor(io_executor, _save_measured, record, output_dir, stem, output_format)
+        instrumentation.merge(timings)
+        results[job_index] = (record['composer_id'], outputs, record['total_messages'], record['messages_with_content'])
+    except Exception as e:
+        results[job_index] = e
+
+async def _writer(io_executor, write_queue: asyncio.Queue, conversations: Dict[int, Dict], results: Dict[int, object]):
+    # At most WRITER_PROCESSES conversations are being written; further ones wait here
+    slots = asyncio.Semaphore(WRITER_PROCESSES)
+    saves = []
+    
+    while True:
+        item = await write_queue.get()
+        if item is None:
+            break
+        job_index, seq, payload = item
+        if job_index in results:
+            continue  # Conversation already failed
+        
+        if seq is None or isinstance(payload, Exception):
+            results[job_index] = payload
+            conversations.pop(job_index, None)
+            continue
+        
+        conversation = conversations[job_index]
+        conversation['parts'][seq] = payload
+        if len(conversation['parts']) < conversation['chunks']:
+            continue
+        
+        # All chunks parsed: assemble in order and write while the reader moves on
+        del conversations[job_index]
+        messages = [msg for part in range(conversation['chunks']) for msg in conversation['parts'][part]]
+        record = conversation_record(conversation['composer_id'], messages,
+                                     conversation['code_block_data'], conversation['original_file_states'])
+        
+        await slots.acquire()
+        save = asyncio.create_task(_save(io_executor, job_index, record, conversation['job'], results))
+        save.add_done_callback(lambda _: slots.release())
+        saves.append(save)
+    
+    await asyncio.gather(*saves)
+
+async def _run(db_path: str, jobs: List[Tuple], immutable: bool, parsers: int, chunk_size: int,
+               sources) -> Dict[int, object]:
+    parse_queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+    write_queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+    conversations = {}
+    results = {}
+    
+    db_executor = ThreadPoolExecutor(max_workers=1, initializer=_init_reader, initargs=(db_path, immutable, sources))
+    parse_executor = ThreadPoolExecutor(max_workers=parsers)
+    io_executor = ProcessPoolExecutor(max_workers=WRITER_PROCESSES)
+    try:
+        writer = asyncio.create_task(_writer(io_executor, write_queue, conversations, results))
+        parser_tasks = [asyncio.create_task(_parser(parse_executor, parse_queue, write_queue)) for _ in range(parsers)]
+        
+        await _reader(jobs, db_executor, parse_queue, write_queue, conversations, chunk_size)
+        for _ in parser_tasks:
+            await parse_queue.put(None)
+        await asyncio.gather(*parser_tasks)
+        await write_queue.put(None)
+        await writer
+    finally:
+        db_executor.submit(_close_reader).result()
+        for executor in (db_executor, parse_executor, io_executor):
+            executor.shutdown()
+    
+    return results
+
+def run_pipeline(db_path: str, jobs: List[Tuple], immutable: bool = False, parsers: int = PARSER_WORKERS,
+                 chunk_size: int = STREAM_CHUNK_SIZE, sources=None) -> Iterator[Tuple[Tuple, object]]:
+    """Run extraction jobs through the pipeline, yielding (job, result) in job order
+    
+    Jobs and results have the same shape as run_extraction_jobs(): a result is
+    (composer_id, outputs, total, with content), None when no composer ID was found,
+    or the exception that stopped the conversation. The reader also resolves missing
+    bubbles from ``sources`` (a BubbleSources index) when given.
+    """
+    results = asyncio.run(_run(db_path, jobs, immutable, parsers, chunk_size, sources))
+    for job_index, job in enumerate(jobs):
+        yield job, results.get(job_index)
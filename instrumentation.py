@@ -0,0 +1,197 @@
+"""
+Per-stage timers, counters and optional profiling for the extraction scripts
+Every script records into the one process-wide Instrumentation; worker processes send
+back snapshot() so the parent can merge their numbers. Each run ends with a
+run_report.json written next to its outputs. Pass --profile cprofile or
+--profile tracemalloc to capture a profile or allocation statistics as well
+"""
+import cProfile
+import io
+import json
+import os
+import platform
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+REPORT_NAME = 'run_report.json'
+REPORT_VERSION = 1
+
+PROFILE_MODES = ('cprofile', 'tracemalloc')
+
+# Entries listed in the console summary and in the report's profile section
+PROFILE_TOP = 15
+
+class Instrumentation:
+    """Accumulated stage timings (seconds, calls) and named counters
+    
+    Stages may nest; each reports its inclusive time. Updates are locked, so the
+    pipeline's reader and parser threads can record into the same instance.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        self.timers: Dict[str, List] = {}
+        self.counters: Dict[str, int] = {}
+        self.started = time.perf_counter()
+    
+    @contextmanager
+    def stage(self, name: str):
+        """Time the enclosed block under ``name``"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                timer = self.timers.setdefault(name, [0.0, 0])
+                timer[0] += elapsed
+                timer[1] += 1
+    
+    def count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+    
+    def snapshot(self) -> Dict:
+        """Picklable copy of the numbers, for merge() in another process"""
+        with self._lock:
+            return {'timers': {name: list(timer) for name, timer in self.timers.items()},
+                    'counters': dict(self.counters)}
+    
+    def merge(self, snapshot: Dict):
+        """Add the numbers recorded by a worker process"""
+        with self._lock:
+            for name, (seconds, calls) in snapshot.get('timers', {}).items():
+                timer = self.timers.setdefault(name, [0.0, 0])
+                timer[0] += seconds
+                timer[1] += calls
+            for name, amount in snapshot.get('counters', {}).items():
+                self.counters[name] = self.counters.get(name, 0) + amount
+    
+    def report(self, script: str, **extra) -> Dict:
+        """Machine-readable run report"""
+        stages = {name: {'seconds': round(seconds, 6), 'calls': calls}
+                  for name, (seconds, calls) in sorted(self.timers.items(), key=lambda item: -item[1][0])}
+        report = {
+            'version': REPORT_VERSION,
+            'script': script,
+            'finished_at': datetime.now().isoformat(),
+            'wall_seconds': round(time.perf_counter() - self.started, 6),
+            'python': platform.python_version(),
+            'pid': os.getpid(),
+            'stages': stages,
+            'counters': dict(sorted(self.counters.items()))
+        }
+        report.update(extra)
+        return report
+    
+    def summary_lines(self) -> List[str]:
+        """Console summary: one line per stage, slowest first, then the counters"""
+        if not self.timers and not self.counters:
+            return []
+        lines = [f"⏱️  Stages ({time.perf_counter() - self.started:.2f}s wall):"]
+        for name, (seconds, calls) in sorted(self.timers.items(), key=lambda item: -item[1][0]):
+            lines.append(f"   {name:<20} {seconds:>9.3f}s {calls:>9} call(s)")
+        if self.counters:
+            lines.append("   " + ", ".join(f"{name}={amount}" for name, amount in sorted(self.counters.items())))
+        return lines
+
+# The instance every module records into
+instrumentation = Instrumentation()
+stage = instrumentation.stage
+count = instrumentation.count
+
+def timed(name: str):
+    """Decorator: time every call of the function as stage ``name``"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def add_profile_argument(parser):
+    """Add the shared --profile option to a script's argument parser"""
+    parser.add_argument('--profile', choices=PROFILE_MODES,
+                        help=f'also capture a cProfile profile or tracemalloc allocation statistics into {REPORT_NAME}')
+
+@contextmanager
+def _capture(mode: Optional[str], output_dir: Path, script: str) -> Iterator[Dict]:
+    """Run the enclosed block under the profiler ``mode``; fills the yielded dict afterwards"""
+    captured = {}
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield captured
+        finally:
+            profiler.disable()
+            profile_file = output_dir / f"{script}.prof"
+            profiler.dump_stats(str(profile_file))
+            text = io.StringIO()
+            pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(PROFILE_TOP)
+            captured['cprofile'] = {'file': profile_file.name, 'top_cumulative': text.getvalue().splitlines()}
+    elif mode == 'tracemalloc':
+        tracemalloc.start()
+        try:
+            yield captured
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics('lineno')[:PROFILE_TOP]
+            tracemalloc.stop()
+            captured['tracemalloc'] = {
+                'current_bytes': current,
+                'peak_bytes': peak,
+                'top_allocations': [{'where': str(stat.traceback[0]), 'bytes': stat.size, 'blocks': stat.count}
+                                    for stat in top]
+            }
+    else:
+        yield captured
+
+@contextmanager
+def instrumented_run(script: str, output_dir: Path, profile: Optional[str] = None) -> Iterator[Instrumentation]:
+    """Measure a whole script run and write <output_dir>/run_report.json when it ends
+    
+    The report is written even when the run fails, so a slow or crashing run can
+    still be inspected.
+    """
+    output_dir = Path(output_dir)
+    instrumentation.reset()
+    captured = {}
+    failed = None
+    try:
+        with _capture(profile, output_dir, script) as captured:
+            try:
+                yield instrumentation
+            except BaseException as e:
+                failed = repr(e)
+                raise
+    finally:
+        extra = {'argv': sys.argv[1:], 'profile': captured or None}
+        if failed:
+            extra['error'] = failed
+        try:
+            output_dir.mkdir(parents=True, exist_ok=True)
+            report_file = output_dir / REPORT_NAME
+            with open(report_file, 'w', encoding='utf-8') as f:
+                json.dump(instrumentation.report(script, **extra), f, indent=2, ensure_ascii=False)
+            for line in instrumentation.summary_lines():
+                print(line)
+            if profile == 'cprofile':
+                print(f"📈 Profile saved: {output_dir / captured['cprofile']['file']}")
+            elif profile == 'tracemalloc':
+                print(f"📈 Peak traced memory: {captured['tracemalloc']['peak_bytes'] / (1024 * 1024):.1f} MB")
+            print(f"🧾 Run report: {report_file}")
+        except Exception as e:
+            print(f"⚠️  Run report not written: {e}")
@@ -0,0 +1,229 @@
+"""
+Selective loading of large JSON documents
+Only the requested keys are decoded (by the C JSON scanner); every other value is skipped
+with regexes, without building Python objects for it
+"""
+import json
+import os
+import re
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from conversation_io import data_suffix, read_data, read_text
+
+# The composerData keys the extraction scripts actually use
+STRUCTURE_KEYS = ('composerId', 'fullConversationHeadersOnly', 'codeBlockData', 'originalFileStates')
+
+# Keys of older composers that embed whole bubbles; the largest values in composerData, so
+# they are selected together with the structure but reduced to the bubbles with text
+# before caching (see extraction_core.load_conversation_parts)
+INLINE_KEYS = ('conversationMap', 'conversation')
+
+# Selected values kept per (file, keys) for the rest of the run (least recently used evicted first)
+CACHE_SIZE = 32
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# Everything up to the next bracket, strings (which may contain brackets) included
+_UNTIL_BRACKET = re.compile(r'[^"{}\[\]]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"{}\[\]]*)*', re.DOTALL)
+_SCALAR = re.compile(r'[^,}\]\s]*')
+
+def _nested_container_pattern(depth: int) -> str:
+    """Regex matching a whole object/array nested at most ``depth`` levels deep
+    
+    ``re`` has no recursion, so the pattern is unrolled level by level; every
+    alternative starts with a different character, so it never backtracks badly.
+    """
+    plain = r'[^"{}\[\]]*'
+    string = r'"[^"\\]*(?:\\.[^"\\]*)*"'
+    inner = plain + '(?:' + string + plain + ')*'
+    for _ in range(depth - 1):
+        inner = plain + '(?:(?:' + string + r'|\{' + inner + r'\}|\[' + inner + r'\])' + plain + ')*'
+    return r'\{' + inner + r'\}|\[' + inner + r'\]'
+
+# Skips most containers in one C-level match; deeper ones are walked a level at a time
+_CONTAINER = re.compile(_nested_container_pattern(5), re.DOTALL)
+
+_decoder = json.JSONDecoder()
+_cache = OrderedDict()
+_cache_stats = {'hits': 0, 'misses': 0}
+
+def _skip_whitespace(text: str, pos: int) -> int:
+    return _WHITESPACE.match(text, pos).end()
+
+def skip_value(text: str, pos: int) -> int:
+    """Index just past the JSON value starting at pos, without decoding it"""
+    first = text[pos:pos + 1]
+    if first == '"':
+        # str.find runs at memchr speed, which matters for multi-MB strings
+        end = pos
+        while True:
+            end = text.find('"', end + 1)
+            if end < 0:
+                raise ValueError(f"Unterminated string at {pos}")
+            backslashes = end - 1
+            while text[backslashes] == '\\':
+                backslashes -= 1
+            if (end - backslashes) % 2:
+                return end + 1
+    
+    if first in ('{', '['):
+        depth = 0
+        while True:
+            if pos >= len(text):
+                raise ValueError("Unterminated container")
+            match = _CONTAINER.match(text, pos)
+            if match:
+                pos = match.end()
+            else:
+                depth += 1 if text[pos] in '{[' else -1
+                pos += 1
+            if depth == 0:
+                return pos
+            pos = _UNTIL_BRACKET.match(text, pos).end()
+    
+    return _SCALAR.match(text, pos).end()
+
+def iter_object_items(text: str, pos: int, wanted: Optional[set] = None,
+                      stop_at: Optional[str] = None) -> Iterator[Tuple[str, object, int]]:
+    """Yield (key, value, value start) for each member of the object starting at pos
+    
+    Values of keys in ``wanted`` are decoded; all others are skipped and yielded as None.
+    Iteration ends right at key ``stop_at`` without scanning its value.
+    """
+    pos = _skip_whitespace(text, pos)
+    if text[pos:pos + 1] != '{':
+        raise ValueError(f"Expected an object at {pos}")
+    pos = _skip_whitespace(text, pos + 1)
+    if text[pos:pos + 1] == '}':
+        return
+    
+    while True:
+        key, pos = _decoder.raw_decode(text, pos)
+        pos = _skip_whitespace(text, pos)
+        if text[pos:pos + 1] != ':':
+            raise ValueError(f"Expected ':' at {pos}")
+        start = _skip_whitespace(text, pos + 1)
+        if key == stop_at:
+            yield key, None, start
+            return
+        if wanted is not None and key in wanted:
+            value, pos = _decoder.raw_decode(text, start)
+        else:
+            value, pos = None, skip_value(text, start)
+        yield key, value, start
+        
+        pos = _skip_whitespace(text, pos)
+        separator = text[pos:pos + 1]
+        if separator == '}':
+            return
+        if separator != ',':
+            raise ValueError(f"Expected ',' or '}}' at {pos}")
+        pos = _skip_whitespace(text, pos + 1)
+
+def iter_array_items(text: str, pos: int) -> Iterator[Tuple[object, int, int]]:
+    """Yield (value, start, end) for each element of the array starting at pos
+    
+    Elements are decoded one at a time, so a caller can process a huge array
+    without the whole list ever existing in memory.
+    """
+    pos = _skip_whitespace(text, pos)
+    if text[pos:pos + 1] != '[':
+        raise ValueError(f"Expected an array at {pos}")
+    pos = _skip_whitespace(text, pos + 1)
+    if text[pos:pos + 1] == ']':
+        return
+    
+    while True:
+        value, end = _decoder.raw_decode(text, pos)
+        yield value, pos, end
+        
+        pos = _skip_whitespace(text, end)
+        separator = text[pos:pos + 1]
+        if separator == ']':
+            return
+        if separator != ',':
+            raise ValueError(f"Expected ',' or ']' at {pos}")
+        pos = _skip_whitespace(text, pos + 1)
+
+def select_from_text(text: str, keys: Iterable[str], parent: Optional[str] = None) -> Dict:
+    """Decode only ``keys`` of the top-level object (or of its ``parent`` member object)"""
+    wanted = set(keys)
+    start = 0
+    
+    if parent is not None:
+        for key, _, value_start in iter_object_items(text, 0, stop_at=parent):
+            if key == parent:
+                start = value_start
+                break
+        else:
+            return {}
+        if text[start:start + 1] != '{':
+            return {}
+    
+    selected = {}
+    for key, value, _ in iter_object_items(text, start, wanted):
+        if key in wanted:
+            selected[key] = value
+            if len(selected) == len(wanted):
+                break
+    return selected
+
+def select_keys(path, keys: Iterable[str], parent: Optional[str] = None, use_cache: bool = True,
+                reduce: Optional[Callable[[Dict], object]] = None):
+    """Load only ``keys`` from a JSON file whose top level (or ``parent`` member) is an object
+    
+    Compressed (.json.gz, .json.zst) and MessagePack documents are read through
+    conversation_io; MessagePack ones are decoded whole. Missing keys are simply absent
+    from the result. ``reduce`` is applied to the selection before it is cached and
+    returned. Results are cached per run by file path, size and mtime, so asking for
+    the same keys again does not touch the file.
+    """
+    path = Path(path)
+    keys = tuple(keys)
+    stat = os.stat(path)
+    cache_key = (str(path.resolve()), stat.st_size, stat.st_mtime_ns, keys, parent, reduce)
+    
+    if use_cache:
+        cached = _cache.get(cache_key)
+        if cached is not None:
+            _cache.move_to_end(cache_key)
+            _cache_stats['hits'] += 1
+            return cached
+        _cache_stats['misses'] += 1
+    
+    suffix = data_suffix(path)
+    if suffix == '.msgpack':
+        # Binary documents have no text to skip through; decode and pick
+        document = read_data(path)
+        if parent is not None:
+            document = document.get(parent) if isinstance(document, dict) else None
+        selected = {key: document[key] for key in keys if key in document} if isinstance(document, dict) else {}
+    else:
+        if suffix in ('.json', ''):
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+        else:
+            text = read_text(path)
+        selected = select_from_text(text, keys, parent)
+        del text
+    if reduce is not None:
+        selected = reduce(selected)
+    
+    if use_cache:
+        _cache[cache_key] = selected
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return selected
+
+def load_composer_structure(json_file_path) -> Dict:
+    """The STRUCTURE_KEYS of a {'key', 'data': composerData} conversation file"""
+    return select_keys(json_file_path, STRUCTURE_KEYS, parent='data')
+
+def cache_info() -> dict:
+    """Hit/miss counters and current size of the selection cache"""
+    return dict(_cache_stats, size=len(_cache))
+
+def clear_cache():
+    _cache.clear()
+    _cache_stats['hits'] = _cache_stats['misses'] = 0
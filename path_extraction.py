@@ -0,0 +1,75 @@
+"""
+Find file paths in conversation text and decode file:// URIs
+All patterns are compiled once into a single alternation and only tokens containing a
+path separator are matched against it; URLs, dates and fractions are not mistaken for
+POSIX paths
+"""
+import re
+from typing import Dict, Optional, Set
+from urllib.parse import unquote
+
+# Characters that never occur inside a path mentioned in prose or markdown
+_STOP = r'\s"\'<>|*?`'
+
+# Markup and punctuation around a path rather than part of it
+_LEADING = '([{\'"*`<'
+_TRAILING = '.,;:!?)]}\'"*`>'
+
+# One alternation, matched against whole whitespace-separated tokens, so "https://x/y",
+# "2023/11/17", "1/2" and "and/or" (which only contain a path-like tail) never match
+_PATH = re.compile(
+    # file:///c%3A/Users/... or file:///home/...
+    rf'(?P<uri>file://[^{_STOP}()\[\]]+)'
+    # C:\Users\..., C:/Users/... and /c:/Users/...
+    rf'|(?P<windows>/?[A-Za-z]:[\\/][^{_STOP}]+)'
+    # /home/user/app, ~/src/x, ./src/x and ../x/y with at least two segments
+    r'|(?P<posix>(?:~|\.{1,2})?/[\w.@+-]+(?:/[\w.@+-]+)+/?)'
+)
+
+_DRIVE_URI_PATH = re.compile(r'^/[A-Za-z]:')
+
+def decode_file_uri(uri: str) -> str:
+    """File system path of a file:// URI (percent-decoded; C: drives lose the leading slash)
+    
+    Strings that are not file URIs are returned unchanged.
+    """
+    if not uri.startswith('file://'):
+        return uri
+    path = unquote(uri[len('file://'):])
+    if not path.startswith('/'):
+        # file://server/share/x (UNC)
+        return '//' + path
+    if _DRIVE_URI_PATH.match(path):
+        return path[1:]
+    return path
+
+def file_path_of(uri: str, info: Optional[Dict]) -> str:
+    """Path of an originalFileStates/codeBlockData entry: its fsPath, else the decoded key"""
+    uri_info = info.get('uri') if isinstance(info, dict) else None
+    if isinstance(uri_info, dict) and uri_info.get('fsPath'):
+        return uri_info['fsPath']
+    return decode_file_uri(uri)
+
+def extract_paths(text: str) -> Set[str]:
+    """File paths mentioned in a piece of text"""
+    # Most messages mention no path at all; skip the regex for them
+    if not text or ('/' not in text and '\\' not in text):
+        return set()
+    
+    paths = set()
+    # str.split is a single C-level pass; only tokens with a separator reach the regex
+    for token in text.split():
+        if '/' not in token and '\\' not in token:
+            continue
+        path = token.lstrip(_LEADING).rstrip(_TRAILING)
+        match = _PATH.fullmatch(path)
+        if match is None:
+            continue
+        if match.lastgroup == 'uri':
+            path = decode_file_uri(path)
+        elif match.lastgroup == 'windows':
+            path = path.lstrip('/')
+            if len(path) <= 3:
+                continue  # Bare drive root
+        paths.add(path)
+    return paths
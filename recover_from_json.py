@@ -2,60 +2,45 @@
 Recover full conversations from extracted JSON files
 This script reconstructs readable conversations from the composerData JSON files
 """
-import json
+import argparse
 import os
 from pathlib import Path
 from datetime import datetime
-import sqlite3
 
-def parse_rich_text(rich_text_str):
-    """Parse Lexical editor format to plain text"""
-    try:
-        if not rich_text_str or rich_text_str == "":
-            return ""
-        
-        rich_data = json.loads(rich_text_str)
-        
-        def extract_text(node):
-            text = ""
-            if isinstance(node, dict):
-                node_type = node.get("type", "")
-                
-                # Extract text from text nodes
-                if "text" in node:
-                    text += node["text"]
-                
-                # Recursively process children
-                if "children" in node:
-                    for child in node["children"]:
-                        text += extract_text(child)
-                
-                # Add line breaks for paragraphs
-                if node_type == "paragraph":
-                    text += "\n"
-                elif node_type == "heading":
-                    text += "\n"
-                elif node_type == "code":
-                    text += "\n"
-                    
-            return text
-        
-        return extract_text(rich_data.get("root", {})).strip()
-    except:
-        return rich_text_str
+from bubble_sources import open_bubble_sources
+from conversation_io import FORMATS, encode_records, missing_dependency, report as format_report, write_encoded
+from conversation_store import list_conversation_files
+from extraction_core import (bubble_key, decode_value, find_global_database, load_composer_structure,
+                             load_inline_bubbles)
+from instrumentation import add_profile_argument, count, instrumented_run, stage
+from path_extraction import file_path_of
+from rich_text import parse_rich_text
 
-def recover_from_json_file(json_file_path, db_path=None):
-    """Recover conversation from a single JSON file"""
+def recover_from_json_file(json_file_path, db_path=None, sources=None):
+    """Recover conversation from a single JSON file
     
+    ``sources`` (see bubble_sources.py) looks message bubbles up in the global and
+    workspace databases; pass it to share one location index across files. Without it
+    the bubbles come from ``db_path`` (and the backed-up workspace databases) when that
+    database exists, otherwise only the structure is recovered.
+    """
+    owned = None
+    if sources is None and db_path and os.path.exists(db_path):
+        owned = sources = open_bubble_sources(Path(__file__).parent, (Path(db_path), False))
+    try:
+        return _recover_from_json_file(json_file_path, sources)
+    finally:
+        if owned is not None:
+            owned.close()
+
+def _recover_from_json_file(json_file_path, sources):
     print(f"\n{'='*80}")
     print(f"Recovering from: {Path(json_file_path).name}")
     print(f"{'='*80}")
     
-    # Load the JSON file
-    with open(json_file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    composer_data = data.get('data', {})
+    # Load only the parts of the JSON file used below
+    with stage('load_structure'):
+        composer_data = load_composer_structure(json_file_path)
     composer_id = composer_data.get('composerId', 'unknown')
     
     # Get conversation structure
@@ -70,48 +55,53 @@ def recover_from_json_file(json_file_path, db_path=None):
     original_file_states = composer_data.get('originalFileStates', {})
     print(f"Found {len(original_file_states)} files that were created/modified")
     
-    # Try to get actual message content from database if available
+    # Bubbles embedded in composerData first; the database only for the rest
+    inline = load_inline_bubbles(json_file_path)
     messages = []
-    if db_path and os.path.exists(db_path):
-        print(f"\nAttempting to extract message content from database...")
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
+    if sources is not None or inline:
+        rows = {}
+        bubble_ids = [header.get('bubbleId') for header in headers]
+        count('bubbles_inline', sum(1 for bubble_id in bubble_ids if bubble_id in inline))
+        if inline:
+            print(f"Found {len(inline)} bubble(s) embedded in composerData")
+        if sources is not None:
+            print(f"\nAttempting to extract message content from database...")
+            with stage('read_bubbles'):
+                rows = sources.resolve(composer_id, bubble_ids, (), inline)
+            count('rows_read', sum(len(values) for values in rows.values()))
+        count('bubbles_missing', sum(1 for bubble_id in bubble_ids if bubble_id not in rows and bubble_id not in inline))
         
         for idx, header in enumerate(headers):
             bubble_id = header.get('bubbleId')
             msg_type = header.get('type', 0)  # 1 = user, 2 = assistant
             
-            # Try to find bubble content in database
-            try:
-                # Try ItemTable
-                cursor.execute("SELECT value FROM ItemTable WHERE key = ?", (f"bubbleId:{composer_id}:{bubble_id}",))
-                row = cursor.fetchone()
-                
-                if row:
-                    try:
-                        bubble_data = json.loads(row[0])
-                        text = bubble_data.get('text', '')
-                        rich_text = bubble_data.get('richText', '')
-                        
-                        # Parse rich text if available
-                        if rich_text:
+            for value in ([inline[bubble_id]] if bubble_id in inline else rows.get(bubble_id, ())):
+                try:
+                    if isinstance(value, dict):
+                        bubble_data = value
+                    else:
+                        bubble_data = decode_value(value, bubble_key(composer_id, bubble_id))
+                    text = bubble_data.get('text', '')
+                    rich_text = bubble_data.get('richText', '')
+                    
+                    # Parse rich text if available
+                    if rich_text:
+                        with stage('rich_text'):
                             parsed = parse_rich_text(rich_text)
-                            if parsed:
-                                text = parsed
-                        
-                        if text:
-                            messages.append({
-                                'index': idx + 1,
-                                'bubble_id': bubble_id,
-                                'type': 'user' if msg_type == 1 else 'assistant',
-                                'content': text
-                            })
-                    except:
-                        pass
-            except:
-                pass
+                        if parsed:
+                            text = parsed
+                    
+                    if text:
+                        messages.append({
+                            'index': idx + 1,
+                            'bubble_id': bubble_id,
+                            'type': 'user' if msg_type == 1 else 'assistant',
+                            'content': text
+                        })
+                    break
+                except:
+                    pass
         
-        conn.close()
         print(f"Extracted {len(messages)} messages with content from database")
     
     # Build recovery output
@@ -127,7 +117,7 @@ def recover_from_json_file(json_file_path, db_path=None):
     
     # Extract file information
     for file_uri, file_info in original_file_states.items():
-        file_path = file_info.get('uri', {}).get('fsPath', file_uri)
+        file_path = file_path_of(file_uri, file_info)
         recovery['files_created'].append({
             'path': file_path,
             'is_new': file_info.get('isNewlyCreated', False),
@@ -138,71 +128,82 @@ def recover_from_json_file(json_file_path, db_path=None):
     for file_uri, blocks in code_block_data.items():
         for block_id, block_info in blocks.items():
             recovery['code_blocks'].append({
-                'file': block_info.get('uri', {}).get('fsPath', file_uri),
+                'file': file_path_of(file_uri, block_info),
                 'language': block_info.get('languageId', 'unknown'),
                 'status': block_info.get('status', 'unknown'),
                 'created_at': block_info.get('createdAt', 0)
             })
     
-    # Create readable text output
-    text_output = []
-    text_output.append("=" * 80)
-    text_output.append(f"RECOVERED CONVERSATION")
-    text_output.append("=" * 80)
-    text_output.append(f"Composer ID: {composer_id}")
-    text_output.append(f"Total Messages: {len(headers)}")
-    text_output.append(f"Messages with Content: {len(messages)}")
-    text_output.append(f"Files Created/Modified: {len(original_file_states)}")
-    text_output.append(f"Code Blocks: {len(code_block_data)}")
-    text_output.append("")
-    
-    # Add message content if available
-    if messages:
+    with stage('format'):
+        # Create readable text output
+        text_output = []
         text_output.append("=" * 80)
-        text_output.append("MESSAGE CONTENT")
+        text_output.append(f"RECOVERED CONVERSATION")
         text_output.append("=" * 80)
-        for msg in messages:
-            text_output.append(f"\n[{msg['index']}] {msg['type'].upper()}:")
-            text_output.append("-" * 80)
-            text_output.append(msg['content'])
-            text_output.append("")
-    else:
-        text_output.append("=" * 80)
-        text_output.append("MESSAGE STRUCTURE (Content not available in JSON)")
-        text_output.append("=" * 80)
-        text_output.append("\nNote: The JSON file contains conversation structure but not message content.")
-        text_output.append("Message content is stored separately in the database.")
-        text_output.append("To get full content, use the database extraction method.")
+        text_output.append(f"Composer ID: {composer_id}")
+        text_output.append(f"Total Messages: {len(headers)}")
+        text_output.append(f"Messages with Content: {len(messages)}")
+        text_output.append(f"Files Created/Modified: {len(original_file_states)}")
+        text_output.append(f"Code Blocks: {len(code_block_data)}")
         text_output.append("")
-        for idx, header in enumerate(headers):
-            msg_type = 'USER' if header.get('type') == 1 else 'ASSISTANT'
-            text_output.append(f"[{idx+1}] {msg_type} - Bubble ID: {header.get('bubbleId')}")
-    
-    # Add file information
-    if original_file_states:
-        text_output.append("\n" + "=" * 80)
-        text_output.append("FILES CREATED/MODIFIED")
-        text_output.append("=" * 80)
-        for file_info in recovery['files_created']:
-            text_output.append(f"\n📄 {file_info['path']}")
-            text_output.append(f"   New File: {file_info['is_new']}")
-            if file_info['content_preview']:
-                text_output.append(f"   Preview: {file_info['content_preview'][:200]}...")
-    
-    # Add code block information
-    if code_block_data:
-        text_output.append("\n" + "=" * 80)
-        text_output.append("CODE BLOCKS GENERATED")
-        text_output.append("=" * 80)
-        for block_info in recovery['code_blocks']:
-            text_output.append(f"\n💻 {block_info['file']}")
-            text_output.append(f"   Language: {block_info['language']}")
-            text_output.append(f"   Status: {block_info['status']}")
+        
+        # Add message content if available
+        if messages:
+            text_output.append("=" * 80)
+            text_output.append("MESSAGE CONTENT")
+            text_output.append("=" * 80)
+            for msg in messages:
+                text_output.append(f"\n[{msg['index']}] {msg['type'].upper()}:")
+                text_output.append("-" * 80)
+                text_output.append(msg['content'])
+                text_output.append("")
+        else:
+            text_output.append("=" * 80)
+            text_output.append("MESSAGE STRUCTURE (Content not available in JSON)")
+            text_output.append("=" * 80)
+            text_output.append("\nNote: The JSON file contains conversation structure but not message content.")
+            text_output.append("Message content is stored separately in the database.")
+            text_output.append("To get full content, use the database extraction method.")
+            text_output.append("")
+            for idx, header in enumerate(headers):
+                msg_type = 'USER' if header.get('type') == 1 else 'ASSISTANT'
+                text_output.append(f"[{idx+1}] {msg_type} - Bubble ID: {header.get('bubbleId')}")
+        
+        # Add file information
+        if original_file_states:
+            text_output.append("\n" + "=" * 80)
+            text_output.append("FILES CREATED/MODIFIED")
+            text_output.append("=" * 80)
+            for file_info in recovery['files_created']:
+                text_output.append(f"\n📄 {file_info['path']}")
+                text_output.append(f"   New File: {file_info['is_new']}")
+                if file_info['content_preview']:
+                    text_output.append(f"   Preview: {file_info['content_preview'][:200]}...")
+        
+        # Add code block information
+        if code_block_data:
+            text_output.append("\n" + "=" * 80)
+            text_output.append("CODE BLOCKS GENERATED")
+            text_output.append("=" * 80)
+            for block_info in recovery['code_blocks']:
+                text_output.append(f"\n💻 {block_info['file']}")
+                text_output.append(f"   Language: {block_info['language']}")
+                text_output.append(f"   Status: {block_info['status']}")
     
+    count('conversations')
+    count('messages', len(headers))
     return recovery, "\n".join(text_output)
 
-def main():
+def main(argv=None):
     """Main recovery function"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--format', choices=list(FORMATS), default='json', dest='output_format',
+                        help='all_recoveries format: JSON (default), compressed JSON Lines or MessagePack')
+    add_profile_argument(parser)
+    args = parser.parse_args(argv)
+    if missing_dependency(args.output_format):
+        parser.error(f"--format {args.output_format} needs: pip install {missing_dependency(args.output_format)}")
+    
     print("=" * 80)
     print("CURSOR CONVERSATION RECOVERY FROM JSON FILES")
     print("=" * 80)
@@ -214,42 +215,58 @@ def main():
     output_dir.mkdir(exist_ok=True)
     
     # Try to find database
-    db_path = os.path.join(os.environ.get('APPDATA', ''), 'Cursor', 'User', 'globalStorage', 'state.vscdb')
-    if not os.path.exists(db_path):
-        db_path = backup_dir / 'databases' / 'state.vscdb'
-        if not os.path.exists(db_path):
-            db_path = None
-            print("\n⚠️  Database not found. Will extract structure only (no message content).")
-    
-    # Find all conversation JSON files
-    json_files = list(conversations_dir.glob('conversation_*.json'))
+    global_db = find_global_database(backup_dir)
+    if global_db is None:
+        print("\n⚠️  Database not found. Will extract structure only (no message content).")
     
-    if not json_files:
-        print(f"\n❌ No conversation JSON files found in: {conversations_dir}")
-        return
-    
-    print(f"\nFound {len(json_files)} conversation file(s)")
-    
-    # Recover each conversation
-    all_recoveries = []
-    for json_file in json_files:
+    # Stage timings and counters go to recovered_from_json/run_report.json
+    with instrumented_run('recover_from_json', output_dir, args.profile):
+        # Bubbles are looked up through the same location index as extract_full_conversations.py,
+        # across the global database and the backed-up workspace databases
+        sources = open_bubble_sources(backup_dir, global_db)
+        
         try:
-            recovery, text_output = recover_from_json_file(json_file, db_path)
-            all_recoveries.append(recovery)
+            # Find all conversation JSON files (content-addressed store or legacy conversation_*.json)
+            json_files = list_conversation_files(conversations_dir)
             
-            # Save text output
-            output_file = output_dir / f"RECOVERED_{Path(json_file).stem}.txt"
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(text_output)
-            print(f"✅ Saved: {output_file.name}")
+            if not json_files:
+                print(f"\n❌ No conversation JSON files found in: {conversations_dir}")
+                return
             
-        except Exception as e:
-            print(f"❌ Error recovering {json_file.name}: {e}")
-    
-    # Save combined JSON
-    combined_file = output_dir / 'all_recoveries.json'
-    with open(combined_file, 'w', encoding='utf-8') as f:
-        json.dump(all_recoveries, f, indent=2, ensure_ascii=False)
+            print(f"\nFound {len(json_files)} conversation file(s)")
+            
+            # Recover each conversation
+            all_recoveries = []
+            for conversation_file in json_files:
+                json_file = conversation_file['path']
+                try:
+                    recovery, text_output = recover_from_json_file(json_file, sources=sources)
+                    all_recoveries.append(recovery)
+                    
+                    # Save text output
+                    output_file = output_dir / f"RECOVERED_{conversation_file['stem']}.txt"
+                    with stage('write'), open(output_file, 'w', encoding='utf-8') as f:
+                        f.write(text_output)
+                    count('bytes_written', output_file.stat().st_size)
+                    print(f"✅ Saved: {output_file.name}")
+                
+                except Exception as e:
+                    print(f"❌ Error recovering {conversation_file['stem']}: {e}")
+            
+            if sources is not None:
+                for line in sources.coverage_report():
+                    print(line)
+        finally:
+            if sources is not None:
+                sources.close()
+        
+        # Save combined file
+        combined_file = output_dir / f"all_recoveries{FORMATS[args.output_format]}"
+        with stage('write'):
+            output = write_encoded(combined_file, all_recoveries, encode_records, args.output_format)
+        count('bytes_written', output['size'])
+        for line in format_report([output]):
+            print(line)
     
     print(f"\n✅ Recovery complete!")
     print(f"📁 Output directory: {output_dir}")
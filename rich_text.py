@@ -0,0 +1,97 @@
+"""
+Parse Cursor's Lexical editor richText documents to plain text
+Shared by all extraction scripts; iterative (no recursion limit) and memoised per document
+"""
+import hashlib
+import json
+from collections import OrderedDict
+
+# Node types that end with a line break
+BLOCK_TYPES = ('paragraph', 'heading', 'code')
+
+# Parsed documents kept by hash of the richText blob (least recently used evicted first)
+CACHE_SIZE = 4096
+
+_NEWLINE = object()
+_cache = OrderedDict()
+_cache_stats = {'hits': 0, 'misses': 0}
+
+def lexical_to_text(root) -> str:
+    """Flatten a Lexical node tree to text with an explicit stack
+    
+    Text nodes are emitted in document order and block nodes are followed by a
+    newline, exactly like a recursive walk, but fragments are collected in a list
+    and joined once, and arbitrarily deep trees cannot hit the recursion limit.
+    """
+    parts = []
+    stack = [root]
+    
+    while stack:
+        node = stack.pop()
+        if node is _NEWLINE:
+            parts.append("\n")
+            continue
+        if not isinstance(node, dict):
+            continue
+        
+        # Extract text from text nodes
+        if "text" in node:
+            parts.append(str(node["text"]))
+        
+        # Line break after the node's children for paragraphs, headings and code
+        if node.get("type", "") in BLOCK_TYPES:
+            stack.append(_NEWLINE)
+        
+        # Children go on the stack in reverse so the first child is processed first
+        children = node.get("children")
+        if children:
+            stack.extend(reversed(children))
+    
+    return "".join(parts)
+
+def _parse(rich_text_str) -> str:
+    try:
+        if isinstance(rich_text_str, dict):
+            rich_data = rich_text_str
+        else:
+            rich_data = json.loads(rich_text_str)
+        
+        return lexical_to_text(rich_data.get("root", {})).strip()
+    except Exception:
+        # If parsing fails, return as string
+        return str(rich_text_str)
+
+def parse_rich_text(rich_text_str, use_cache: bool = True) -> str:
+    """Parse Lexical editor format to plain text
+    
+    Accepts the JSON string stored in ``richText`` or an already decoded dict.
+    String documents are memoised by a hash of their content, so the same blob is
+    only parsed once per process.
+    """
+    if not rich_text_str:
+        return ""
+    
+    if not use_cache or not isinstance(rich_text_str, str):
+        return _parse(rich_text_str)
+    
+    key = hashlib.blake2b(rich_text_str.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+    cached = _cache.get(key)
+    if cached is not None:
+        _cache.move_to_end(key)
+        _cache_stats['hits'] += 1
+        return cached
+    
+    _cache_stats['misses'] += 1
+    result = _parse(rich_text_str)
+    _cache[key] = result
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return result
+
+def cache_info() -> dict:
+    """Hit/miss counters and current size of the parse cache"""
+    return dict(_cache_stats, size=len(_cache))
+
+def clear_cache():
+    _cache.clear()
+    _cache_stats['hits'] = _cache_stats['misses'] = 0
@@ -0,0 +1,97 @@
+"""
+Run the whole extraction chain in one process
+extract_conversations -> extract_full_conversations -> recover_from_json -> extract_project_context.
+The steps share the decode cache of extraction_core.py, so a composerData or bubble blob read
+by several steps is decoded once while it stays within the cache budget. Each step keeps its
+own command line and still writes its own run_report.json
+"""
+import argparse
+import sys
+import time
+from typing import List
+
+import extract_conversations
+import extract_full_conversations
+import extract_project_context
+import recover_from_json
+from conversation_archive import CODECS
+from extraction_core import DEFAULT_CACHE_BYTES, enable_cache
+from instrumentation import PROFILE_MODES
+
+STEPS = {
+    'conversations': extract_conversations.main,
+    'full': extract_full_conversations.main,
+    'recover': recover_from_json.main,
+    'project': extract_project_context.main,
+}
+
+def step_arguments(step: str, args) -> List[str]:
+    """Command line of one step, from the options given to run_backup.py"""
+    argv = []
+    if args.full and step in ('conversations', 'full'):
+        argv.append('--full')
+    if args.archive and step == 'conversations':
+        argv += ['--archive', args.archive]
+    if args.no_workspaces and step == 'full':
+        argv.append('--no-workspaces')
+    if args.composers and step in ('conversations', 'full'):
+        for composer_id in args.composers:
+            argv += ['--composer', composer_id]
+    if args.profile:
+        argv += ['--profile', args.profile]
+    if step == 'project' and args.project_jobs:
+        argv += ['--jobs', str(args.project_jobs)]
+    return argv
+
+def main(argv=None):
+    """Run the selected steps in order; returns the number of failed steps"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--full', action='store_true',
+                        help='re-extract every conversation, ignoring the manifest')
+    parser.add_argument('--skip', action='append', choices=list(STEPS), default=[],
+                        help='leave out a step (repeatable)')
+    parser.add_argument('--cache-mb', type=int, default=DEFAULT_CACHE_BYTES // (1024 * 1024), metavar='MB',
+                        help='memory budget of the shared decode cache, decoded values included '
+                             '(default: %(default)s MB, 0 turns it off)')
+    parser.add_argument('--archive', nargs='?', const='zlib', choices=CODECS, metavar='CODEC',
+                        help='write all_conversations as an indexed archive (see conversation_archive.py)')
+    parser.add_argument('--no-workspaces', action='store_true',
+                        help='do not look up missing bubbles in workspace-storage/ databases')
+    parser.add_argument('--composer', action='append', dest='composers', metavar='ID',
+                        help='only extract this composer in the conversations and full steps (repeatable)')
+    parser.add_argument('--project-jobs', type=int, metavar='N',
+                        help='worker processes for the project recovery documents (default: CPU count)')
+    parser.add_argument('--profile', choices=PROFILE_MODES,
+                        help='profile every step (see instrumentation.py)')
+    args = parser.parse_args(argv)
+    
+    cache = enable_cache(args.cache_mb * 1024 * 1024) if args.cache_mb > 0 else None
+    failed = []
+    
+    for step, step_main in STEPS.items():
+        if step in args.skip:
+            continue
+        print(f"\n{'#' * 80}\n# {step}\n{'#' * 80}")
+        start = time.perf_counter()
+        try:
+            step_main(step_arguments(step, args))
+        except SystemExit as e:
+            if e.code:
+                failed.append(step)
+        except Exception as e:
+            print(f"❌ Step {step} failed: {e}")
+            failed.append(step)
+        print(f"⏱️  {step}: {time.perf_counter() - start:.2f}s")
+    
+    print(f"\n{'=' * 80}")
+    if cache is not None:
+        for line in cache.report():
+            print(line)
+    if failed:
+        print(f"❌ Failed step(s): {', '.join(failed)}")
+    else:
+        print("✅ Backup chain complete")
+    return len(failed)
+
+if __name__ == '__main__':
+    sys.exit(main())
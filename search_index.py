@@ -0,0 +1,239 @@
+"""
+Full-text search over recovered conversation messages
+Messages from the full_conversations/FULL_* data files (any format) are loaded into a local SQLite FTS5 index
+(search_index.db); only files that changed since the last update are re-indexed
+"""
+import argparse
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from conversation_io import data_suffix, signature_file, strip_data_suffix
+from extract_full_conversations import has_content, load_full_conversation
+from extraction_manifest import file_signature
+
+INDEX_NAME = 'search_index.db'
+INDEX_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    stem TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    composer_id TEXT,
+    signature TEXT NOT NULL,
+    indexed_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    stem TEXT NOT NULL,
+    composer_id TEXT,
+    bubble_id TEXT,
+    idx INTEGER,
+    role TEXT,
+    text TEXT NOT NULL,
+    created_at TEXT,
+    extracted_at TEXT
+);
+CREATE INDEX IF NOT EXISTS messages_stem ON messages(stem);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    text, content='messages', content_rowid='id', tokenize='unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts(rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+def open_index(index_path: Path, rebuild: bool = False) -> sqlite3.Connection:
+    """Open (creating if needed) the search index; ``rebuild`` starts from an empty index"""
+    index_path = Path(index_path)
+    if rebuild and index_path.exists():
+        index_path.unlink()
+    
+    conn = sqlite3.connect(index_path)
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version not in (0, INDEX_VERSION):
+        # Written by an incompatible version: start over
+        conn.close()
+        index_path.unlink()
+        conn = sqlite3.connect(index_path)
+    
+    conn.executescript(SCHEMA)
+    conn.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+    return conn
+
+def format_timestamp(value) -> Optional[str]:
+    """Bubble createdAt (epoch milliseconds or ISO string) as an ISO string"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        try:
+            return datetime.fromtimestamp(value / 1000).isoformat(timespec='seconds')
+        except (OverflowError, OSError, ValueError):
+            return str(value)
+    return str(value)
+
+def find_full_conversations(full_dir: Path) -> Dict[str, Path]:
+    """Map each FULL_* stem to its newest data file (.json, .jsonl, .jsonl.gz, .delta, ...)"""
+    found = {}
+    for path in Path(full_dir).glob('FULL_*'):
+        if not data_suffix(path) or not signature_file(path).exists():
+            continue
+        stem = strip_data_suffix(path)
+        current = found.get(stem)
+        if current is None or signature_file(path).stat().st_mtime_ns > signature_file(current).stat().st_mtime_ns:
+            found[stem] = path
+    return found
+
+def iter_message_rows(stem: str, conversation: Dict) -> Iterator[Tuple]:
+    """Rows for the messages table; messages without recovered content are skipped"""
+    composer_id = conversation.get('composer_id')
+    extracted_at = conversation.get('extracted_at')
+    
+    for msg in conversation.get('messages', []):
+        if not has_content(msg):
+            continue
+        raw_data = msg.get('raw_data') or {}
+        yield (stem, composer_id, msg.get('bubble_id'), msg.get('index'), msg.get('type'), msg['text'],
+               format_timestamp(raw_data.get('createdAt')), extracted_at)
+
+def update_index(full_dir: Path, index_path: Path, rebuild: bool = False) -> Dict[str, int]:
+    """Bring the index in line with the FULL_* files in full_dir
+    
+    Files whose [size, mtime] signature is unchanged are skipped; changed files have
+    their rows replaced and files that disappeared are dropped. Returns counters.
+    """
+    stats = {'indexed': 0, 'unchanged': 0, 'removed': 0, 'messages': 0}
+    conn = open_index(index_path, rebuild=rebuild)
+    
+    try:
+        known = {stem: signature for stem, signature in conn.execute("SELECT stem, signature FROM sources")}
+        files = find_full_conversations(full_dir)
+        
+        for stem in set(known) - set(files):
+            with conn:
+                conn.execute("DELETE FROM messages WHERE stem = ?", (stem,))
+                conn.execute("DELETE FROM sources WHERE stem = ?", (stem,))
+            stats['removed'] += 1
+        
+        for stem, path in sorted(files.items()):
+            signature = f"{data_suffix(path)}:{':'.join(map(str, file_signature(signature_file(path))))}"
+            if known.get(stem) == signature:
+                stats['unchanged'] += 1
+                continue
+            
+            try:
+                conversation = load_full_conversation(path)
+            except Exception as e:
+                print(f"⚠️  Skipping {path.name}: {e}")
+                continue
+            
+            rows = list(iter_message_rows(stem, conversation))
+            with conn:
+                conn.execute("DELETE FROM messages WHERE stem = ?", (stem,))
+                conn.executemany(
+                    "INSERT INTO messages (stem, composer_id, bubble_id, idx, role, text, created_at, extracted_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                conn.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?)",
+                             (stem, path.name, conversation.get('composer_id'), signature, datetime.now().isoformat()))
+            stats['indexed'] += 1
+            stats['messages'] += len(rows)
+        
+        if stats['indexed'] or stats['removed']:
+            conn.execute("INSERT INTO messages_fts(messages_fts) VALUES ('optimize')")
+            conn.commit()
+    finally:
+        conn.close()
+    
+    return stats
+
+def _quote_terms(query: str) -> str:
+    """Turn free text into an FTS5 query that matches all words literally"""
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+def search(index_path: Path, query: str, limit: int = 20, role: Optional[str] = None,
+           composer_id: Optional[str] = None) -> List[Dict]:
+    """Ranked (bm25) hits for an FTS5 query, each with a highlighted snippet
+    
+    The query may use FTS5 syntax (phrases, AND/OR/NOT, prefix*); if it does not parse,
+    its words are searched literally instead.
+    """
+    conn = sqlite3.connect(f"{Path(index_path).resolve().as_uri()}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    
+    sql = """
+        SELECT m.composer_id, m.bubble_id, m.idx, m.role, m.created_at, m.stem,
+               snippet(messages_fts, 0, '[', ']', ' … ', 16) AS snippet,
+               bm25(messages_fts) AS score
+        FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid
+        WHERE messages_fts MATCH ?
+    """
+    params = []
+    if role:
+        sql += " AND m.role = ?"
+        params.append(role)
+    if composer_id:
+        sql += " AND m.composer_id LIKE ?"
+        params.append(composer_id + '%')
+    sql += " ORDER BY score LIMIT ?"
+    params.append(limit)
+    
+    try:
+        try:
+            rows = conn.execute(sql, [query] + params).fetchall()
+        except sqlite3.OperationalError:
+            rows = conn.execute(sql, [_quote_terms(query)] + params).fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        conn.close()
+
+def main():
+    """Command line: python search_index.py update | python search_index.py search QUERY"""
+    backup_dir = Path(__file__).parent
+    index_path = backup_dir / INDEX_NAME
+    
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    update_parser = commands.add_parser('update', help='index new or changed FULL_* files')
+    update_parser.add_argument('--rebuild', action='store_true', help='drop the index and re-index everything')
+    
+    search_parser = commands.add_parser('search', help='search indexed messages')
+    search_parser.add_argument('query', nargs='+', help='words or an FTS5 query (e.g. "exact phrase", sqlite NOT fts4, pars*)')
+    search_parser.add_argument('--role', choices=['user', 'assistant'])
+    search_parser.add_argument('--composer', metavar='ID', help='only this conversation (composer id prefix)')
+    search_parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+    
+    if args.command == 'update':
+        start = time.perf_counter()
+        stats = update_index(backup_dir / 'full_conversations', index_path, rebuild=args.rebuild)
+        print(f"✅ Indexed {stats['indexed']} conversation(s) ({stats['messages']} messages), "
+              f"{stats['unchanged']} unchanged, {stats['removed']} removed "
+              f"in {time.perf_counter() - start:.2f}s")
+        return 0
+    
+    if not index_path.exists():
+        print(f"❌ No search index yet, run: python search_index.py update")
+        return 1
+    
+    query = ' '.join(args.query)
+    start = time.perf_counter()
+    hits = search(index_path, query, limit=args.limit, role=args.role, composer_id=args.composer)
+    elapsed = (time.perf_counter() - start) * 1000
+    
+    for hit in hits:
+        when = f" {hit['created_at']}" if hit['created_at'] else ''
+        print(f"\n{(hit['composer_id'] or hit['stem'])[:8]} #{hit['idx']} {(hit['role'] or '').upper()}{when}  (score {hit['score']:.2f})")
+        print(f"   {' '.join(hit['snippet'].split())}")
+    
+    print(f"\n🔎 {len(hits)} hit(s) for '{query}' in {elapsed:.1f} ms")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
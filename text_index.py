@@ -0,0 +1,315 @@
+"""
+Byte-offset index for the readable FULL_<stem>.txt conversations
+The writer records where every [N] USER/ASSISTANT block and section header starts in a
+FULL_<stem>.txt.idx sidecar, so a reader can seek straight to message N or page through
+a range without loading the rest of the file. Text files written before the sidecar
+existed are indexed by scanning them once, line by line
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from extraction_manifest import write_output
+
+INDEX_SUFFIX = '.idx'
+INDEX_VERSION = 1
+
+SEPARATOR = '=' * 80
+MESSAGE_RULE = '-' * 80
+
+# Section titles of the text layout (see format_conversation in extract_full_conversations.py)
+SECTION_TITLES = ('FULL CONVERSATION RECOVERY', 'CONVERSATION MESSAGES', 'FILES CREATED/MODIFIED')
+
+MESSAGE_HEADER = re.compile(r'^\[(\d+)\] ([A-Z_]+)$')
+
+# Messages shown per page by the command line
+PAGE_SIZE = 20
+
+def index_path(text_file: Path) -> Path:
+    """FULL_<stem>.txt -> FULL_<stem>.txt.idx"""
+    text_file = Path(text_file)
+    return text_file.parent / (text_file.name + INDEX_SUFFIX)
+
+class TextIndexBuilder:
+    """Offsets of message blocks and sections, fed with the lines as they are written
+    
+    Lines are counted as '\\n'.join() writes them: the first line of the text has no
+    newline in front of it, every later one has. A ``continued`` builder counts a
+    newline in front of its first line too, for blocks that are appended later (see
+    extend()).
+    """
+    
+    def __init__(self, continued: bool = False):
+        self.position = 0
+        self.started = continued
+        self.sections: List[List] = []
+        self.messages: List[List] = []
+    
+    def _advance(self, line: str) -> Tuple[int, int]:
+        start = self.position + (1 if self.started else 0)
+        self.started = True
+        self.position = start + len(line.encode('utf-8'))
+        return start, self.position
+    
+    def add_lines(self, lines: List[str]):
+        """Lines outside the message blocks (header, file states); section headers are recorded"""
+        starts = [self._advance(line)[0] for line in lines]
+        for i in range(len(lines) - 2):
+            if lines[i] == SEPARATOR and lines[i + 2] == SEPARATOR and lines[i + 1] in SECTION_TITLES:
+                self.sections.append([lines[i + 1], starts[i]])
+    
+    def add_message(self, msg: Dict, lines: List[str]):
+        """The lines of one message block (format_message)"""
+        start = None
+        for line in lines:
+            line_start, end = self._advance(line)
+            if start is None:
+                start = line_start
+        if start is not None:
+            self.messages.append([msg['index'], msg['type'], start, end - start])
+    
+    def extend(self, other: 'TextIndexBuilder'):
+        """Append the blocks of a continued builder, written right after this one's text"""
+        self.sections.extend([title, self.position + offset] for title, offset in other.sections)
+        self.messages.extend(entry[:2] + [self.position + entry[2], entry[3]] for entry in other.messages)
+        self.position += other.position
+        self.started = self.started or other.started
+    
+    def index(self, text_record: Dict, mtime_ns: Optional[int] = None) -> Dict:
+        """The sidecar contents, tied to the text file by its manifest record (size, sha256) and mtime"""
+        return {
+            'version': INDEX_VERSION,
+            'text': text_record['path'],
+            'size': text_record['size'],
+            'mtime_ns': mtime_ns,
+            'sha256': text_record['sha256'],
+            'sections': self.sections,
+            'messages': self.messages
+        }
+
+def write_text_index(text_file: Path, builder: TextIndexBuilder, text_record: Dict) -> Dict:
+    """Write FULL_<stem>.txt.idx and return its manifest record"""
+    index = builder.index(text_record, os.stat(text_file).st_mtime_ns)
+    return write_output(index_path(text_file), json.dumps(index, ensure_ascii=False))
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def is_current(index: Dict, text_file: Path) -> bool:
+    """Whether a sidecar still describes the text file
+    
+    The size must match; a file with another mtime (rewritten, or checked out again)
+    is hashed and accepted only if its sha256 is unchanged.
+    """
+    stat = os.stat(text_file)
+    if index.get('version') != INDEX_VERSION or index.get('size') != stat.st_size:
+        return False
+    if index.get('mtime_ns') == stat.st_mtime_ns:
+        return True
+    return index.get('sha256') == _file_sha256(text_file)
+
+def scan_text(text_file: Path) -> Dict:
+    """Build the index of an existing text file by reading it once, line by line
+    
+    Message blocks are recognised by their '[N] TYPE' line followed by the dashed rule,
+    sections by a known title between two separator lines. Lines may end in LF or CRLF;
+    offsets and lengths are those of the bytes on disk.
+    """
+    text_file = Path(text_file)
+    sections = []
+    messages = []
+    recent = deque(maxlen=4)  # (start, end, line) of the last lines read
+    current = None
+    offset = 0
+    size = 0
+    digest = hashlib.sha256()
+    
+    def close_message(end: int):
+        if current is not None:
+            messages.append(current[:3] + [end - current[2]])
+    
+    with open(text_file, 'rb') as f:
+        for raw in f:
+            digest.update(raw)
+            content = raw.rstrip(b'\r\n')
+            line = content.decode('utf-8', errors='replace')
+            start, end = offset, offset + len(content)
+            offset += len(raw)
+            size = offset
+            
+            if line == MESSAGE_RULE and recent and MESSAGE_HEADER.match(recent[-1][2]):
+                header_start, _, header = recent[-1]
+                # The previous block ends where the blank line in front of this one ends
+                close_message(recent[-2][1] if len(recent) > 1 else header_start)
+                number, msg_type = MESSAGE_HEADER.match(header).groups()
+                current = [int(number), msg_type.lower(), header_start]
+            elif line == SEPARATOR and len(recent) >= 2 and recent[-2][2] == SEPARATOR \
+                    and recent[-1][2] in SECTION_TITLES:
+                section_start = recent[-2][0]
+                if current is not None:
+                    # A section opens with a blank line after the message's own blank line
+                    before = [item for item in recent if item[1] < section_start]
+                    close_message(before[-2][1] if len(before) > 1 and before[-1][2] == '' else before[-1][1])
+                    current = None
+                sections.append([recent[-1][2], section_start])
+            recent.append((start, end, line))
+    
+    if current is not None:
+        close_message(size)
+    return {'version': INDEX_VERSION, 'text': text_file.name, 'size': size,
+            'mtime_ns': os.stat(text_file).st_mtime_ns, 'sha256': digest.hexdigest(),
+            'sections': sections, 'messages': messages}
+
+class TextIndex:
+    """Seek-based reader of a FULL_<stem>.txt file through its offset index
+    
+    Only the index and the requested blocks are read. Use open() to load the sidecar
+    (or scan the text when the sidecar is missing or was written for another version
+    of the file).
+    """
+    
+    def __init__(self, text_file: Path, index: Dict):
+        self.text_file = Path(text_file)
+        self.index = index
+        self.sections = index['sections']
+        self.messages = index['messages']
+        self._by_number = {entry[0]: entry for entry in self.messages}
+        self.scanned = False
+        self._file = open(self.text_file, 'rb')
+    
+    @classmethod
+    def open(cls, text_file: Path, scan: bool = True) -> 'TextIndex':
+        text_file = Path(text_file)
+        index = None
+        try:
+            with open(index_path(text_file), 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if not is_current(index, text_file):
+                index = None
+        except (OSError, ValueError):
+            index = None
+        if index is not None:
+            return cls(text_file, index)
+        if not scan:
+            raise ValueError(f"No current index for {text_file.name}")
+        text_index = cls(text_file, scan_text(text_file))
+        text_index.scanned = True
+        return text_index
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def __len__(self) -> int:
+        return len(self.messages)
+    
+    def read(self, offset: int, length: int) -> str:
+        self._file.seek(offset)
+        return self._file.read(length).decode('utf-8', errors='replace')
+    
+    def message(self, number: int) -> Optional[str]:
+        """Text block of message [number], None if the conversation has no such message"""
+        entry = self._by_number.get(number)
+        return self.read(entry[2], entry[3]) if entry else None
+    
+    def page(self, start: int = 1, count: int = PAGE_SIZE) -> Iterator[Tuple[int, str, str]]:
+        """(number, type, block) of ``count`` messages from message [start] on"""
+        position = next((i for i, entry in enumerate(self.messages) if entry[0] >= start), len(self.messages))
+        for number, msg_type, offset, length in self.messages[position:position + count]:
+            yield number, msg_type, self.read(offset, length)
+    
+    def section(self, title: str) -> Optional[str]:
+        """A whole section (up to the next one or the end of the file)"""
+        for i, (section_title, offset) in enumerate(self.sections):
+            if section_title == title:
+                end = self.sections[i + 1][1] if i + 1 < len(self.sections) else self.index['size']
+                return self.read(offset, end - offset)
+        return None
+    
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def resolve_text_file(name: str, full_dir: Path) -> Path:
+    """A FULL_*.txt path from a path, a FULL_<stem> name or a bare stem"""
+    path = Path(name)
+    if path.is_file():
+        return path
+    stem = name[:-len('.txt')] if name.endswith('.txt') else name
+    stem = stem if stem.startswith('FULL_') else f"FULL_{stem}"
+    return Path(full_dir) / f"{stem}.txt"
+
+def main(argv=None):
+    """Command line: show a message, page through messages, list sections, (re)build sidecars"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dir', type=Path, default=Path(__file__).parent / 'full_conversations',
+                        help='directory holding the FULL_*.txt files (default: %(default)s)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    show_parser = commands.add_parser('show', help='print message [N]')
+    show_parser.add_argument('conversation', help='FULL_*.txt path or conversation stem')
+    show_parser.add_argument('number', type=int)
+    page_parser = commands.add_parser('page', help='print a range of messages')
+    page_parser.add_argument('conversation', help='FULL_*.txt path or conversation stem')
+    page_parser.add_argument('--start', type=int, default=1, help='first message number (default: 1)')
+    page_parser.add_argument('--count', type=int, default=PAGE_SIZE, help='messages per page (default: %(default)s)')
+    sections_parser = commands.add_parser('sections', help='list the sections and message count')
+    sections_parser.add_argument('conversation', help='FULL_*.txt path or conversation stem')
+    index_parser = commands.add_parser('index', help='write sidecars for text files that lack a current one')
+    index_parser.add_argument('files', nargs='*', type=Path, help='FULL_*.txt files (default: every one in --dir)')
+    args = parser.parse_args(argv)
+    
+    if args.command == 'index':
+        files = args.files or sorted(args.dir.glob('FULL_*.txt'))
+        written = 0
+        for text_file in files:
+            with TextIndex.open(text_file) as text_index:
+                if not text_index.scanned:
+                    continue
+                with open(index_path(text_file), 'w', encoding='utf-8') as f:
+                    json.dump(text_index.index, f, ensure_ascii=False)
+                written += 1
+                print(f"✅ {index_path(text_file).name}: {len(text_index)} message(s)")
+        print(f"🗂️  {written} index file(s) written, {len(files) - written} already current")
+        return 0
+    
+    text_file = resolve_text_file(args.conversation, args.dir)
+    try:
+        text_index = TextIndex.open(text_file)
+    except OSError as e:
+        print(f"❌ {e}")
+        return 1
+    
+    with text_index:
+        if args.command == 'sections':
+            for title, offset in text_index.sections:
+                print(f"{offset:>12}  {title}")
+            print(f"\n{len(text_index)} message(s) in {text_file.name}")
+            return 0
+        
+        if args.command == 'show':
+            block = text_index.message(args.number)
+            if block is None:
+                print(f"❌ {text_file.name} has no message [{args.number}]")
+                return 1
+            print(block)
+            return 0
+        
+        for _, _, block in text_index.page(args.start, args.count):
+            print(block)
+        return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,245 @@
+"""
+Watch Cursor's state.vscdb and run the backup chain shortly after conversations change
+The database file and its -wal are polled for size/mtime changes (and, with
+--data-version, PRAGMA data_version on a read-only connection). Bursts of writes while
+the editor streams a reply are debounced: the chain runs once the database has been
+quiet for a while, or after --max-wait at the latest. It only runs when a composer's
+watermark (lastUpdatedAt, header count, size) moved, and the extraction steps are then
+limited to those composers with --composer; an idle editor costs one stat() per poll.
+Run benchmarks/check_watch_backup.py to exercise it against a database written in bursts
+"""
+import argparse
+import shlex
+import sqlite3
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import run_backup
+from bubble_sources import database_signature
+from cursor_db import connect_readonly
+from extraction_core import database_candidates
+from extraction_manifest import read_watermarks
+
+# Seconds between two polls of the database files
+POLL_INTERVAL = 2.0
+
+# Seconds without writes before the chain runs, and the longest a change may wait
+QUIET_PERIOD = 10.0
+MAX_WAIT = 120.0
+
+# Tables holding composerData records (newer builds use cursorDiskKV)
+COMPOSER_TABLES = ('cursorDiskKV', 'ItemTable')
+
+class DatabaseWatcher:
+    """Change detection for one database file
+    
+    poll() is cheap (stat of the file and its WAL, plus one pragma with
+    ``data_version``); changed_composers() reads the composerData watermarks through
+    the key index and JSON functions, without decoding any blob in Python.
+    """
+    
+    def __init__(self, db_path: Path, data_version: bool = False):
+        self.db_path = Path(db_path)
+        self.use_data_version = data_version
+        self.conn: Optional[sqlite3.Connection] = None
+        self.polled = False
+        self.signature = None
+        self.data_version = None
+        self.watermarks: Dict[str, Dict] = {}
+    
+    def _connection(self) -> sqlite3.Connection:
+        # One long-lived connection: data_version only counts commits made by others since it opened
+        if self.conn is None:
+            self.conn = connect_readonly(self.db_path, tune=False)
+        return self.conn
+    
+    def _read_data_version(self) -> Optional[int]:
+        try:
+            return self._connection().execute("PRAGMA data_version").fetchone()[0]
+        except sqlite3.Error:
+            self.close()
+            return None
+    
+    def poll(self) -> bool:
+        """Whether the database changed since the previous poll (the first poll only records the state)"""
+        try:
+            signature = database_signature(self.db_path)
+        except OSError:
+            signature = None
+        # A database that appears counts as a change, one that disappears does not
+        changed = self.polled and signature is not None and signature != self.signature
+        self.polled = True
+        self.signature = signature
+        
+        if self.use_data_version and signature is not None:
+            data_version = self._read_data_version()
+            changed = changed or (self.data_version is not None and data_version != self.data_version)
+            self.data_version = data_version
+        return changed
+    
+    def read_watermarks(self) -> Dict[str, Dict]:
+        watermarks = {}
+        conn = self._connection()
+        for table in COMPOSER_TABLES:
+            try:
+                for key, watermark in read_watermarks(conn, table, "key LIKE 'composerData:%'"):
+                    watermarks.setdefault(key[len('composerData:'):], watermark)
+            except sqlite3.Error:
+                continue
+        return watermarks
+    
+    def changed_composers(self) -> List[str]:
+        """IDs of composers added or with a new watermark since the previous call"""
+        try:
+            watermarks = self.read_watermarks()
+        except sqlite3.Error as e:
+            print(f"⚠️  Could not read watermarks: {e}")
+            self.close()
+            return []
+        changed = [composer_id for composer_id, watermark in watermarks.items()
+                   if self.watermarks.get(composer_id) != watermark]
+        self.watermarks = watermarks
+        return changed
+    
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+class Debouncer:
+    """Fires once changes have stopped for ``quiet`` seconds, or ``max_wait`` after the first one"""
+    
+    def __init__(self, quiet: float = QUIET_PERIOD, max_wait: float = MAX_WAIT):
+        self.quiet = quiet
+        self.max_wait = max_wait
+        self.first_change = None
+        self.last_change = None
+    
+    def change(self, now: float):
+        if self.first_change is None:
+            self.first_change = now
+        self.last_change = now
+    
+    def pending(self) -> bool:
+        return self.first_change is not None
+    
+    def due(self, now: float) -> bool:
+        if self.first_change is None:
+            return False
+        return now - self.last_change >= self.quiet or now - self.first_change >= self.max_wait
+    
+    def reset(self):
+        self.first_change = self.last_change = None
+
+def watch(watcher: DatabaseWatcher, on_change: Callable[[List[str]], None], interval: float = POLL_INTERVAL,
+          debouncer: Optional[Debouncer] = None, max_runs: Optional[int] = None, initial: bool = False) -> int:
+    """Poll until interrupted (or ``max_runs`` runs of ``on_change``); returns the number of runs
+    
+    ``on_change`` gets the IDs of the composers whose watermark moved. With ``initial``
+    it also runs once at start-up for every composer.
+    """
+    debouncer = debouncer or Debouncer()
+    runs = 0
+    watcher.poll()
+    changed = watcher.changed_composers() if watcher.signature is not None else []
+    if initial and changed:
+        on_change(changed)
+        runs += 1
+    
+    try:
+        while max_runs is None or runs < max_runs:
+            time.sleep(interval)
+            now = time.monotonic()
+            if watcher.poll():
+                if not debouncer.pending():
+                    print(f"👀 {watcher.db_path.name} changed, waiting for writes to settle...")
+                debouncer.change(now)
+            if not debouncer.due(now):
+                continue
+            
+            waited = now - debouncer.first_change
+            debouncer.reset()
+            changed = watcher.changed_composers()
+            if not changed:
+                print(f"💤 No conversation changed ({waited:.0f}s of writes)")
+                continue
+            print(f"🔔 {len(changed)} conversation(s) changed after {waited:.0f}s of writes")
+            on_change(changed)
+            runs += 1
+    except KeyboardInterrupt:
+        print("\n👋 Stopped watching")
+    finally:
+        watcher.close()
+    return runs
+
+def run_chain(chain_args: List[str], then: Optional[str]) -> Callable[[List[str]], None]:
+    """on_change callback: run the backup chain in-process for the changed composers,
+    then the ``then`` command if it succeeded"""
+    def on_change(composer_ids: List[str]):
+        start = time.perf_counter()
+        composer_args = []
+        for composer_id in composer_ids:
+            composer_args += ['--composer', composer_id]
+        try:
+            failed = run_backup.main(chain_args + composer_args)
+        except Exception as e:
+            print(f"❌ Backup chain failed: {e}")
+            return
+        print(f"⏱️  Backup chain: {time.perf_counter() - start:.2f}s")
+        if failed or not then:
+            return
+        result = subprocess.run(then, shell=True)
+        if result.returncode:
+            print(f"⚠️  '{then}' exited with {result.returncode}")
+    return on_change
+
+def print_changes(composer_ids: List[str]):
+    """on_change callback of --dry-run"""
+    for composer_id in composer_ids:
+        print(f"   {composer_id}")
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', type=Path,
+                        help='database to watch (default: the live Cursor state.vscdb)')
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL, metavar='SECONDS',
+                        help='time between polls (default: %(default)s)')
+    parser.add_argument('--quiet', type=float, default=QUIET_PERIOD, metavar='SECONDS',
+                        help='run once the database has not changed for this long (default: %(default)s)')
+    parser.add_argument('--max-wait', type=float, default=MAX_WAIT, metavar='SECONDS',
+                        help='run at the latest this long after the first change (default: %(default)s)')
+    parser.add_argument('--data-version', action='store_true',
+                        help='also poll PRAGMA data_version on a read-only connection')
+    parser.add_argument('--initial', action='store_true',
+                        help='run the chain once at start-up')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='only print the changed conversations, do not run the chain')
+    parser.add_argument('--max-runs', type=int, metavar='N',
+                        help='stop after N runs (default: watch until interrupted)')
+    parser.add_argument('--then', metavar='COMMAND',
+                        help='shell command run after every successful chain, e.g. "git add -A && git commit -m backup"')
+    parser.add_argument('--chain', default='', metavar='ARGS',
+                        help='options passed to run_backup.py, e.g. "--skip project --archive"')
+    args = parser.parse_args(argv)
+    
+    db_path = args.db or Path(database_candidates(Path(__file__).parent)[0][0])
+    if args.db and not args.dry_run:
+        print("⚠️  The backup chain reads the databases it finds itself; --db only selects the file watched")
+    
+    watcher = DatabaseWatcher(db_path, data_version=args.data_version)
+    on_change = print_changes if args.dry_run else run_chain(shlex.split(args.chain), args.then)
+    print(f"👀 Watching {db_path} every {args.interval:g}s "
+          f"(quiet {args.quiet:g}s, max wait {args.max_wait:g}s{', data_version' if args.data_version else ''})")
+    if not db_path.exists():
+        print("⚠️  Database not found yet, waiting for it to appear")
+    
+    runs = watch(watcher, on_change, args.interval, Debouncer(args.quiet, args.max_wait), args.max_runs, args.initial)
+    print(f"🧾 {runs} run(s)")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())